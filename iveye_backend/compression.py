@@ -0,0 +1,152 @@
+"""
+Response compression.
+
+CompressionMiddleware compresses the responses of compressible content types (JSON, NDJSON,
+text...) with the best encoding the client accepts: Brotli when the `brotli` package is
+installed, otherwise gzip. Responses smaller than COMPRESSION_MIN_SIZE bytes are sent as they
+are, compressing them costs more than it saves. Streaming responses are compressed as they
+are streamed.
+
+Compressed responses that mix a secret (a profile, an export, the tokens of a login) with
+text an attacker can inject leak the secret through their length (BREACH). Like Django's
+GZipMiddleware, the gzip responses get a random length header of up to
+COMPRESSION_MAX_RANDOM_BYTES bytes, which makes the attack take many more requests. Brotli
+has no such header: it is only used with COMPRESSION_MAX_RANDOM_BYTES = 0.
+
+Settings:
+- COMPRESSION_MIN_SIZE: Smallest body, in bytes, worth compressing (default 1024).
+- COMPRESSION_CONTENT_TYPES: Content type prefixes that are compressed.
+- COMPRESSION_MAX_RANDOM_BYTES: Upper bound of the random padding (default 100, 0 disables it).
+"""
+from gzip import GzipFile
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.text import StreamingBuffer, _get_random_filename
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+# Fast levels: these responses are compressed on every request, not once ahead of time
+BROTLI_QUALITY = 4
+GZIP_LEVEL = 6
+
+DEFAULT_CONTENT_TYPES = ('application/json', 'application/x-ndjson', 'text/')
+
+
+def get_max_random_bytes():
+    return getattr(settings, 'COMPRESSION_MAX_RANDOM_BYTES', 100)
+
+
+def _gzip_compressor():
+    buffer = StreamingBuffer()
+    max_random_bytes = get_max_random_bytes()
+    # The random file name pads the header, see compress_sequence in django.utils.text
+    filename = _get_random_filename(max_random_bytes) if max_random_bytes else None
+    gzip_file = GzipFile(filename=filename, mode='wb', compresslevel=GZIP_LEVEL, fileobj=buffer, mtime=0)
+
+    def compress(data):
+        gzip_file.write(data)
+        return buffer.read()
+
+    def flush():
+        gzip_file.close()
+        return buffer.read()
+
+    return compress, flush
+
+
+def _brotli_compressor():
+    compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+    return compressor.process, compressor.finish
+
+
+def accepted_encodings(header):
+    """Returns the content codings of an Accept-Encoding header that are not refused with q=0."""
+    encodings = set()
+    for item in header.split(','):
+        coding, *params = [part.strip() for part in item.split(';')]
+        quality = next((param[2:] for param in params if param.startswith('q=')), '1')
+        try:
+            if float(quality) > 0:
+                encodings.add(coding.lower())
+        except ValueError:
+            continue
+    return encodings
+
+
+def choose_encoding(header):
+    """Returns the (name, compressor factory) to use for a request's Accept-Encoding header, or None."""
+    accepted = accepted_encodings(header)
+    if brotli is not None and not get_max_random_bytes() and accepted & {'br', '*'}:
+        return 'br', _brotli_compressor
+    if accepted & {'gzip', '*'}:
+        return 'gzip', _gzip_compressor
+    return None
+
+
+class CompressionMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.process_response(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.process_response(request, await self.get_response(request))
+
+    def process_response(self, request, response):
+        if response.has_header('Content-Encoding') or response.status_code == 304:
+            return response
+        content_type = response.get('Content-Type', '').lower()
+        if not content_type.startswith(tuple(getattr(settings, 'COMPRESSION_CONTENT_TYPES', DEFAULT_CONTENT_TYPES))):
+            return response
+        if not response.streaming and len(response.content) < getattr(settings, 'COMPRESSION_MIN_SIZE', 1024):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = choose_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if encoding is None:
+            return response
+        name, make_compressor = encoding
+        compress, flush = make_compressor()
+
+        if response.streaming:
+            compress_stream = self._compress_async_stream if response.is_async else self._compress_stream
+            response.streaming_content = compress_stream(response.streaming_content, compress, flush)
+            del response['Content-Length']
+        else:
+            response.content = compress(response.content) + flush()
+            response['Content-Length'] = str(len(response.content))
+
+        # The compressed body is not byte for byte the same representation anymore
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        response['Content-Encoding'] = name
+        return response
+
+    @staticmethod
+    def _compress_stream(chunks, compress, flush):
+        for chunk in chunks:
+            if data := compress(chunk):
+                yield data
+        yield flush()
+
+    @staticmethod
+    async def _compress_async_stream(chunks, compress, flush):
+        async for chunk in chunks:
+            if data := compress(chunk):
+                yield data
+        yield flush()
@@ -0,0 +1,210 @@
+"""
+Database configuration.
+
+`database_settings()` builds DATABASES from environment variables:
+
+- DB_ENGINE: 'sqlite' (default) or 'postgresql'.
+- DB_NAME: Database name, or the file path for SQLite (default BASE_DIR/db.sqlite3).
+- DB_USER, DB_PASSWORD, DB_HOST, DB_PORT: PostgreSQL connection parameters.
+- DB_CONN_MAX_AGE: Seconds a PostgreSQL connection is kept open between requests (default 60).
+- DB_POOL: Set to 1 to use psycopg's connection pool instead of persistent connections
+  (needs psycopg[pool]); DB_POOL_MIN_SIZE / DB_POOL_MAX_SIZE size it.
+- DB_REPLICA_HOST (PostgreSQL) or DB_REPLICA_NAME (SQLite file): Adds a 'replica' database
+  that ReplicaRouter sends the reads of the userapp GET views to.
+
+Reads are pinned to 'default' after a write, so clients see their own changes despite the
+replication lag: for the rest of the request that wrote, and for REPLICA_PIN_SECONDS after
+a POST, PUT, PATCH or DELETE for the requests with the same Authorization header.
+
+SQLite connections are tuned by `configure_sqlite` (WAL journal, larger page cache, busy timeout)
+as soon as they are opened.
+"""
+import contextvars
+import hashlib
+import os
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.db.backends.signals import connection_created
+
+
+# Set while a request that may read from the replica is being handled
+_replica_reads = contextvars.ContextVar('replica_reads', default=None)
+
+REPLICA_VIEW_MODULES = ('userapp.views', 'userapp.async_views')
+
+# Requests after which the client's reads are pinned to 'default' for REPLICA_PIN_SECONDS
+WRITE_METHODS = ('POST', 'PUT', 'PATCH', 'DELETE')
+
+
+def database_settings(base_dir):
+    engine = os.environ.get('DB_ENGINE', 'sqlite')
+    if engine == 'sqlite':
+        default = {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('DB_NAME', base_dir / 'db.sqlite3'),
+        }
+    elif engine == 'postgresql':
+        default = {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('DB_NAME', 'iveye'),
+            'USER': os.environ.get('DB_USER', ''),
+            'PASSWORD': os.environ.get('DB_PASSWORD', ''),
+            'HOST': os.environ.get('DB_HOST', ''),
+            'PORT': os.environ.get('DB_PORT', ''),
+            'CONN_HEALTH_CHECKS': True,
+            'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 60)),
+            'OPTIONS': {},
+        }
+        if os.environ.get('DB_POOL') == '1':
+            # Pooled connections are returned to the pool instead of being kept open
+            default['CONN_MAX_AGE'] = 0
+            default['OPTIONS']['pool'] = {
+                'min_size': int(os.environ.get('DB_POOL_MIN_SIZE', 2)),
+                'max_size': int(os.environ.get('DB_POOL_MAX_SIZE', 10)),
+            }
+    else:
+        raise ValueError(f"Unsupported DB_ENGINE {engine!r}, expected 'sqlite' or 'postgresql'")
+
+    databases = {'default': default}
+    replica_key = 'DB_REPLICA_NAME' if engine == 'sqlite' else 'DB_REPLICA_HOST'
+    if os.environ.get(replica_key):
+        replica = {**default, 'OPTIONS': dict(default.get('OPTIONS', {})), 'TEST': {'MIRROR': 'default'}}
+        replica['NAME' if engine == 'sqlite' else 'HOST'] = os.environ[replica_key]
+        databases['replica'] = replica
+    return databases
+
+
+def configure_sqlite(sender, connection, **kwargs):
+    """Enables WAL, so readers do not block the writer, a 64 MB page cache and a 5 s busy timeout."""
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA journal_mode=WAL')
+        cursor.execute('PRAGMA synchronous=NORMAL')
+        cursor.execute('PRAGMA cache_size=-65536')
+        cursor.execute('PRAGMA busy_timeout=5000')
+
+
+connection_created.connect(configure_sqlite)
+
+
+class ReplicaReads:
+    """The replica state of a request: `pinned` once it wrote, its next reads go to 'default'."""
+
+    __slots__ = ('pinned',)
+
+    def __init__(self):
+        self.pinned = False
+
+
+def get_pin_seconds():
+    from django.conf import settings
+
+    return getattr(settings, 'REPLICA_PIN_SECONDS', 5)
+
+
+def has_replica():
+    from django.db import connections
+
+    return 'replica' in connections.databases
+
+
+def _pin_key(request):
+    authorization = request.META.get('HTTP_AUTHORIZATION')
+    if not authorization:
+        return None
+    return 'replica-pin:' + hashlib.blake2b(authorization.encode(), digest_size=16).hexdigest()
+
+
+class ReplicaRouter:
+    """
+    Sends reads to the 'replica' database while ReplicaReadMiddleware marks the request as
+    read-only, and everything else to 'default'. Without a 'replica' database it is a no-op.
+    """
+
+    def db_for_read(self, model, **hints):
+        replica_reads = _replica_reads.get()
+        if replica_reads is not None and not replica_reads.pinned and has_replica():
+            return 'replica'
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        replica_reads = _replica_reads.get()
+        if replica_reads is not None:
+            # Read what was just written from where it was written
+            replica_reads.pinned = True
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == 'default'
+
+
+def _is_replica_view(request):
+    from django.urls import Resolver404, resolve
+
+    try:
+        view_class = getattr(resolve(request.path_info).func, 'view_class', None)
+    except Resolver404:
+        return False
+    return view_class is not None and view_class.__module__ in REPLICA_VIEW_MODULES
+
+
+class ReplicaReadMiddleware:
+    """
+    Marks GET and HEAD requests to the userapp views as allowed to read from the replica,
+    unless the same client wrote less than REPLICA_PIN_SECONDS ago.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        from django.core.cache import cache
+
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not has_replica():
+            return self.get_response(request)
+        pin_key = _pin_key(request)
+        if request.method not in ('GET', 'HEAD'):
+            response = self.get_response(request)
+            if pin_key and request.method in WRITE_METHODS:
+                cache.set(pin_key, True, timeout=get_pin_seconds())
+            return response
+        if (pin_key and cache.get(pin_key)) or not _is_replica_view(request):
+            return self.get_response(request)
+
+        token = _replica_reads.set(ReplicaReads())
+        try:
+            return self.get_response(request)
+        finally:
+            _replica_reads.reset(token)
+
+    async def __acall__(self, request):
+        from django.core.cache import cache
+
+        if not has_replica():
+            return await self.get_response(request)
+        pin_key = _pin_key(request)
+        if request.method not in ('GET', 'HEAD'):
+            response = await self.get_response(request)
+            if pin_key and request.method in WRITE_METHODS:
+                await cache.aset(pin_key, True, timeout=get_pin_seconds())
+            return response
+        if (pin_key and await cache.aget(pin_key)) or not _is_replica_view(request):
+            return await self.get_response(request)
+
+        # Copied into the context of the sync_to_async threads that run the queries
+        token = _replica_reads.set(ReplicaReads())
+        try:
+            return await self.get_response(request)
+        finally:
+            _replica_reads.reset(token)
@@ -0,0 +1,205 @@
+"""
+Per-request metrics.
+
+MetricsMiddleware records, per route, method and status code:
+- the request latency,
+- the number of database queries and the time spent in them,
+- the time spent serializing (see `serializer_timer`),
+- the response size.
+
+`metrics_view` exposes them at /metrics in the Prometheus text exposition format.
+The metrics are kept in process memory, so each worker process reports its own.
+
+When METRICS_SLOW_REQUEST_MS is set, the SQL of every request slower than that is logged
+on the 'iveye_backend.metrics.slow' logger. Only the statements with their placeholders are
+logged, never the parameters: they hold emails, password hashes and codes.
+"""
+import contextvars
+import logging
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+
+
+slow_request_logger = logging.getLogger('iveye_backend.metrics.slow')
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (100, 1000, 10_000, 100_000, 1_000_000, 10_000_000)
+
+
+class Histogram:
+    """A Prometheus style histogram with one series per label set."""
+
+    def __init__(self, name, help_text, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels, value):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * len(self.buckets), 0, 0.0]
+            bucket_counts = series[0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    bucket_counts[index] += 1
+            series[1] += 1
+            series[2] += value
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            series = sorted(self._series.items())
+            series = [(labels, list(counts), count, total) for labels, (counts, count, total) in series]
+        for labels, bucket_counts, count, total in series:
+            label_text = ','.join(f'{key}="{value}"' for key, value in labels)
+            for bound, bucket_count in zip(self.buckets, bucket_counts):
+                lines.append(f'{self.name}_bucket{{{label_text},le="{bound}"}} {bucket_count}')
+            lines.append(f'{self.name}_bucket{{{label_text},le="+Inf"}} {count}')
+            lines.append(f'{self.name}_count{{{label_text}}} {count}')
+            lines.append(f'{self.name}_sum{{{label_text}}} {total}')
+        return '\n'.join(lines)
+
+
+REQUEST_LATENCY = Histogram('http_request_duration_seconds', 'Time spent handling the request.', LATENCY_BUCKETS)
+DB_QUERIES = Histogram('http_request_db_queries', 'Database queries issued per request.', QUERY_COUNT_BUCKETS)
+DB_TIME = Histogram('http_request_db_duration_seconds', 'Time spent in database queries per request.', LATENCY_BUCKETS)
+SERIALIZER_TIME = Histogram('http_request_serializer_duration_seconds', 'Time spent serializing per request.',
+                            LATENCY_BUCKETS)
+RESPONSE_SIZE = Histogram('http_response_size_bytes', 'Size of the response body.', SIZE_BUCKETS)
+
+HISTOGRAMS = (REQUEST_LATENCY, DB_QUERIES, DB_TIME, SERIALIZER_TIME, RESPONSE_SIZE)
+
+
+class RequestStats:
+    def __init__(self, capture_sql):
+        self.queries = 0
+        self.db_time = 0.0
+        self.serializer_time = 0.0
+        self.sql = [] if capture_sql else None
+
+
+_current_stats = contextvars.ContextVar('request_stats', default=None)
+
+
+@contextmanager
+def serializer_timer():
+    """Adds the time spent in the block to the current request's serializer time."""
+    stats = _current_stats.get()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        if stats is not None:
+            stats.serializer_time += time.perf_counter() - start
+
+
+def _query_recorder(stats):
+    def record_query(execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            stats.queries += 1
+            stats.db_time += duration
+            if stats.sql is not None:
+                stats.sql.append((duration, sql))
+    return record_query
+
+
+def record_queries(stack, stats):
+    """Records the queries of every database connection of the current thread into stats until stack is closed."""
+    from django.db import connections
+
+    for connection in connections.all():
+        stack.enter_context(connection.execute_wrapper(_query_recorder(stats)))
+
+
+def get_slow_request_ms():
+    return getattr(settings, 'METRICS_SLOW_REQUEST_MS', None)
+
+
+class MetricsMiddleware:
+    """Records the metrics of every request, see the module docstring."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        stats = RequestStats(capture_sql=get_slow_request_ms() is not None)
+        token = _current_stats.set(stats)
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                record_queries(stack, stats)
+                response = self.get_response(request)
+        finally:
+            _current_stats.reset(token)
+        self.observe(request, response, stats, time.perf_counter() - start)
+        return response
+
+    async def __acall__(self, request):
+        stats = RequestStats(capture_sql=get_slow_request_ms() is not None)
+        token = _current_stats.set(stats)
+        start = time.perf_counter()
+        # The async ORM runs the queries on the request's sync_to_async thread, whose connections
+        # are not the event loop's: the recorders are installed on that thread
+        stack = ExitStack()
+        try:
+            await sync_to_async(record_queries)(stack, stats)
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(stack.close)()
+            _current_stats.reset(token)
+        self.observe(request, response, stats, time.perf_counter() - start)
+        return response
+
+    @staticmethod
+    def observe(request, response, stats, duration):
+        match = getattr(request, 'resolver_match', None)
+        route = match.route if match is not None else 'unmatched'
+        labels = (('method', request.method), ('route', route), ('status', str(response.status_code)))
+        REQUEST_LATENCY.observe(labels, duration)
+        DB_QUERIES.observe(labels, stats.queries)
+        DB_TIME.observe(labels, stats.db_time)
+        SERIALIZER_TIME.observe(labels, stats.serializer_time)
+        if not response.streaming:
+            RESPONSE_SIZE.observe(labels, len(response.content))
+
+        slow_request_ms = get_slow_request_ms()
+        if slow_request_ms is not None and stats.sql is not None and duration * 1000 >= slow_request_ms:
+            slow_request_logger.warning(
+                'Slow request %s %s took %.1f ms with %d queries', request.method, route, duration * 1000,
+                stats.queries,
+                extra={'route': route, 'duration_ms': round(duration * 1000, 1), 'db_queries': stats.queries,
+                       'db_time_ms': round(stats.db_time * 1000, 1),
+                       'sql': [{'duration_ms': round(query_time * 1000, 2), 'sql': sql}
+                               for query_time, sql in stats.sql]},
+            )
+
+
+def render_metrics():
+    return '\n'.join(histogram.render() for histogram in HISTOGRAMS) + '\n'
+
+
+def metrics_view(request):
+    """Serves the metrics to the addresses listed in METRICS_ALLOWED_IPS (default: localhost only)."""
+    if request.META.get('REMOTE_ADDR') not in getattr(settings, 'METRICS_ALLOWED_IPS', ('127.0.0.1', '::1')):
+        return HttpResponseForbidden()
+    return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -10,8 +10,10 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
+from .database import database_settings
 from .secrets import *
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -42,11 +44,16 @@ INSTALLED_APPS = [
     'django.contrib.staticfiles',
 
     'rest_framework',
-    'rest_framework_simplejwt',
+    # 'rest_framework_simplejwt' is not installed: the app only ships translations, and loading it at
+    # startup imports its settings, which pull in django.test. It is imported on the first request.
 ]
 
 MIDDLEWARE = [
+    'iveye_backend.metrics.MetricsMiddleware',
+    # Inside the metrics middleware, so the response sizes it records are the compressed ones
+    'iveye_backend.compression.CompressionMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'iveye_backend.database.ReplicaReadMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -80,13 +87,66 @@ WSGI_APPLICATION = 'iveye_backend.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+# Configured from the DB_* environment variables, see iveye_backend/database.py.
+# Without them this is the local SQLite database at BASE_DIR / 'db.sqlite3'.
+DATABASES = database_settings(BASE_DIR)
+
+DATABASE_ROUTERS = ['iveye_backend.database.ReplicaRouter']
+
+# Seconds the reads of a client stay on 'default' after it wrote, longer than the replication lag
+REPLICA_PIN_SECONDS = 5
+
+
+# Password hashing
+# PASSWORD_HASHER picks the hasher new hashes are made with ('pbkdf2', 'scrypt' or 'argon2',
+# the latter needs argon2-cffi). The others stay listed so existing hashes keep working;
+# they are upgraded to the preferred hasher on the next successful login.
+
+_PASSWORD_HASHERS = {
+    'pbkdf2': 'userapp.hashers.TunedPBKDF2PasswordHasher',
+    'scrypt': 'userapp.hashers.TunedScryptPasswordHasher',
+    'argon2': 'userapp.hashers.TunedArgon2PasswordHasher',
 }
+PASSWORD_HASHER = os.environ.get('PASSWORD_HASHER', 'pbkdf2')
+PASSWORD_HASHERS = [_PASSWORD_HASHERS[PASSWORD_HASHER]] + [
+    hasher for name, hasher in _PASSWORD_HASHERS.items() if name != PASSWORD_HASHER
+]
 
+# Work factors, see userapp/hashers.py. Unset values use Django's defaults.
+# PASSWORD_PBKDF2_ITERATIONS = 870000
+# PASSWORD_SCRYPT_WORK_FACTOR = 2 ** 14
+# PASSWORD_ARGON2_TIME_COST = 2
+# PASSWORD_ARGON2_MEMORY_COST = 102400
+
+# Number of processes hashing passwords for login and registration, 0 hashes in the request thread
+PASSWORD_HASHING_WORKERS = int(os.environ.get('PASSWORD_HASHING_WORKERS', 0))
+
+# Failed login limits, see userapp/login_guard.py. The account limit counts the failures of
+# each client IP separately, so nobody can lock another user out.
+LOGIN_ATTEMPT_WINDOW = 15 * 60
+LOGIN_MAX_FAILURES_PER_ACCOUNT_AND_IP = 5
+LOGIN_MAX_FAILURES_PER_IP = 50
+
+
+# One-time codes for password resets, see userapp/otp.py
+OTP_LENGTH = 6
+OTP_TTL = 10 * 60
+OTP_MAX_ATTEMPTS = 5
+OTP_RESEND_INTERVAL = 60
+OTP_ISSUE_WINDOW = 60 * 60
+OTP_MAX_ISSUES_PER_WINDOW = 5
+
+# Emails are sent by the background task worker, see userapp/outbox.py. The console backend prints them;
+# use 'django.core.mail.backends.smtp.EmailBackend' (with the EMAIL_HOST_* settings) in production.
+EMAIL_BACKEND = os.environ.get('EMAIL_BACKEND', 'django.core.mail.backends.console.EmailBackend')
+DEFAULT_FROM_EMAIL = os.environ.get('DEFAULT_FROM_EMAIL', 'no-reply@iveye.local')
+
+# Background tasks, see userapp/taskqueue.py. Queued tasks are run by `python manage.py run_task_worker`;
+# with TASK_QUEUE_EAGER they run in the request thread after the commit instead, without a worker.
+TASK_QUEUE_EAGER = os.environ.get('TASK_QUEUE_EAGER') == '1'
+# Seconds a worker holds a task before another worker may take it over. The worker renews the
+# lease every third of it while the task runs, so only the tasks of a dead worker are taken over.
+TASK_QUEUE_LEASE = 300
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -141,8 +201,30 @@ AUTH_USER_MODEL = 'userapp.UserDetails'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'userapp.authentication.StatelessJWTAuthentication',
+    ),
+    # Default page size of the cursor paginated listings, see userapp.pagination
+    'DEFAULT_PAGINATION_CLASS': 'userapp.pagination.KeysetPagination',
+    'PAGE_SIZE': 100,
+    # orjson when it is installed, DRF's stdlib json otherwise, see userapp.renderers
+    'DEFAULT_RENDERER_CLASSES': (
+        'userapp.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
     ),
+    'DEFAULT_PARSER_CLASSES': (
+        'userapp.renderers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ),
+    # Token bucket rate limits per route, user and IP, see userapp.throttling and THROTTLE_RATES
+    'DEFAULT_THROTTLE_CLASSES': (
+        'userapp.throttling.TokenBucketThrottle',
+    ),
+    # Number of trusted reverse proxies in front of the app. With 0 the client IP used by the
+    # throttles and the login guard is REMOTE_ADDR and X-Forwarded-For is ignored: clients can
+    # set it to anything. Only raise it behind a known proxy that sets X-Forwarded-For, to the
+    # number of proxies, so the address added by the outermost one is used.
+    'NUM_PROXIES': 0,
     # 'DEFAULT_PERMISSION_CLASSES': [
     #     'rest_framework.permissions.IsAuthenticated',
     # ],
@@ -152,4 +234,105 @@ from datetime import timedelta
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(days=1),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=7),
-}
\ No newline at end of file
+    # Build request.user from the token claims instead of loading UserDetails on every request
+    'TOKEN_USER_CLASS': 'userapp.authentication.TokenBackedUser',
+}
+
+# Token revocation (logout), see userapp/revocation.py. Revocations made by another process
+# take effect after at most REVOCATION_SYNC_INTERVAL seconds.
+REVOCATION_SYNC_INTERVAL = 5
+REVOCATION_COMPACT_INTERVAL = 60 * 60
+
+CACHES = {
+    'default': {
+        # Any cache backend works, e.g. FileBasedCache to share entries between local workers
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+# Rate limits, see userapp/throttling.py. Each view's `throttle_scope` ('default' if it has none)
+# has token bucket rates per client IP, per authenticated user and for the whole scope ('global').
+# THROTTLE_BACKEND 'local' keeps the buckets in each process; 'cache' keeps them in the
+# THROTTLE_CACHE_ALIAS cache, which must be shared by the workers (Redis, Memcached...) for the
+# limits to hold across them.
+THROTTLE_RATES = {
+    'default': {'user': '600/m', 'ip': '3000/m'},
+    'register': {'ip': '10/h', 'global': '120/m'},
+    'login': {'ip': '30/m', 'global': '1200/m'},
+    'password_reset': {'ip': '20/h', 'global': '300/m'},
+}
+THROTTLE_BACKEND = 'local'
+THROTTLE_CACHE_ALIAS = 'default'
+THROTTLE_LOCAL_MAX_ENTRIES = 100_000
+
+# Seconds a rendered user profile stays in the cache, see userapp.profile_cache
+PROFILE_CACHE_TIMEOUT = 300
+
+# Names of the userapp routes served by the async views in userapp/async_views.py,
+# e.g. {'user_profile_details', 'user_specific_topic'}. Only useful when running under ASGI.
+# The async 'user_login' waits for the PASSWORD_HASHING_WORKERS pool without holding a thread.
+USERAPP_ASYNC_ROUTES = set()
+
+# Profile image pipeline, see userapp/images.py. Uploads are re-encoded without metadata and downscaled
+# to PROFILE_IMAGE_MAX_SIZE pixels by a background task; the PROFILE_IMAGE_DEFAULT_SIZE variant is the profile image.
+PROFILE_IMAGE_VARIANT_SIZES = (64, 256, 512)
+PROFILE_IMAGE_DEFAULT_SIZE = 256
+PROFILE_IMAGE_MAX_SIZE = 2048
+
+# In-process cache of UserDetails rows used when a view needs the full model
+USER_DETAILS_CACHE_TTL = 30
+USER_DETAILS_CACHE_MAX_ENTRIES = 1024
+
+# Maximum number of operations in one custom lesson batch, see userapp/lesson_batch.py
+LESSON_BATCH_MAX_OPERATIONS = 500
+
+# Delta sync, see userapp/sync.py. Above SYNC_MAX_CHANGES changes per listing the client refetches
+# the full listing instead; purge_tombstones deletes tombstones older than the retention period.
+SYNC_MAX_CHANGES = 1000
+SYNC_TOMBSTONE_RETENTION_DAYS = 30
+
+# User purges, see userapp/purge.py: related rows are deleted this many at a time, with a pause
+# of PURGE_CHUNK_PAUSE seconds between the chunks
+PURGE_CHUNK_SIZE = 1000
+PURGE_CHUNK_PAUSE = 0.05
+
+# Data exports, see userapp/export.py: rows read from the database at a time
+EXPORT_CHUNK_SIZE = 2000
+
+# Response compression, see iveye_backend/compression.py. Gzip responses are padded with up to
+# COMPRESSION_MAX_RANDOM_BYTES random bytes against BREACH; Brotli, when the brotli package is
+# installed, can not be padded and is only used with COMPRESSION_MAX_RANDOM_BYTES = 0.
+COMPRESSION_MIN_SIZE = 1024
+COMPRESSION_CONTENT_TYPES = ('application/json', 'application/x-ndjson', 'text/')
+COMPRESSION_MAX_RANDOM_BYTES = 100
+
+# Popularity counters, see userapp/analytics.py. Each process queues its buffered counts at most
+# this many seconds after they change, and the task worker applies them: without a worker the
+# counters stay put unless TASK_QUEUE_EAGER is set. The top-N endpoints return at most ANALYTICS_TOP_MAX rows.
+ANALYTICS_FLUSH_INTERVAL = 10
+ANALYTICS_TOP_MAX = 100
+# Seconds the ids of the applied count batches are kept to skip a batch whose task runs twice
+ANALYTICS_BATCH_RETENTION = 24 * 60 * 60
+
+# Request metrics, served at /metrics, see iveye_backend/metrics.py
+METRICS_ALLOWED_IPS = ('127.0.0.1', '::1')
+# Requests slower than this many milliseconds get their SQL logged, None disables the sampler
+METRICS_SLOW_REQUEST_MS = None
+
+# Admin listings of large tables count filtered results up to this many rows, see userapp/admin.py
+ADMIN_EXACT_COUNT_LIMIT = 10000
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'json': {'()': 'iveye_backend.log.JsonFormatter'},
+    },
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler', 'formatter': 'json'},
+    },
+    'loggers': {
+        'userapp': {'handlers': ['console'], 'level': 'INFO'},
+        'iveye_backend': {'handlers': ['console'], 'level': 'INFO'},
+    },
+}
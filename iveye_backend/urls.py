@@ -17,7 +17,10 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include
 
+from iveye_backend.metrics import metrics_view
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('userapp/',include('userapp.urls')),
+    path('metrics', metrics_view, name='metrics'),
 ]
@@ -1,6 +1,148 @@
+from django.conf import settings
 from django.contrib import admin
+from django.contrib.admin.views.main import ChangeList
+from django.core.paginator import Paginator
+from django.db import connection
+from django.utils.functional import cached_property
 
-from .models import UserDetails, UserLearningTopic
+from .models import UserDetails, Topic, UserLearningTopic, UserCreatedLessons, QueuedTask
+from .search import filter_users
 
-admin.site.register(UserDetails)
-admin.site.register(UserLearningTopic)
\ No newline at end of file
+
+CURSOR_VAR = 'after'
+
+
+def estimated_row_count(model):
+    """Returns the approximate number of rows of the model's table without scanning it, or None."""
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass', [model._meta.db_table])
+            row = cursor.fetchone()
+            return row[0] if row and row[0] >= 0 else None
+    # The highest id, read from the primary key index; over-counts deleted rows
+    return model._default_manager.order_by('-pk').values_list('pk', flat=True).first() or 0
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    A paginator that never counts a large table row by row.
+
+    Unfiltered listings use the table's estimated size; filtered ones are counted up to
+    ADMIN_EXACT_COUNT_LIMIT rows.
+    """
+
+    @cached_property
+    def count(self):
+        limit = getattr(settings, 'ADMIN_EXACT_COUNT_LIMIT', 10000)
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimated_row_count(queryset.model)
+            if estimate is not None and estimate > limit:
+                return estimate
+        return queryset[:limit + 1].count()
+
+
+class KeysetChangeList(ChangeList):
+    """
+    A changelist that pages by primary key (?after=<id>, newest first) instead of with OFFSET,
+    so every page costs the same however deep it is.
+    """
+
+    def __init__(self, request, *args, **kwargs):
+        self.after = None
+        if CURSOR_VAR in request.GET:
+            # Not a field lookup, keep it away from the changelist's filters
+            request.GET = request.GET.copy()
+            after = request.GET.pop(CURSOR_VAR)[-1]
+            self.after = int(after) if after.isdigit() else None
+        super().__init__(request, *args, **kwargs)
+
+    def get_queryset(self, request, exclude_parameters=None):
+        queryset = super().get_queryset(request, exclude_parameters)
+        # Only on the listing: the change form and its save need every column
+        if self.model_admin.list_only:
+            queryset = queryset.only(*self.model_admin.list_only)
+        return queryset
+
+    def get_results(self, request):
+        paginator = self.model_admin.get_paginator(request, self.queryset, self.list_per_page)
+        self.result_count = paginator.count
+        self.show_full_result_count = False
+        self.full_result_count = None
+        self.can_show_all = False
+        self.show_all = False
+        self.paginator = paginator
+
+        queryset = self.queryset if self.after is None else self.queryset.filter(pk__lt=self.after)
+        results = list(queryset[:self.list_per_page + 1])
+        self.multi_page = len(results) > self.list_per_page
+        self.result_list = results[:self.list_per_page]
+
+    @property
+    def next_page_url(self):
+        if not self.multi_page:
+            return None
+        return self.get_query_string({CURSOR_VAR: self.result_list[-1].pk})
+
+    @property
+    def first_page_url(self):
+        return self.get_query_string() if self.after is not None else None
+
+
+class KeysetModelAdmin(admin.ModelAdmin):
+    """
+    Admin for large tables: estimated counts, no full result count and keyset pagination.
+    The rows are always listed newest first, as the keyset pagination needs a primary key order.
+    `list_only` restricts the columns the listing loads, e.g. to the ones of `list_display`.
+    """
+
+    change_list_template = 'admin/userapp/keyset_change_list.html'
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    ordering = ('-pk',)
+    sortable_by = ()
+    list_only = ()
+
+    def get_changelist(self, request, **kwargs):
+        return KeysetChangeList
+
+
+class UserContentAdmin(KeysetModelAdmin):
+    raw_id_fields = ('user',)
+
+    def delete_queryset(self, request, queryset):
+        # Leave tombstones behind, like the API, so the deletes reach the clients' delta sync
+        for user_id in set(queryset.values_list('user_id', flat=True)):
+            queryset.filter(user_id=user_id).tombstone(user_id)
+
+
+@admin.register(UserDetails)
+class UserDetailsAdmin(KeysetModelAdmin):
+    list_display = ('id', 'email', 'first_name', 'last_name', 'phone_number', 'date_joined', 'is_active')
+    search_fields = ('email', 'first_name', 'last_name', 'phone_number')
+    search_help_text = 'Matches the beginning of the words of the email, names and phone number.'
+
+    def get_search_results(self, request, queryset, search_term):
+        # Served from the UserSearchTerm index instead of LIKE '%term%' scans
+        if not search_term:
+            return queryset, False
+        return filter_users(queryset, search_term), False
+
+
+@admin.register(UserLearningTopic)
+class UserLearningTopicAdmin(UserContentAdmin):
+    list_display = ('id', 'user', 'topic', 'updated_at')
+    list_select_related = ('user', 'topic')
+    raw_id_fields = ('user', 'topic')
+    list_only = ('id', 'updated_at', 'user__email', 'topic__name')
+
+
+@admin.register(UserCreatedLessons)
+class UserCreatedLessonsAdmin(UserContentAdmin):
+    list_display = ('id', 'user', 'lesson_name', 'updated_at')
+    list_select_related = ('user',)
+    list_only = ('id', 'lesson_name', 'updated_at', 'user__email')
+
+
+admin.site.register(Topic)
+admin.site.register(QueuedTask)
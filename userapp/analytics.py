@@ -0,0 +1,180 @@
+"""
+Topic and custom lesson popularity counters.
+
+Counting how many users learn a topic, or the most common lesson names, with a GROUP BY
+over the content tables gets slower as they grow. Instead the counts are kept in
+`Topic.learner_count` and the LessonNameStat table, and the top N are read from the top
+of their indexes.
+
+Creating and deleting topics and custom lessons record +1/-1 deltas (see signals.py) in
+`counter_buffer`, an in-memory buffer of the process, once their transaction commits. A timer
+thread hands the buffer to the `apply_counter_deltas` task at most ANALYTICS_FLUSH_INTERVAL
+seconds later; the task writes it with one UPDATE ... SET count = count + n per distinct delta,
+so a popular topic costs one write per process and interval instead of one per request.
+Every flush is a batch with its own id, recorded in AppliedCounterBatch by the transaction
+that applies it: a task that runs again, e.g. because its worker died after the commit,
+finds its batch applied and changes nothing.
+
+The counters only move while a task worker runs (`run_task_worker`): the flushes of the
+web processes queue tasks, they do not write the counters themselves. Without a worker, set
+TASK_QUEUE_EAGER and every flush applies its deltas in the timer thread instead. Each process
+that records a change starts one timer thread per interval, and registers an atexit hook
+that flushes what is left when the process exits normally, which is a database write (the
+queued task or, with TASK_QUEUE_EAGER, the counter UPDATEs) in every such process, including
+management commands.
+
+The counters are approximate: the deltas buffered by a process that dies are lost, renaming
+a single lesson outside the batch endpoint and deleting users are not counted. The
+rebuild_analytics command recomputes them from the content tables.
+"""
+import atexit
+import logging
+import threading
+import uuid
+from collections import Counter, defaultdict
+from datetime import timedelta
+from functools import partial
+
+from django.conf import settings
+from django.db import IntegrityError, connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from userapp.models import AppliedCounterBatch, LessonNameStat, Topic, UserCreatedLessons, UserLearningTopic
+from userapp.taskqueue import task
+
+
+logger = logging.getLogger(__name__)
+
+MAX_LESSON_NAME_LENGTH = LessonNameStat._meta.get_field('name').max_length
+
+
+def lesson_name_key(name):
+    """Returns the name lessons are counted under: lowercased, with the whitespace collapsed."""
+    return ' '.join(str(name).split()).lower()[:MAX_LESSON_NAME_LENGTH]
+
+
+# Counter kind and key function of each counted model
+COUNTED_MODELS = {
+    UserLearningTopic: ('topics', int),
+    UserCreatedLessons: ('lesson_names', lesson_name_key),
+}
+
+
+class CounterBuffer:
+    def __init__(self):
+        self._deltas = defaultdict(Counter)
+        self._timer = None
+        self._lock = threading.Lock()
+
+    @property
+    def flush_interval(self):
+        return getattr(settings, 'ANALYTICS_FLUSH_INTERVAL', 10)
+
+    def add(self, kind, deltas):
+        """Adds the {key: delta} of a committed change; the buffer is flushed at most flush_interval seconds later."""
+        with self._lock:
+            self._deltas[kind].update(deltas)
+            if self._timer is None:
+                self._timer = threading.Timer(self.flush_interval, self._flush_in_background)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def take(self):
+        """Empties the buffer and returns its non-zero deltas as {kind: [[key, delta], ...]}."""
+        with self._lock:
+            deltas, self._deltas, self._timer = self._deltas, defaultdict(Counter), None
+        return {kind: [[key, delta] for key, delta in counter.items() if delta]
+                for kind, counter in deltas.items()}
+
+    def flush(self):
+        deltas = {kind: pairs for kind, pairs in self.take().items() if pairs}
+        if not deltas:
+            return
+        try:
+            if getattr(settings, 'TASK_QUEUE_EAGER', False):
+                # No worker: apply them here, in the timer thread or at exit
+                apply_counter_deltas(batch_id=str(uuid.uuid4()), **deltas)
+            else:
+                apply_counter_deltas.delay(batch_id=str(uuid.uuid4()), **deltas)
+        except Exception:
+            # Keep the deltas for the next flush rather than losing them
+            for kind, pairs in deltas.items():
+                self.add(kind, dict(pairs))
+            raise
+
+    def _flush_in_background(self):
+        try:
+            self.flush()
+        except Exception:
+            logger.exception('Could not flush the analytics counters')
+        finally:
+            # The timer thread opened its own connection
+            connections.close_all()
+
+
+counter_buffer = CounterBuffer()
+
+
+def record_changes(model, added=(), removed=()):
+    """Buffers the counter changes of created (`added`) and deleted (`removed`) rows once the transaction commits."""
+    kind, key = COUNTED_MODELS[model]
+    deltas = Counter(key(value) for value in added if value is not None)
+    deltas.subtract(key(value) for value in removed if value is not None)
+    if any(deltas.values()):
+        transaction.on_commit(partial(counter_buffer.add, kind, deltas))
+
+
+def _by_delta(pairs):
+    keys_by_delta = defaultdict(list)
+    for key, delta in pairs:
+        keys_by_delta[delta].append(key)
+    # Always touch the rows in the same order, so concurrent flushes do not deadlock on them
+    return sorted((delta, sorted(keys)) for delta, keys in keys_by_delta.items())
+
+
+def get_batch_retention():
+    """Seconds the applied batch ids are kept, longer than a task can take to be retried."""
+    return getattr(settings, 'ANALYTICS_BATCH_RETENTION', 24 * 60 * 60)
+
+
+@task(max_attempts=5)
+def apply_counter_deltas(batch_id=None, topics=(), lesson_names=()):
+    """
+    Adds buffered deltas to the counters, as lists of [topic id or lesson name key, delta],
+    unless the batch `batch_id` was already applied.
+    """
+    with transaction.atomic():
+        if batch_id is not None:
+            try:
+                with transaction.atomic():
+                    AppliedCounterBatch.objects.create(batch_id=batch_id)
+            except IntegrityError:
+                logger.info('Counter batch already applied', extra={'batch_id': batch_id})
+                return
+            AppliedCounterBatch.objects.filter(
+                applied_at__lt=timezone.now() - timedelta(seconds=get_batch_retention())).delete()
+        for delta, topic_ids in _by_delta(topics):
+            Topic.objects.filter(id__in=topic_ids).update(learner_count=F('learner_count') + delta)
+        LessonNameStat.objects.bulk_create([LessonNameStat(name=name) for name, delta in lesson_names],
+                                           ignore_conflicts=True)
+        for delta, names in _by_delta(lesson_names):
+            LessonNameStat.objects.filter(name__in=names).update(lesson_count=F('lesson_count') + delta)
+
+
+@atexit.register
+def _flush_on_exit():
+    try:
+        counter_buffer.flush()
+    except Exception:
+        logger.exception('Could not flush the analytics counters')
+
+
+def top_topics(limit):
+    return list(Topic.objects.filter(learner_count__gt=0).order_by('-learner_count', 'id')
+                .values('name', 'slug', 'learner_count')[:limit])
+
+
+def top_lesson_names(limit):
+    return list(LessonNameStat.objects.filter(lesson_count__gt=0).order_by('-lesson_count', 'id')
+                .values('name', 'lesson_count')[:limit])
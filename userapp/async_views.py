@@ -0,0 +1,247 @@
+"""
+Async (ASGI-native) counterparts of the userapp API views.
+
+These views are plain Django async views, so under an ASGI server they run on the
+event loop instead of taking a thread from the sync_to_async pool. They use the
+async ORM and the stateless JWT authentication, which never touches the database.
+They return the same payloads and status codes as the sync views in views.py.
+
+Which routes use them is chosen per route with the USERAPP_ASYNC_ROUTES setting (see urls.py).
+"""
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser, update_last_login
+from django.db import IntegrityError
+from django.http import HttpResponse
+from django.views import View
+from rest_framework import status
+from rest_framework.exceptions import APIException, AuthenticationFailed
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+from rest_framework.views import APIView
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+from . import login_guard
+from .authentication import StatelessJWTAuthentication
+from .etags import content_etag, etag_matches
+from .hashers import amake_password
+from .lesson_batch import clean_lesson_name
+from .pagination import KeysetPagination
+from .profile_cache import aget_profile_json
+from .renderers import FastJsonResponse, loads
+from .revocation import revocation_list
+from .serializers import CustomTokenObtainPairSerializer, UserLearningTopicSerializer, UserCreatedLessonsSerializer
+from userapp.models import (UserDetails, UserLearningTopic, UserCreatedLessons)
+
+
+class AsyncAPIView(View):
+    """
+    Base class of the async views.
+
+    Authenticates every request with StatelessJWTAuthentication (equivalent of
+    `permission_classes = [IsAuthenticated]`, or of `[AllowAny]` with
+    `authentication_required = False`), throttles it with the DRF throttles
+    and turns DRF API exceptions into JSON error responses.
+    """
+
+    authentication = StatelessJWTAuthentication()
+    authentication_required = True
+    throttle_classes = api_settings.DEFAULT_THROTTLE_CLASSES
+    # The revocation list is synced in dispatch, outside the event loop
+    authentication.sync_revocations = False
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        view = super().as_view(**initkwargs)
+        # Token authenticated API, like DRF's APIView
+        view.csrf_exempt = True
+        return view
+
+    async def dispatch(self, request, *args, **kwargs):
+        if revocation_list.sync_due():
+            await sync_to_async(revocation_list.sync_if_due)()
+        try:
+            user_auth = self.authentication.authenticate(request)
+            if user_auth is None:
+                if self.authentication_required:
+                    return self.error_response('Authentication credentials were not provided.',
+                                               status.HTTP_401_UNAUTHORIZED)
+                user_auth = AnonymousUser(), None
+            request.user, request.auth = user_auth
+            if getattr(settings, 'THROTTLE_BACKEND', 'local') == 'local':
+                self.check_throttles(request)
+            else:
+                # The cache buckets may be across the network
+                await sync_to_async(self.check_throttles)(request)
+            return await super().dispatch(request, *args, **kwargs)
+        except APIException as e:
+            response = self.error_response(e.detail, e.status_code)
+            # Same header as DRF's exception handler
+            if getattr(e, 'wait', None):
+                response['Retry-After'] = '%d' % e.wait
+            return response
+
+    # Same throttling as the sync views
+    get_throttles = APIView.get_throttles
+    check_throttles = APIView.check_throttles
+    throttled = APIView.throttled
+
+    def error_response(self, detail, status_code):
+        # Same body as DRF's exception handler
+        data = detail if isinstance(detail, (list, dict)) else {'detail': detail}
+        response = FastJsonResponse(data, status=status_code)
+        if status_code == status.HTTP_401_UNAUTHORIZED:
+            response['WWW-Authenticate'] = self.authentication.authenticate_header(self.request)
+        return response
+
+    def get_data(self):
+        if self.request.content_type == 'application/json':
+            try:
+                return loads(self.request.body or b'{}')
+            except ValueError:
+                return {}
+        return self.request.POST
+
+
+class AsyncCustomTokenObtainPairView(AsyncAPIView):
+    """
+    Async version of CustomTokenObtainPairView. The password is hashed in the hashing pool
+    (see userapp.hashers) while the event loop serves other requests.
+    """
+
+    authentication_required = False
+    throttle_scope = 'login'
+
+    async def post(self, request):
+        data = self.get_data()
+        email, password = data.get('email'), data.get('password')
+        if not email or not password:
+            return FastJsonResponse({'email': ['This field is required.'], 'password': ['This field is required.']}
+                                , status=status.HTTP_400_BAD_REQUEST)
+        # REMOTE_ADDR, X-Forwarded-For is only trusted behind REST_FRAMEWORK['NUM_PROXIES'] proxies
+        ip = BaseThrottle().get_ident(request)
+        retry_after = await sync_to_async(login_guard.blocked_for)(email, ip)
+        if retry_after:
+            return FastJsonResponse({'message': 'Too many failed login attempts, please try again later.'}
+                                , status=status.HTTP_429_TOO_MANY_REQUESTS, headers={'Retry-After': str(retry_after)})
+
+        try:
+            user = await UserDetails.objects.aget(email=email)
+        except UserDetails.DoesNotExist:
+            # Hash anyway, like Django's ModelBackend, so the response time does not tell the account exists
+            await amake_password(password)
+            user = None
+        if user is None or not await user.acheck_password(password) or not user.is_active:
+            await sync_to_async(login_guard.record_failure)(email, ip)
+            raise AuthenticationFailed(CustomTokenObtainPairSerializer.default_error_messages['no_active_account'],
+                                       'no_active_account')
+        await sync_to_async(login_guard.record_success)(email, ip)
+
+        refresh = CustomTokenObtainPairSerializer.get_token(user)
+        if jwt_settings.UPDATE_LAST_LOGIN:
+            await sync_to_async(update_last_login)(None, user)
+        return FastJsonResponse({'refresh': str(refresh), 'access': str(refresh.access_token)}
+                                , status=status.HTTP_200_OK)
+
+
+class AsyncUserProfileView(AsyncAPIView):
+    """Async version of UserProfileView."""
+
+    async def get(self, request):
+        try:
+            return HttpResponse(await aget_profile_json(request.user.id), content_type='application/json')
+        except UserDetails.DoesNotExist:
+            return FastJsonResponse({'message': 'User does not exist', 'error': 'User data not found'}
+                                , status=status.HTTP_404_NOT_FOUND)
+
+
+class AsyncUserContentListView(AsyncAPIView):
+    """Async version of UserContentListView."""
+
+    pagination_class = KeysetPagination
+    listing = None
+    serializer_class = None
+
+    def get_queryset(self):
+        raise NotImplementedError
+
+    async def get(self, request):
+        version = await UserDetails.objects.aget_content_version(request.user.id)
+        etag = content_etag(request, self.listing, version)
+        if etag_matches(request, etag):
+            response = HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+            response['ETag'] = etag
+            return response
+
+        paginator = self.pagination_class()
+        page = await paginator.apaginate_queryset(self.get_queryset(), request)
+        serialized_data = self.serializer_class(page, many=True)
+        response = FastJsonResponse(paginator.get_paginated_data(serialized_data.data))
+        response['ETag'] = etag
+        return response
+
+
+class AsyncGetUserSpecificTopics(AsyncUserContentListView):
+    """Async version of GetUserSpecificTopics."""
+
+    listing = 'topics'
+    serializer_class = UserLearningTopicSerializer
+
+    def get_queryset(self):
+        return UserLearningTopic.objects.filter(user_id=self.request.user.id).select_related('topic')
+
+
+class AsyncGetAllUserSpecificCustomLesson(AsyncUserContentListView):
+    """Async version of GetAllUserSpecificCustomLesson."""
+
+    listing = 'lessons'
+    serializer_class = UserCreatedLessonsSerializer
+
+    def get_queryset(self):
+        return UserCreatedLessons.objects.filter(user_id=self.request.user.id)
+
+
+class AsyncDeleteUserTopicsView(AsyncAPIView):
+    """Async version of DeleteUserTopicsView."""
+
+    async def delete(self, request, topic_id):
+        topics = UserLearningTopic.objects.filter(id=topic_id, user_id=request.user.id)
+        if await sync_to_async(topics.tombstone)(request.user.id):
+            return FastJsonResponse({'message': 'Topic deleted successfully'}
+                                , status=status.HTTP_200_OK)
+        return FastJsonResponse({"message": "Action can't be completed"}
+                            , status=status.HTTP_400_BAD_REQUEST)
+
+
+class AsyncUserAddYourOwnLessonView(AsyncAPIView):
+    """Async version of UserAddYourOwnLessonView."""
+
+    async def post(self, request):
+        try:
+            lesson = clean_lesson_name(self.get_data().get('lesson_name'))
+        except ValueError as e:
+            return FastJsonResponse({'message': str(e)}
+                                , status=status.HTTP_400_BAD_REQUEST)
+        try:
+            await UserCreatedLessons.objects.acreate(user_id=request.user.id, lesson_name=lesson)
+            return FastJsonResponse({'message': 'Your custom lesson added successfully'}
+                                , status=status.HTTP_201_CREATED)
+        except UserDetails.DoesNotExist:
+            return FastJsonResponse({"message": "User not found"}
+                                , status=status.HTTP_404_NOT_FOUND)
+        except IntegrityError:
+            # Deleted between the version bump and the INSERT; any other constraint is a bug
+            if await UserDetails.objects.filter(id=request.user.id).aexists():
+                raise
+            return FastJsonResponse({"message": "User not found"}
+                                , status=status.HTTP_404_NOT_FOUND)
+
+    async def delete(self, request, user_lesson_id):
+        try:
+            lesson = await UserCreatedLessons.objects.aget(id=user_lesson_id, user_id=request.user.id)
+            await lesson.adelete()
+            return FastJsonResponse({'message': 'Your custom lesson deleted successfully'}
+                                , status=status.HTTP_200_OK)
+        except UserCreatedLessons.DoesNotExist:
+            return FastJsonResponse({"message": "Action can't be completed"}
+                                , status=status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,110 @@
+import copy
+import threading
+import time
+
+from django.conf import settings
+from django.utils.functional import cached_property
+from rest_framework_simplejwt.authentication import JWTStatelessUserAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.models import TokenUser
+
+from userapp.revocation import revocation_list
+
+
+class UserDetailsCache:
+    """
+    A small in-process cache of UserDetails rows keyed by user id.
+
+    Entries expire after `ttl` seconds and the cache never holds more than
+    `max_entries` rows; the oldest entry is evicted first. Callers always get
+    a copy of the cached instance, so mutating it cannot leak into other requests.
+
+    Settings:
+    - USER_DETAILS_CACHE_TTL: Seconds a cached row stays valid (default 30).
+    - USER_DETAILS_CACHE_MAX_ENTRIES: Maximum number of cached rows (default 1024).
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    @property
+    def ttl(self):
+        return getattr(settings, 'USER_DETAILS_CACHE_TTL', 30)
+
+    @property
+    def max_entries(self):
+        return getattr(settings, 'USER_DETAILS_CACHE_MAX_ENTRIES', 1024)
+
+    def get(self, user_id):
+        """Return the UserDetails row for `user_id`, raising UserDetails.DoesNotExist if it is gone."""
+        from userapp.models import UserDetails
+
+        now = time.monotonic()
+        entry = self._entries.get(user_id)
+        if entry is not None and entry[0] > now:
+            return copy.copy(entry[1])
+
+        user = UserDetails.objects.get(id=user_id)
+        with self._lock:
+            self._entries.pop(user_id, None)
+            while len(self._entries) >= self.max_entries:
+                self._entries.pop(next(iter(self._entries)))
+            self._entries[user_id] = (now + self.ttl, user)
+        return copy.copy(user)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+user_details_cache = UserDetailsCache()
+
+
+class TokenBackedUser(TokenUser):
+    """
+    A lightweight user built from the claims of a validated access token.
+
+    `id` and `email` come straight from the token (see CustomTokenObtainPairSerializer.get_token),
+    so reading them costs no query. The full UserDetails row is only loaded, through
+    `user_details_cache`, when a view asks for `details`.
+    """
+
+    @cached_property
+    def email(self):
+        email = self.token.get('email')
+        if email is None:
+            # Tokens issued before the email claim was added
+            email = self.details.email
+        return email
+
+    @cached_property
+    def details(self):
+        return user_details_cache.get(self.id)
+
+
+class StatelessJWTAuthentication(JWTStatelessUserAuthentication):
+    """
+    Authenticates requests from the JWT alone, without loading UserDetails.
+
+    Revoked tokens are rejected using the in-memory `revocation_list` (see userapp.revocation),
+    which is synced from the database at most every REVOCATION_SYNC_INTERVAL seconds.
+    Set `sync_revocations` to False where the database can not be queried (async views);
+    the caller must then sync the list itself.
+
+    Note that a user deactivated after a token was issued keeps access until that token expires.
+    """
+
+    sync_revocations = True
+
+    def get_validated_token(self, raw_token):
+        token = super().get_validated_token(raw_token)
+        if self.sync_revocations:
+            revocation_list.sync_if_due()
+        if revocation_list.is_revoked(token):
+            raise InvalidToken('Token has been revoked')
+        return token
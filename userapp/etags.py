@@ -0,0 +1,23 @@
+import hashlib
+
+from django.utils.http import parse_etags
+
+
+def content_etag(request, listing, version):
+    """
+    Returns a weak ETag for one of the user's listings.
+
+    The ETag only depends on the user's `content_version` and the query string,
+    so it can be computed without reading the listed rows.
+    """
+    key = f'{listing}:{request.user.id}:{version}:{request.META.get("QUERY_STRING", "")}'
+    return 'W/"%s"' % hashlib.sha1(key.encode()).hexdigest()
+
+
+def etag_matches(request, etag):
+    """Returns True if the request's If-None-Match header matches `etag` (weak comparison)."""
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if not if_none_match:
+        return False
+    etags = parse_etags(if_none_match)
+    return '*' in etags or etag.removeprefix('W/') in (tag.removeprefix('W/') for tag in etags)
@@ -0,0 +1,113 @@
+"""
+Streaming data exports.
+
+An export holds the profile, topics and custom lessons of one user, or of every user, as
+NDJSON: one JSON object per line with a `type` of 'user', 'topic' or 'lesson'. The 'zip'
+format puts the three record types in users.ndjson, topics.ndjson and lessons.ndjson inside
+a zip archive.
+
+The rows are read with `.values().iterator(chunk_size=EXPORT_CHUNK_SIZE)`, a table at a
+time, and written out as they are read, so the memory used does not depend on the amount
+of data exported. The zip archive is written to the response as it is built; its entries
+carry their sizes after their data, it never needs to seek.
+"""
+import io
+import zipfile
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F
+
+from userapp.models import UserCreatedLessons, UserDetails, UserLearningTopic
+from userapp.serializers import PROFILE_FIELDS, render_profile
+
+
+EXPORT_FORMATS = ('ndjson', 'zip')
+
+CONTENT_TYPES = {'ndjson': 'application/x-ndjson', 'zip': 'application/zip'}
+
+# Bytes sent to the client at a time, rather than a write per line
+WRITE_SIZE = 64 * 1024
+
+
+def get_chunk_size():
+    return getattr(settings, 'EXPORT_CHUNK_SIZE', 2000)
+
+
+def _lines(record_type, rows, render=dict):
+    encoder = DjangoJSONEncoder(separators=(',', ':'))
+    for row in rows:
+        yield (encoder.encode({'type': record_type, **render(row)}) + '\n').encode()
+
+
+def export_sections(user_id=None, using='default'):
+    """
+    Returns the (name, lines) sections of an export: NDJSON lines (bytes) generators for the users,
+    topics and lessons of `user_id`, or of every user if it is None. Nothing is read before iterating.
+    """
+    users = UserDetails.objects.using(using).order_by('id')
+    topics = UserLearningTopic.objects.using(using).order_by('user_id', 'id')
+    lessons = UserCreatedLessons.objects.using(using).order_by('user_id', 'id')
+    if user_id is not None:
+        users, topics, lessons = users.filter(id=user_id), topics.filter(user_id=user_id), lessons.filter(user_id=user_id)
+    chunk_size = get_chunk_size()
+    return [
+        ('users', _lines('user', users.values(*PROFILE_FIELDS).iterator(chunk_size=chunk_size), render_profile)),
+        ('topics', _lines('topic', topics.values('id', 'user_id', 'updated_at', topic_name=F('topic__name'),
+                                                 topic_slug=F('topic__slug')).iterator(chunk_size=chunk_size))),
+        ('lessons', _lines('lesson', lessons.values('id', 'user_id', 'lesson_name', 'updated_at')
+                           .iterator(chunk_size=chunk_size))),
+    ]
+
+
+class _StreamBuffer(io.RawIOBase):
+    """A write-only file collecting what zipfile writes, until the next `take`."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def take(self):
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _zip(sections):
+    buffer = _StreamBuffer()
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, lines in sections:
+            # The size is unknown up front: always use zip64 sizes, entries may exceed 4 GiB
+            with archive.open(f'{name}.ndjson', 'w', force_zip64=True) as entry:
+                for line in lines:
+                    entry.write(line)
+                    yield buffer.take()
+            yield buffer.take()
+    yield buffer.take()
+
+
+def _batched(chunks):
+    batch = []
+    size = 0
+    for chunk in chunks:
+        batch.append(chunk)
+        size += len(chunk)
+        if size >= WRITE_SIZE:
+            yield b''.join(batch)
+            batch, size = [], 0
+    if batch:
+        yield b''.join(batch)
+
+
+def stream_export(export_format, user_id=None, using='default'):
+    """Returns an iterator of the bytes of an export in `export_format` (one of EXPORT_FORMATS)."""
+    sections = export_sections(user_id, using=using)
+    if export_format == 'zip':
+        return _batched(_zip(sections))
+    return _batched(line for _, lines in sections for line in lines)
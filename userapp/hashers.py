@@ -0,0 +1,128 @@
+"""
+Password hashing policy.
+
+- The Tuned*PasswordHasher classes read their work factors from settings, so the
+  cost of a hash can be tuned per deployment. They keep the algorithm names of
+  Django's hashers, so existing hashes stay valid and are upgraded to the current
+  parameters the next time the user logs in.
+- `make_password` and `verify_password` run the hashing in a bounded process pool of
+  PASSWORD_HASHING_WORKERS processes, so a login storm can not occupy every web worker's
+  CPU. With PASSWORD_HASHING_WORKERS = 0 (the default) they hash in the calling thread.
+  Either way the calling thread waits for the hash: a sync request still holds its worker
+  thread meanwhile.
+- `amake_password` and `averify_password` are their async versions, used by the async login
+  view: the event loop awaits the pool's future and serves other requests in the meantime.
+  Without the pool they hash in a thread of the default executor.
+"""
+import asyncio
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import hashers
+
+
+class TunedPBKDF2PasswordHasher(hashers.PBKDF2PasswordHasher):
+    """PBKDF2-SHA256 with PASSWORD_PBKDF2_ITERATIONS iterations."""
+
+    @property
+    def iterations(self):
+        return getattr(settings, 'PASSWORD_PBKDF2_ITERATIONS', hashers.PBKDF2PasswordHasher.iterations)
+
+
+class TunedScryptPasswordHasher(hashers.ScryptPasswordHasher):
+    """scrypt with PASSWORD_SCRYPT_WORK_FACTOR (N), PASSWORD_SCRYPT_BLOCK_SIZE (r) and PASSWORD_SCRYPT_PARALLELISM (p)."""
+
+    @property
+    def work_factor(self):
+        return getattr(settings, 'PASSWORD_SCRYPT_WORK_FACTOR', hashers.ScryptPasswordHasher.work_factor)
+
+    @property
+    def block_size(self):
+        return getattr(settings, 'PASSWORD_SCRYPT_BLOCK_SIZE', hashers.ScryptPasswordHasher.block_size)
+
+    @property
+    def parallelism(self):
+        return getattr(settings, 'PASSWORD_SCRYPT_PARALLELISM', hashers.ScryptPasswordHasher.parallelism)
+
+
+class TunedArgon2PasswordHasher(hashers.Argon2PasswordHasher):
+    """
+    Argon2id with PASSWORD_ARGON2_TIME_COST, PASSWORD_ARGON2_MEMORY_COST (KiB) and PASSWORD_ARGON2_PARALLELISM.
+    Requires the optional argon2-cffi package.
+    """
+
+    @property
+    def time_cost(self):
+        return getattr(settings, 'PASSWORD_ARGON2_TIME_COST', hashers.Argon2PasswordHasher.time_cost)
+
+    @property
+    def memory_cost(self):
+        return getattr(settings, 'PASSWORD_ARGON2_MEMORY_COST', hashers.Argon2PasswordHasher.memory_cost)
+
+    @property
+    def parallelism(self):
+        return getattr(settings, 'PASSWORD_ARGON2_PARALLELISM', hashers.Argon2PasswordHasher.parallelism)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _init_worker():
+    # Needed when the pool starts its processes with 'spawn' instead of 'fork'
+    import django
+    django.setup()
+
+
+def _get_pool():
+    global _pool
+    workers = getattr(settings, 'PASSWORD_HASHING_WORKERS', 0)
+    if not workers:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker)
+        return _pool
+
+
+def shutdown_pool():
+    """Stops the hashing processes; the next hash starts new ones, with the settings of that time."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown()
+            _pool = None
+
+
+def make_password(password):
+    """Returns the hash of `password` with the preferred hasher."""
+    pool = _get_pool()
+    if pool is None:
+        return hashers.make_password(password)
+    return pool.submit(hashers.make_password, password).result()
+
+
+def verify_password(password, encoded):
+    """Returns (is the password correct, must the hash be upgraded)."""
+    pool = _get_pool()
+    if pool is None:
+        return hashers.verify_password(password, encoded)
+    return pool.submit(hashers.verify_password, password, encoded).result()
+
+
+async def amake_password(password):
+    """Async version of make_password, the event loop is free while the password is hashed."""
+    pool = _get_pool()
+    if pool is None:
+        return await sync_to_async(hashers.make_password, thread_sensitive=False)(password)
+    return await asyncio.wrap_future(pool.submit(hashers.make_password, password))
+
+
+async def averify_password(password, encoded):
+    """Async version of verify_password, the event loop is free while the password is hashed."""
+    pool = _get_pool()
+    if pool is None:
+        return await sync_to_async(hashers.verify_password, thread_sensitive=False)(password, encoded)
+    return await asyncio.wrap_future(pool.submit(hashers.verify_password, password, encoded))
@@ -0,0 +1,221 @@
+"""
+Profile image pipeline.
+
+- `store_profile_image` stores an upload as it is, streamed chunk by chunk, under a staging
+  name and returns the name the processed image will have: the SHA-256 of the uploaded bytes,
+  so the same photo is only stored once, with an extension from the image format, never from
+  the client's file name. It only reads the image header, to reject what is not an image.
+- `schedule_profile_image_processing` queues `process_profile_image` as a background task
+  (see userapp/taskqueue.py). The task decodes the upload and re-encodes it without its
+  metadata (EXIF GPS position, camera details...), downscaled to at most
+  PROFILE_IMAGE_MAX_SIZE pixels, writes the resized WebP and JPEG variants and deletes the
+  staged upload. An upload that turns out not to decode is removed from the profiles.
+- `profile_image_url` and `profile_image_variant_urls` return the URLs served for a stored
+  image. The PROFILE_IMAGE_DEFAULT_SIZE JPEG variant is the profile's image, it exists once
+  the task has run.
+
+Pillow is only imported when an image is actually processed.
+"""
+import hashlib
+import io
+import os
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+
+from userapp.taskqueue import task
+
+
+PROFILE_IMAGE_DIR = 'media/profiles'
+
+# Uploads waiting for process_profile_image, named after their SHA-256
+PROFILE_IMAGE_UPLOAD_DIR = 'media/profile-uploads'
+
+# Storage format name -> Pillow format name
+VARIANT_FORMATS = {'webp': 'WEBP', 'jpeg': 'JPEG'}
+
+# Pillow formats originals are kept in -> file extension; other formats are converted to PNG
+ORIGINAL_FORMATS = {'JPEG': '.jpg', 'PNG': '.png', 'WEBP': '.webp'}
+ORIGINAL_FORMAT_NAMES = {extension: image_format for image_format, extension in ORIGINAL_FORMATS.items()}
+
+# Multi-picture JPEGs (most phone cameras) are kept as plain JPEGs
+FORMAT_ALIASES = {'MPO': 'JPEG'}
+
+
+def get_variant_sizes():
+    """Edge lengths, in pixels, of the square boxes the variants are resized into."""
+    return getattr(settings, 'PROFILE_IMAGE_VARIANT_SIZES', (64, 256, 512))
+
+
+def get_default_size():
+    """Size of the variant served as the profile image, one of the variant sizes."""
+    return getattr(settings, 'PROFILE_IMAGE_DEFAULT_SIZE', 256)
+
+
+def get_max_size():
+    return getattr(settings, 'PROFILE_IMAGE_MAX_SIZE', 2048)
+
+
+def _for_format(image, image_format):
+    """Converts the image to a mode the format can save."""
+    if image_format == 'JPEG':
+        return image if image.mode in ('RGB', 'L') else image.convert('RGB')
+    if image.mode in ('RGB', 'RGBA', 'L', 'LA'):
+        return image
+    has_alpha = image.mode in ('PA', 'RGBa') or 'transparency' in image.info
+    return image.convert('RGBA' if has_alpha else 'RGB')
+
+
+def _encode(image, image_format):
+    # Pillow only writes metadata (EXIF, XMP...) it is explicitly given: none is kept
+    buffer = io.BytesIO()
+    image = _for_format(image, image_format)
+    if image_format == 'PNG':
+        image.save(buffer, format=image_format, optimize=True)
+    else:
+        image.save(buffer, format=image_format, quality=85)
+    return buffer.getvalue()
+
+
+def _save_variant(image, name, size, extension):
+    target = variant_name(name, size, extension)
+    if default_storage.exists(target):
+        return
+    variant = image.copy()
+    variant.thumbnail((size, size))
+    default_storage.save(target, ContentFile(_encode(variant, VARIANT_FORMATS[extension])))
+
+
+def store_profile_image(upload):
+    """
+    Stages an uploaded profile image for `process_profile_image`. Returns the storage name of
+    the processed image. Raises ValueError if the upload does not start like an image.
+    """
+    from PIL import Image, UnidentifiedImageError
+
+    try:
+        # Only parses the header, the pixels are decoded by the background task
+        with Image.open(upload) as image:
+            image_format = FORMAT_ALIASES.get(image.format, image.format)
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError, SyntaxError, ValueError):
+        raise ValueError('Upload a valid image.')
+    if image_format not in ORIGINAL_FORMATS:
+        image_format = 'PNG'
+
+    upload.seek(0)
+    content_hash = hashlib.sha256()
+    for chunk in upload.chunks():
+        content_hash.update(chunk)
+    content_hash = content_hash.hexdigest()
+    name = f'{PROFILE_IMAGE_DIR}/{content_hash[:2]}/{content_hash}{ORIGINAL_FORMATS[image_format]}'
+    staged = staged_name(name)
+    if not default_storage.exists(name) and not default_storage.exists(staged):
+        upload.seek(0)
+        # Storages write the upload chunk by chunk, it is never read into memory as a whole
+        default_storage.save(staged, upload)
+    return name
+
+
+def staged_name(name):
+    """Storage name of the unprocessed upload of the image `name`, not served to anyone."""
+    return f'{PROFILE_IMAGE_UPLOAD_DIR}/{os.path.splitext(os.path.basename(name))[0]}'
+
+
+def _store_original(name):
+    """Writes the processed original `name` from its staged upload. Returns False if the upload is not an image."""
+    from PIL import Image, ImageOps, UnidentifiedImageError
+
+    image_format = ORIGINAL_FORMAT_NAMES[os.path.splitext(name)[1]]
+    try:
+        with default_storage.open(staged_name(name)) as staged:
+            with Image.open(staged) as image:
+                image.verify()
+            staged.seek(0)
+            with Image.open(staged) as image:
+                # Apply the EXIF orientation before the EXIF data is dropped
+                image = ImageOps.exif_transpose(image)
+                image.thumbnail((get_max_size(), get_max_size()))
+                content = _encode(image, image_format)
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError, SyntaxError, ValueError):
+        return False
+    default_storage.save(name, ContentFile(content))
+    return True
+
+
+def is_content_addressed(name):
+    return bool(name) and name.startswith(PROFILE_IMAGE_DIR + '/')
+
+
+def variant_name(name, size, extension):
+    return f'{os.path.splitext(name)[0]}_{size}.{extension}'
+
+
+def profile_image_url(name):
+    """
+    Returns the URL served as the profile image: the default JPEG variant. Images uploaded
+    before the pipeline existed have no variants, their stored file is served as it is.
+    """
+    if not name:
+        return None
+    if not is_content_addressed(name):
+        return default_storage.url(name)
+    return default_storage.url(variant_name(name, get_default_size(), 'jpeg'))
+
+
+def profile_image_variant_urls(name):
+    """
+    Returns {size: {format: url}} for a stored profile image.
+
+    Images uploaded before the pipeline existed have no variants, which gives {}.
+    """
+    if not is_content_addressed(name):
+        return {}
+    return {
+        str(size): {extension: default_storage.url(variant_name(name, size, extension))
+                    for extension in VARIANT_FORMATS}
+        for size in get_variant_sizes()
+    }
+
+
+@task(max_attempts=5)
+def process_profile_image(name):
+    """
+    Writes the processed original of the image `name` and its resized variants, skipping the
+    files that exist, then deletes the staged upload.
+    """
+    from PIL import Image
+
+    if not default_storage.exists(name):
+        if not default_storage.exists(staged_name(name)):
+            # Processed and cleaned up by a previous run
+            return
+        if not _store_original(name):
+            _drop_profile_image(name)
+            default_storage.delete(staged_name(name))
+            return
+
+    with default_storage.open(name) as stored, Image.open(stored) as image:
+        # Stored originals are already upright and metadata free
+        image = image.convert('RGB')
+        for size in get_variant_sizes():
+            for extension in VARIANT_FORMATS:
+                _save_variant(image, name, size, extension)
+    if default_storage.exists(staged_name(name)):
+        default_storage.delete(staged_name(name))
+
+
+def _drop_profile_image(name):
+    from userapp.models import UserDetails
+
+    # Saved one by one so the profile caches are invalidated
+    for user in UserDetails.objects.filter(profile_image=name).only('id', 'profile_image'):
+        user.profile_image = None
+        user.save(update_fields=['profile_image'])
+
+
+def schedule_profile_image_processing(name):
+    """Processes the image `name` in the background once the current transaction commits."""
+    if not is_content_addressed(name):
+        return
+    process_profile_image.delay(name)
@@ -0,0 +1,132 @@
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from userapp.models import UserCreatedLessons, UserDetails, user_content_changed
+
+
+LESSON_BATCH_OPERATIONS = ('create', 'update', 'delete')
+
+MAX_LESSON_NAME_LENGTH = UserCreatedLessons._meta.get_field('lesson_name').max_length
+
+
+def get_max_batch_size():
+    return getattr(settings, 'LESSON_BATCH_MAX_OPERATIONS', 500)
+
+
+def clean_lesson_name(lesson_name):
+    """Returns the lesson name without surrounding spaces, raises ValueError if it is missing or too long."""
+    if not isinstance(lesson_name, str) or not lesson_name.strip():
+        raise ValueError("'lesson_name' must be a non-empty string.")
+    lesson_name = lesson_name.strip()
+    if len(lesson_name) > MAX_LESSON_NAME_LENGTH:
+        raise ValueError(f'A lesson name can not be longer than {MAX_LESSON_NAME_LENGTH} characters.')
+    return lesson_name
+
+
+def _clean_operation(operation, seen_ids):
+    """Returns the cleaned (op, id, lesson_name) of one operation, raises ValueError if it is invalid."""
+    if not isinstance(operation, dict):
+        raise ValueError('Each operation must be an object.')
+    op = operation.get('op')
+    if op not in LESSON_BATCH_OPERATIONS:
+        raise ValueError(f"'op' must be one of {', '.join(LESSON_BATCH_OPERATIONS)}.")
+
+    lesson_id = None
+    if op != 'create':
+        lesson_id = operation.get('id')
+        if isinstance(lesson_id, str) and lesson_id.isdigit():
+            lesson_id = int(lesson_id)
+        if not isinstance(lesson_id, int) or isinstance(lesson_id, bool) or lesson_id < 1:
+            raise ValueError("'id' must be a positive integer.")
+        if lesson_id in seen_ids:
+            raise ValueError('The same lesson can only be changed once per batch.')
+
+    lesson_name = None
+    if op != 'delete':
+        lesson_name = clean_lesson_name(operation.get('lesson_name'))
+
+    return op, lesson_id, lesson_name
+
+
+def apply_lesson_batch(user_id, operations):
+    """
+    Applies a list of create/update/delete operations to a user's custom lessons.
+
+    - Invalid operations are reported and skipped; they do not stop the others.
+    - The ownership of every referenced lesson is checked with a single SELECT.
+      Lessons that do not exist or belong to someone else are reported as 'not_found'.
+    - The changes are written in one transaction, with one bulk INSERT, one bulk UPDATE
+      and one soft-deleting UPDATE ... WHERE id IN, and they share one new `change_seq`.
+
+    Raises ValueError if `operations` is not a list or has more than LESSON_BATCH_MAX_OPERATIONS items,
+    and UserDetails.DoesNotExist if the user is gone.
+    Returns one result per operation, in order: {'op', 'status', 'id'} plus 'error' for failed ones.
+    """
+
+    if not isinstance(operations, list):
+        raise ValueError("'operations' must be a list.")
+    if len(operations) > get_max_batch_size():
+        raise ValueError(f'A batch can not have more than {get_max_batch_size()} operations.')
+
+    results = []
+    cleaned = []
+    seen_ids = set()
+    for operation in operations:
+        try:
+            op, lesson_id, lesson_name = _clean_operation(operation, seen_ids)
+        except ValueError as error:
+            op = operation.get('op') if isinstance(operation, dict) else None
+            results.append({'op': op, 'status': 'invalid', 'id': None, 'error': str(error)})
+            continue
+        if lesson_id is not None:
+            seen_ids.add(lesson_id)
+        results.append({'op': op, 'status': None, 'id': lesson_id})
+        cleaned.append((len(results) - 1, op, lesson_id, lesson_name))
+
+    with transaction.atomic():
+        owned = {}
+        if seen_ids:
+            owned = dict(UserCreatedLessons.objects.filter(user_id=user_id, id__in=seen_ids)
+                         .values_list('id', 'lesson_name'))
+
+        created, updated, deleted_ids = [], [], []
+        for index, op, lesson_id, lesson_name in cleaned:
+            if op != 'create' and lesson_id not in owned:
+                results[index].update(status='not_found', error='Lesson not found.')
+            elif op == 'create':
+                created.append((index, UserCreatedLessons(user_id=user_id, lesson_name=lesson_name)))
+            elif op == 'update':
+                updated.append((index, UserCreatedLessons(id=lesson_id, user_id=user_id, lesson_name=lesson_name)))
+            else:
+                deleted_ids.append((index, lesson_id))
+
+        if created or updated or deleted_ids:
+            change_seq = UserDetails.objects.bump_content_version(user_id)
+            if change_seq is None:
+                raise UserDetails.DoesNotExist('The owner of the lessons does not exist.')
+            now = timezone.now()
+            for _, lesson in created + updated:
+                lesson.change_seq = change_seq
+                lesson.updated_at = now
+            if created:
+                UserCreatedLessons.objects.bulk_create([lesson for _, lesson in created])
+            if updated:
+                UserCreatedLessons.objects.bulk_update([lesson for _, lesson in updated],
+                                                       ['lesson_name', 'change_seq', 'updated_at'])
+            if deleted_ids:
+                UserCreatedLessons.objects.filter(id__in=[lesson_id for _, lesson_id in deleted_ids],
+                                                  user_id=user_id).update(is_deleted=True, change_seq=change_seq,
+                                                                          updated_at=now)
+            user_content_changed.send(
+                sender=UserCreatedLessons, user_id=user_id,
+                added=[lesson.lesson_name for _, lesson in created + updated],
+                removed=[owned[lesson.id] for _, lesson in updated] + [owned[lesson_id] for _, lesson_id in deleted_ids])
+
+    for index, lesson in created:
+        results[index].update(status='created', id=lesson.id)
+    for index, _ in updated:
+        results[index]['status'] = 'updated'
+    for index, _ in deleted_ids:
+        results[index]['status'] = 'deleted'
+    return results
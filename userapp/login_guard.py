@@ -0,0 +1,61 @@
+"""
+Login attempt limiter.
+
+Counts failed logins per account (email) and client IP pair and per client IP in Django's
+cache, over a fixed window of LOGIN_ATTEMPT_WINDOW seconds. Once a pair or an IP reaches
+LOGIN_MAX_FAILURES_PER_ACCOUNT_AND_IP / LOGIN_MAX_FAILURES_PER_IP failures, its login requests
+are rejected before any password is hashed, until the window ends.
+
+The account failures are not counted across IPs: anyone knowing an email could otherwise lock
+its owner out with a few wrong passwords. An attacker spreading the guesses over many IPs is
+slowed down by the per IP limit and by the 'login' throttle scope (see userapp.throttling).
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+def _window():
+    return getattr(settings, 'LOGIN_ATTEMPT_WINDOW', 15 * 60)
+
+
+def _account_key(email, ip):
+    return f'userapp:login-failures:account:{str(email).lower()}:ip:{ip}'
+
+
+def _keys(email, ip):
+    keys = []
+    if email:
+        keys.append((_account_key(email, ip), getattr(settings, 'LOGIN_MAX_FAILURES_PER_ACCOUNT_AND_IP', 5)))
+    if ip:
+        keys.append((f'userapp:login-failures:ip:{ip}',
+                     getattr(settings, 'LOGIN_MAX_FAILURES_PER_IP', 50)))
+    return keys
+
+
+def blocked_for(email, ip):
+    """Returns the number of seconds the login is blocked for, 0 if it is allowed."""
+    keys = _keys(email, ip)
+    counters = cache.get_many([key for key, _ in keys])
+    retry_after = 0
+    for key, limit in keys:
+        failures, window_end = counters.get(key, (0, 0))
+        if failures >= limit:
+            retry_after = max(retry_after, int(window_end - time.time()) + 1)
+    return retry_after
+
+
+def record_failure(email, ip):
+    now = time.time()
+    for key, _ in _keys(email, ip):
+        failures, window_end = cache.get(key, (0, 0))
+        if window_end <= now:
+            failures, window_end = 0, now + _window()
+        cache.set(key, (failures + 1, window_end), timeout=int(window_end - now) + 1)
+
+
+def record_success(email, ip):
+    """Forgets the failures of the account from this IP, not those of the IP with other accounts."""
+    if email:
+        cache.delete(_account_key(email, ip))
@@ -0,0 +1,87 @@
+"""Helpers of the benchmark_* management commands."""
+import os
+import tempfile
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+from django.db import connection
+from django.test import override_settings
+
+
+@contextmanager
+def scratch_database():
+    """
+    Runs a benchmark against a new, migrated test database, destroyed afterwards: the benchmarks
+    never touch the configured database. A SQLite test database is a file in a temporary
+    directory rather than in memory, so its writes are synced to disk like the real database's.
+    DEBUG is off, as in production: the queries are not kept in memory in `connection.queries`.
+    """
+    from userapp.analytics import counter_buffer
+
+    with tempfile.TemporaryDirectory() as directory, override_settings(DEBUG=False):
+        if connection.vendor == 'sqlite':
+            connection.settings_dict['TEST']['NAME'] = os.path.join(directory, 'benchmark.sqlite3')
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=False)
+        try:
+            yield
+        finally:
+            # The counters of the benchmark's writes must not be flushed to the real database at exit
+            counter_buffer.take()
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+def timed(func, iterations=1):
+    """Calls `func` `iterations` times, returns the mean time of a call in seconds."""
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return (time.perf_counter() - start) / iterations
+
+
+def peak_memory(func):
+    """
+    Calls `func`, returns (its result, the peak of the memory allocated meanwhile in bytes).
+    Counts the Python allocations with tracemalloc, which slows the call down.
+    """
+    tracemalloc.start()
+    try:
+        result = func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, peak
+
+
+def max_rss():
+    """Returns the highest resident set size of the process so far, in bytes."""
+    # Unix only, like the servers the benchmarks are meant for
+    import resource
+    import sys
+
+    value = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return value if sys.platform == 'darwin' else value * 1024
+
+
+def create_content(prefix, users, rows_per_user):
+    """
+    Creates `users` users learning `rows_per_user` topics each, with as many custom lessons
+    named after ten common names, in bulk and without signals. Returns the ids of the users.
+    """
+    from userapp.models import Topic, UserCreatedLessons, UserDetails, UserLearningTopic
+
+    topics = Topic.objects.bulk_create([Topic(name=f'{prefix} topic {index}', slug=f'{prefix}-topic-{index}')
+                                        for index in range(rows_per_user)])
+    created = UserDetails.objects.bulk_create([UserDetails(email=f'{prefix}-{index}@example.com')
+                                               for index in range(users)], batch_size=5000)
+    # Enough users at a time to write their rows in few INSERTs without holding all of them
+    users_per_batch = max(1, 5000 // max(rows_per_user, 1))
+    for start in range(0, len(created), users_per_batch):
+        batch = created[start:start + users_per_batch]
+        UserLearningTopic.objects.bulk_create([UserLearningTopic(user=user, topic=topic)
+                                               for user in batch for topic in topics], batch_size=5000)
+        UserCreatedLessons.objects.bulk_create([UserCreatedLessons(user=user, lesson_name=f'Lesson {index % 10}')
+                                                for user in batch for index in range(rows_per_user)],
+                                               batch_size=5000)
+    return [user.id for user in created]
@@ -0,0 +1,101 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import AsyncClient, Client, override_settings
+from django.urls import path
+
+from userapp.async_views import AsyncGetAllUserSpecificCustomLesson, AsyncGetUserSpecificTopics, AsyncUserProfileView
+from userapp.management.benchmarks import scratch_database
+from userapp.models import Topic, UserCreatedLessons, UserDetails, UserLearningTopic
+from userapp.serializers import CustomTokenObtainPairSerializer
+from userapp.views import GetAllUserSpecificCustomLesson, GetUserSpecificTopics, UserProfileView
+
+
+ROUTES = ('profile', 'topics', 'lessons')
+
+
+class SyncRoutes:
+    urlpatterns = [
+        path('profile', UserProfileView.as_view()),
+        path('topics', GetUserSpecificTopics.as_view()),
+        path('lessons', GetAllUserSpecificCustomLesson.as_view()),
+    ]
+
+
+class AsyncRoutes:
+    urlpatterns = [
+        path('profile', AsyncUserProfileView.as_view()),
+        path('topics', AsyncGetUserSpecificTopics.as_view()),
+        path('lessons', AsyncGetAllUserSpecificCustomLesson.as_view()),
+    ]
+
+
+class Command(BaseCommand):
+    help = (
+        "Load test of the read endpoints (profile, topics and custom lessons) through the full middleware "
+        "stack: the sync views under WSGI with a pool of threads, the sync views under ASGI (run by "
+        "sync_to_async) and the async views under ASGI, with --concurrency requests in flight. "
+        "Reports the requests per second of each. "
+        "Runs against a scratch test database, the configured database is not touched."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=3000, help='Requests per setup')
+        parser.add_argument('--concurrency', type=int, default=100, help='Requests in flight at a time')
+        parser.add_argument('--users', type=int, default=50)
+        parser.add_argument('--rows', type=int, default=20, help='Topics and lessons per user')
+
+    def handle(self, *args, **options):
+        # The test clients' host, and no rate limit: the load comes from a handful of users
+        with scratch_database(), override_settings(ALLOWED_HOSTS=['testserver'], THROTTLE_RATES={}):
+            tokens = self.create_users(options['users'], options['rows'])
+            requests = [(f'/{ROUTES[index % len(ROUTES)]}', tokens[index % len(tokens)])
+                        for index in range(options['requests'])]
+            for label, urlconf, run in (('WSGI, sync views', SyncRoutes, self.run_wsgi),
+                                        ('ASGI, sync views', SyncRoutes, self.run_asgi),
+                                        ('ASGI, async views', AsyncRoutes, self.run_asgi)):
+                with override_settings(ROOT_URLCONF=urlconf):
+                    start = time.perf_counter()
+                    statuses = run(requests, options['concurrency'])
+                    elapsed = time.perf_counter() - start
+                if set(statuses) != {200}:
+                    raise CommandError(f'{label}: unexpected responses {sorted(set(statuses))}')
+                self.stdout.write(f'{label:<18} {len(requests) / elapsed:8.0f} requests/s '
+                                  f'({elapsed:.2f} s for {len(requests)} requests)')
+
+    @staticmethod
+    def create_users(count, rows):
+        topics = Topic.objects.bulk_create([Topic(name=f'Topic {index}', slug=f'topic-{index}') for index in range(rows)])
+        tokens = []
+        for index in range(count):
+            user = UserDetails.objects.create(email=f'load{index}@example.com')
+            UserLearningTopic.objects.bulk_create([UserLearningTopic(user=user, topic=topic) for topic in topics])
+            UserCreatedLessons.objects.bulk_create([UserCreatedLessons(user=user, lesson_name=f'Lesson {row}')
+                                                    for row in range(rows)])
+            tokens.append(f'Bearer {CustomTokenObtainPairSerializer.get_token(user).access_token}')
+        return tokens
+
+    @staticmethod
+    def run_wsgi(requests, concurrency):
+        def get(request):
+            url, token = request
+            return Client().get(url, HTTP_AUTHORIZATION=token).status_code
+
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            return list(pool.map(get, requests))
+
+    @staticmethod
+    def run_asgi(requests, concurrency):
+        async def load():
+            client = AsyncClient()
+            semaphore = asyncio.Semaphore(concurrency)
+
+            async def get(url, token):
+                async with semaphore:
+                    return (await client.get(url, headers={'authorization': token})).status_code
+
+            return await asyncio.gather(*(get(url, token) for url, token in requests))
+
+        return asyncio.run(load())
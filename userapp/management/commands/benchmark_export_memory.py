@@ -0,0 +1,73 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from userapp.export import EXPORT_FORMATS, stream_export
+from userapp.management.benchmarks import create_content, max_rss, peak_memory, scratch_database
+from userapp.models import UserDetails
+from userapp.serializers import CustomTokenObtainPairSerializer
+
+
+MB = 1024 * 1024
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures the memory used to export every user, through the all-users export endpoint with its "
+        "middleware (gzip compression included), for --users users with N topics and N custom lessons each. "
+        "Reports the peak of the Python allocations while the response is streamed, against holding the "
+        "whole export in memory as a non-streaming response would, and the peak RSS of the process at the "
+        "end. The streamed export should stay flat as N grows. Runs against a scratch test database, the "
+        "configured database is not touched. With --budget-mb, exits with an error if a streamed export "
+        "peaks over the budget."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 5000],
+                            help='Topics and custom lessons per user')
+        parser.add_argument('--users', type=int, default=10, help='Users exported per size')
+        parser.add_argument('--formats', nargs='+', default=list(EXPORT_FORMATS), choices=EXPORT_FORMATS)
+        parser.add_argument('--budget-mb', type=float, default=None,
+                            help='Maximum peak memory of a streamed export, in MB')
+
+    def handle(self, *args, **options):
+        highest = 0
+        with scratch_database(), override_settings(ALLOWED_HOSTS=['testserver'], THROTTLE_RATES={}):
+            admin = UserDetails.objects.create_superuser(email='benchmark-admin@example.com', password=None)
+            client = Client(headers={
+                'Authorization': f'Bearer {CustomTokenObtainPairSerializer.get_token(admin).access_token}',
+                'Accept-Encoding': 'gzip',
+            })
+            for size in options['sizes']:
+                create_content(f'export-{size}', options['users'], size)
+                rows = UserDetails.objects.count() + options['users'] * size * 2
+                for export_format in options['formats']:
+                    start = time.perf_counter()
+                    sent, peak = peak_memory(lambda: self.download(client, export_format))
+                    elapsed = time.perf_counter() - start
+                    highest = max(highest, peak)
+                    _, buffered_peak = peak_memory(lambda: len(b''.join(stream_export(export_format))))
+                    self.stdout.write(f'{rows:>9} rows {export_format:<6}: streamed {peak / MB:7.1f} MB peak '
+                                      f'in {elapsed:6.2f} s ({sent / MB:.1f} MB sent); '
+                                      f'in memory {buffered_peak / MB:7.1f} MB peak')
+        self.stdout.write(f'Peak RSS of the process: {max_rss() / MB:.1f} MB')
+
+        budget = options['budget_mb']
+        if budget is not None:
+            if highest > budget * MB:
+                raise CommandError(f'A streamed export peaked at {highest / MB:.1f} MB, '
+                                   f'over the budget of {budget:.1f} MB.')
+            self.stdout.write(self.style.SUCCESS(f'The streamed exports peaked at {highest / MB:.1f} MB, '
+                                                 f'within the budget of {budget:.1f} MB.'))
+
+    @staticmethod
+    def download(client, export_format):
+        """Streams the export and returns the number of bytes sent, without keeping them."""
+        response = client.get(reverse('all_users_data_export'), {'file_format': export_format})
+        if response.status_code != 200:
+            raise CommandError(f'The export failed with status {response.status_code}.')
+        sent = sum(len(chunk) for chunk in response.streaming_content)
+        response.close()
+        return sent
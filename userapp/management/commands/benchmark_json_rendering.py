@@ -0,0 +1,58 @@
+import time
+
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+
+from iveye_backend import compression
+from userapp.models import Topic, UserCreatedLessons, UserLearningTopic
+from userapp.renderers import FastJSONRenderer, orjson
+from userapp.serializers import UserCreatedLessonsSerializer, UserLearningTopicSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures the time to render large topic and lesson listings with DRF's JSONRenderer and "
+        "with FastJSONRenderer, and their size on the wire uncompressed, gzipped and Brotli compressed. "
+        "Runs in memory, without the database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 10_000],
+                            help='Numbers of rows per listing')
+        parser.add_argument('--iterations', type=int, default=50)
+
+    def handle(self, *args, **options):
+        if orjson is None:
+            self.stdout.write(self.style.WARNING('orjson is not installed, FastJSONRenderer falls back to stdlib json'))
+        for size in options['sizes']:
+            topics = [UserLearningTopic(id=index, topic=Topic(name=f'Topic number {index}', slug=f'topic-number-{index}'))
+                      for index in range(1, size + 1)]
+            lessons = [UserCreatedLessons(id=index, lesson_name=f'My custom lesson {index}') for index in range(1, size + 1)]
+            listings = (
+                ('topics', UserLearningTopicSerializer(topics, many=True).data),
+                ('lessons', UserCreatedLessonsSerializer(lessons, many=True).data),
+            )
+            for name, rows in listings:
+                data = {'next': None, 'results': rows}
+                self.stdout.write(f'{size:>6} {name}: ' + ', '.join(
+                    f'{label} {self.render_time(renderer, data, options["iterations"]):.0f} us'
+                    for label, renderer in (('DRF', JSONRenderer()), ('fast', FastJSONRenderer()))
+                ) + '; ' + self.sizes(FastJSONRenderer().render(data)))
+
+    @staticmethod
+    def render_time(renderer, data, iterations):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            renderer.render(data)
+        return (time.perf_counter() - start) / iterations * 1e6
+
+    @staticmethod
+    def sizes(content):
+        sizes = [f'{len(content)} bytes']
+        for encoding in ('gzip', 'br'):
+            chosen = compression.choose_encoding(encoding)
+            if chosen is None:
+                continue
+            compress, flush = chosen[1]()
+            sizes.append(f'{len(compress(content) + flush())} {encoding}')
+        return ', '.join(sizes)
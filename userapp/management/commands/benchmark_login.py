@@ -0,0 +1,79 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from userapp import hashers
+from userapp.management.benchmarks import scratch_database
+from userapp.models import UserDetails
+
+
+PASSWORD = 'Benchmark-password-1'
+
+
+def configured_hashers():
+    """Returns {name: hasher path} of PASSWORD_HASHERS, e.g. 'pbkdf2' for TunedPBKDF2PasswordHasher."""
+    return {path.rsplit('.', 1)[-1].removeprefix('Tuned').removesuffix('PasswordHasher').lower(): path
+            for path in settings.PASSWORD_HASHERS}
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures logins through the login endpoint (full middleware stack, token issuing included) "
+        "for each password hasher, with the work factors of the settings: the logins per second of one "
+        "core, hashing in the request thread, and with --workers N, the logins per second with N hashing "
+        "processes and N concurrent requests. "
+        "Runs against a scratch test database, the configured database is not touched."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hashers', nargs='+', default=list(configured_hashers()), choices=list(configured_hashers()))
+        parser.add_argument('--logins', type=int, default=20, help='Logins per hasher and setup')
+        parser.add_argument('--workers', type=int, default=0, help='Also measure with a pool of N hashing processes')
+
+    def handle(self, *args, **options):
+        logins = options['logins']
+        paths = configured_hashers()
+        self.stdout.write(f'{os.cpu_count()} CPU cores')
+        # The test client's host, and no rate limit: every login comes from the same client
+        with scratch_database(), override_settings(ALLOWED_HOSTS=['testserver'], THROTTLE_RATES={}):
+            for name in options['hashers']:
+                with override_settings(PASSWORD_HASHERS=[paths[name]], PASSWORD_HASHING_WORKERS=0):
+                    try:
+                        user = UserDetails.objects.create_user(email=f'{name}@example.com', password=PASSWORD)
+                    except ValueError as e:
+                        # e.g. argon2-cffi is not installed
+                        self.stdout.write(self.style.WARNING(f'{name:<7} skipped: {e}'))
+                        continue
+                    per_core = logins / self.run(user.email, logins, concurrency=1)
+                    results = [f'{per_core:7.1f} logins/s on one core']
+                if options['workers']:
+                    workers = options['workers']
+                    with override_settings(PASSWORD_HASHERS=[paths[name]], PASSWORD_HASHING_WORKERS=workers):
+                        try:
+                            pooled = logins * workers / self.run(user.email, logins * workers, concurrency=workers)
+                        finally:
+                            # The pool's processes were started with this hasher
+                            hashers.shutdown_pool()
+                    results.append(f'{pooled:7.1f} logins/s with {workers} hashing processes '
+                                   f'({pooled / workers:.1f} per process)')
+                self.stdout.write(f'{name:<7} ' + ', '.join(results))
+
+    @staticmethod
+    def run(email, logins, concurrency):
+        """Logs in `logins` times with `concurrency` requests in flight, returns the elapsed seconds."""
+        def login(_):
+            response = Client().post(reverse('user_login'), {'email': email, 'password': PASSWORD},
+                                     content_type='application/json')
+            if response.status_code != 200:
+                raise CommandError(f'Login failed with {response.status_code}: {response.content[:200]}')
+
+        login(None)
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(login, range(logins)))
+        return time.perf_counter() - start
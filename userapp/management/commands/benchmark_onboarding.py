@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+
+from userapp.management.benchmarks import scratch_database, timed
+from userapp.models import Topic, UserDetails, UserLearningTopic
+from userapp.onboarding import clean_topics, save_onboarding
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures onboarding users with N topics: save_onboarding (one transaction, one bulk INSERT) "
+        "against one INSERT per topic outside of a transaction, the previous write path. "
+        "The topics are new to the catalog for the first user and already in it for the next ones. "
+        "Runs against a scratch test database, the configured database is not touched."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[1, 50, 500], help='Numbers of topics per user')
+        parser.add_argument('--users', type=int, default=20, help='Users onboarded per size and write path')
+
+    def handle(self, *args, **options):
+        with scratch_database():
+            for size in options['sizes']:
+                results = []
+                for label, onboard in (('bulk', self.onboard_in_bulk), ('per-row', self.onboard_row_by_row)):
+                    topics = clean_topics([f'Benchmark topic {label} {size}-{index}' for index in range(size)])
+                    users = [UserDetails.objects.create(email=f'{label}-{size}-{index}@example.com')
+                             for index in range(options['users'])]
+                    first = timed(lambda: onboard(users[0], topics))
+                    rest = sum(timed(lambda: onboard(user, topics)) for user in users[1:]) / max(len(users) - 1, 1)
+                    results.append(f'{label} {first * 1000:8.1f} ms first, {rest * 1000:8.1f} ms next')
+                self.stdout.write(f'{size:>5} topics: ' + '; '.join(results))
+
+    @staticmethod
+    def onboard_in_bulk(user, topics):
+        save_onboarding(user, topics)
+
+    @staticmethod
+    def onboard_row_by_row(user, topics):
+        topic_ids = Topic.objects.resolve(topics)
+        for topic_id in topic_ids.values():
+            UserLearningTopic.objects.create(user=user, topic_id=topic_id)
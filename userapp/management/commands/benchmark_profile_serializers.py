@@ -0,0 +1,54 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from userapp.management.benchmarks import scratch_database
+from userapp.models import UserDetails
+from userapp.serializers import PROFILE_FIELDS, UserDetailsSerializer, UserProfileSerializer, render_profile
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures reading and serializing N user profiles, queries included, with UserDetailsSerializer "
+        "(every field, groups and permissions included), with UserProfileSerializer on an .only() queryset "
+        "and with render_profile on .values() rows. "
+        "Runs against a scratch test database, the configured database is not touched."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[1, 100, 10_000], help='Numbers of profiles')
+
+    def handle(self, *args, **options):
+        paths = (
+            ('UserDetailsSerializer', lambda users: UserDetailsSerializer(users, many=True).data),
+            ('UserProfileSerializer', lambda users: UserProfileSerializer(users.only(*PROFILE_FIELDS), many=True).data),
+            ('render_profile', lambda users: [render_profile(row) for row in users.values(*PROFILE_FIELDS)]),
+        )
+        with scratch_database():
+            for size in options['sizes']:
+                UserDetails.objects.all().delete()
+                UserDetails.objects.bulk_create([
+                    UserDetails(email=f'user{index}@example.com', first_name='First', last_name='Last',
+                                phone_number=9_000_000_000 + index, gender='female', password='!')
+                    for index in range(size)
+                ], batch_size=1000)
+                for label, serialize in paths:
+                    users = UserDetails.objects.order_by('id')
+                    queries = []
+                    # Counted with a wrapper: Django's query log keeps the last 9000 queries only
+                    with connection.execute_wrapper(self.count_query(queries)):
+                        start = time.perf_counter()
+                        data = serialize(users)
+                        elapsed = time.perf_counter() - start
+                    if len(data) != size:
+                        raise CommandError(f'{label} returned {len(data)} profiles instead of {size}.')
+                    self.stdout.write(f'{size:>6} profiles, {label:<22} {elapsed * 1000:9.1f} ms, '
+                                      f'{len(queries):>5} queries')
+
+    @staticmethod
+    def count_query(queries):
+        def wrapper(execute, sql, params, many, context):
+            queries.append(sql)
+            return execute(sql, params, many, context)
+        return wrapper
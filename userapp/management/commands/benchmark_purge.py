@@ -0,0 +1,63 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from userapp.management.benchmarks import create_content, max_rss, peak_memory, scratch_database
+from userapp.models import UserDetails
+from userapp.purge import purge_pending, request_purge
+
+
+MB = 1024 * 1024
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures the memory used to delete N users learning --topics topics (50 by default) with as many "
+        "custom lessons each, for each N of --users: request_purge then purge_pending (chunked DELETEs), "
+        "against UserDetails.objects.filter(...).delete() (Django's collector, which loads every user "
+        "row it deletes). Reports the peak of the Python allocations of each, and the peak RSS of the "
+        "process at the end. The chunked purge should stay flat as N grows. Runs against a scratch test "
+        "database, the configured database is not touched. With --budget-mb, exits with an error if the "
+        "chunked purge peaks over the budget."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, nargs='+', default=[1000, 10000, 100000],
+                            help='Numbers of users deleted')
+        parser.add_argument('--topics', type=int, default=50, help='Topics and custom lessons per user')
+        parser.add_argument('--chunk-size', type=int, default=None, help='Rows deleted at a time (PURGE_CHUNK_SIZE)')
+        parser.add_argument('--skip-collector', action='store_true', help='Only measure the chunked purge')
+        parser.add_argument('--budget-mb', type=float, default=None,
+                            help='Maximum peak memory of the chunked purge, in MB')
+
+    def handle(self, *args, **options):
+        topics = options['topics']
+        highest = 0
+        with scratch_database():
+            for users in options['users']:
+                results = []
+
+                user_ids = create_content(f'purge-{users}', users, topics)
+                request_purge(user_ids)
+                start = time.perf_counter()
+                _, peak = peak_memory(lambda: list(purge_pending(chunk_size=options['chunk_size'], pause=0)))
+                results.append(f'chunked {peak / MB:7.1f} MB peak in {time.perf_counter() - start:7.2f} s')
+                if UserDetails.objects.filter(id__in=user_ids).exists():
+                    raise CommandError('The chunked purge left users behind.')
+                highest = max(highest, peak)
+
+                if not options['skip_collector']:
+                    user_ids = create_content(f'collector-{users}', users, topics)
+                    start = time.perf_counter()
+                    _, peak = peak_memory(lambda: UserDetails.objects.filter(id__in=user_ids).delete())
+                    results.append(f'collector {peak / MB:7.1f} MB peak in {time.perf_counter() - start:7.2f} s')
+                self.stdout.write(f'{users:>7} users, {users * topics * 2:>9} rows: ' + '; '.join(results))
+        self.stdout.write(f'Peak RSS of the process: {max_rss() / MB:.1f} MB')
+
+        budget = options['budget_mb']
+        if budget is not None:
+            if highest > budget * MB:
+                raise CommandError(f'The chunked purge peaked at {highest / MB:.1f} MB, '
+                                   f'over the budget of {budget:.1f} MB.')
+            self.stdout.write(self.style.SUCCESS(f'The chunked purge peaked at {highest / MB:.1f} MB, '
+                                                 f'within the budget of {budget:.1f} MB.'))
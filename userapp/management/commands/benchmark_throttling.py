@@ -0,0 +1,66 @@
+import random
+import time
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand, CommandError
+from django.test import RequestFactory, override_settings
+from rest_framework.request import Request
+
+from userapp.authentication import TokenBackedUser
+from userapp.throttling import TokenBucketThrottle
+
+
+class BenchmarkView:
+    throttle_scope = 'benchmark'
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures the time TokenBucketThrottle takes to check a request, with the 'local' and the 'cache' "
+        "backends, for anonymous requests (per IP and global buckets) and authenticated ones (per user, "
+        "per IP and global buckets) spread over --clients clients. Uses generous rates so every request is "
+        "let through, and the THROTTLE_CACHE_ALIAS cache of the settings. "
+        "With --budget-us, exits with an error if a check takes longer than the budget."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=100_000)
+        parser.add_argument('--clients', type=int, default=10_000, help='Distinct IPs and users')
+        parser.add_argument('--backends', nargs='+', default=['local', 'cache'], choices=['local', 'cache'])
+        parser.add_argument('--budget-us', type=float, default=None,
+                            help='Maximum time of a throttle check, in microseconds')
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+        rng = random.Random(0)
+        factory = RequestFactory()
+        requests = {'anonymous': [], 'authenticated': []}
+        for client in range(options['clients']):
+            ip = f'10.{client >> 16 & 255}.{client >> 8 & 255}.{client & 255}'
+            for kind, user in (('anonymous', AnonymousUser()),
+                               ('authenticated', TokenBackedUser({'user_id': client + 1}))):
+                request = Request(factory.post('/userapp/login', REMOTE_ADDR=ip))
+                request.user = user
+                requests[kind].append(request)
+        order = [rng.randrange(options['clients']) for _ in range(iterations)]
+        view = BenchmarkView()
+        rates = {'benchmark': {'user': '1000000/s', 'ip': '1000000/s', 'global': '1000000/s'}}
+
+        slowest = 0.0
+        for backend in options['backends']:
+            with override_settings(THROTTLE_BACKEND=backend, THROTTLE_RATES=rates):
+                for kind, kind_requests in requests.items():
+                    start = time.perf_counter()
+                    for index in order:
+                        if not TokenBucketThrottle().allow_request(kind_requests[index], view):
+                            raise CommandError('A request was throttled, the rates are too low for the benchmark.')
+                    check = (time.perf_counter() - start) / iterations * 1e6
+                    slowest = max(slowest, check)
+                    self.stdout.write(f'{backend:<6} {kind:<14} {check:6.2f} us per check')
+
+        budget = options['budget_us']
+        if budget is not None:
+            if slowest > budget:
+                raise CommandError(f'A throttle check took {slowest:.2f} us, over the budget of {budget:.1f} us.')
+            self.stdout.write(self.style.SUCCESS(f'Throttle checks took at most {slowest:.2f} us, '
+                                                 f'within the budget of {budget:.1f} us.'))
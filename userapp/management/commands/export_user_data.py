@@ -0,0 +1,34 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from userapp.export import EXPORT_FORMATS, stream_export
+from userapp.models import UserDetails
+
+
+class Command(BaseCommand):
+    help = (
+        "Exports the profile, topics and custom lessons of one user (by --user-id or --email) or of every user, "
+        "as NDJSON or as a zip of NDJSON files. The rows are streamed, memory use does not grow with the data."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user-id', type=int, help='Export this user only')
+        parser.add_argument('--email', help='Export the user with this email only')
+        parser.add_argument('--format', choices=EXPORT_FORMATS, default='ndjson')
+        parser.add_argument('--output', '-o', help='File to write, defaults to the standard output')
+
+    def handle(self, *args, **options):
+        user_id = options['user_id']
+        if options['email']:
+            user_id = UserDetails.objects.filter(email=options['email']).values_list('id', flat=True).first()
+            if user_id is None:
+                raise CommandError(f"No user with the email {options['email']}.")
+
+        output = open(options['output'], 'wb') if options['output'] else sys.stdout.buffer
+        try:
+            for chunk in stream_export(options['format'], user_id):
+                output.write(chunk)
+        finally:
+            if options['output']:
+                output.close()
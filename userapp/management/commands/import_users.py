@@ -0,0 +1,74 @@
+import csv
+import json
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+
+from userapp.models import UserDetails
+from userapp.search import index_users
+
+
+IMPORTED_FIELDS = ('email', 'first_name', 'last_name', 'phone_number', 'gender')
+
+
+class Command(BaseCommand):
+    help = (
+        "Imports users from a CSV or JSONL file with batched bulk inserts. "
+        "Each row has an email and optionally first_name, last_name, phone_number, gender and either "
+        "password (hashed during the import) or password_hash (an already hashed Django password). "
+        "Rows whose email or phone number already exists are skipped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV (with a header row) or JSONL file to import')
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help='Defaults to the file extension')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows per INSERT')
+        parser.add_argument('--workers', type=int, default=None,
+                            help='Processes hashing the plain text passwords (default: one per CPU)')
+
+    def handle(self, *args, **options):
+        file_format = options['format'] or ('jsonl' if options['path'].endswith(('.jsonl', '.ndjson')) else 'csv')
+        batch_size = options['batch_size']
+
+        seen = imported = 0
+        with open(options['path'], newline='', encoding='utf-8') as source, \
+                ProcessPoolExecutor(max_workers=options['workers']) as pool:
+            rows = csv.DictReader(source) if file_format == 'csv' else (json.loads(line) for line in source if line.strip())
+            while batch := list(islice(rows, batch_size)):
+                users = self.build_users(batch, seen, pool)
+                UserDetails.objects.bulk_create(users, ignore_conflicts=True)
+                # bulk_create sends no signals and, with ignore_conflicts, sets no ids: find the new users,
+                # the ones without search terms yet, to index and count them
+                new_users = list(UserDetails.objects.filter(email__in=[user.email for user in users],
+                                                            search_terms__isnull=True))
+                index_users(new_users, replace=False)
+                imported += len(new_users)
+                seen += len(batch)
+                self.stdout.write(f'{seen} rows processed')
+
+        self.stdout.write(self.style.SUCCESS(f'Imported {imported} of {seen} users.'))
+
+    def build_users(self, batch, offset, pool):
+        users = []
+        for line, row in enumerate(batch, start=offset + 1):
+            email = (row.get('email') or '').strip()
+            if not email:
+                raise CommandError(f'Row {line} has no email.')
+            fields = {field: row[field] or None for field in IMPORTED_FIELDS if field in row}
+            fields['email'] = UserDetails.objects.normalize_email(email)
+            fields['first_name'] = fields.get('first_name') or ''
+            fields['last_name'] = fields.get('last_name') or ''
+            users.append(UserDetails(password=row.get('password_hash') or '', **fields))
+
+        # Hash the plain text passwords of the batch in parallel
+        plain = [(user, row['password']) for user, row in zip(users, batch)
+                 if not user.password and row.get('password')]
+        hashes = pool.map(make_password, [password for _, password in plain], chunksize=64)
+        for (user, _), encoded in zip(plain, hashes):
+            user.password = encoded
+        for user in users:
+            if not user.password:
+                user.set_unusable_password()
+        return users
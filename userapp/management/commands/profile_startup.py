@@ -0,0 +1,102 @@
+import json
+import os
+import subprocess
+import sys
+from collections import defaultdict
+from statistics import median
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+# Run in a fresh interpreter: the phases of a worker's boot, then the first request's URLconf import
+BOOT_SCRIPT = '''
+import json, time
+start = time.perf_counter()
+from django.conf import settings
+settings.INSTALLED_APPS
+settings_loaded = time.perf_counter()
+import django
+django.setup(set_prefix=False)
+apps_ready = time.perf_counter()
+from django.core.handlers.wsgi import WSGIHandler
+WSGIHandler()
+handler_ready = time.perf_counter()
+from django.urls import get_resolver
+get_resolver().url_patterns
+urls_loaded = time.perf_counter()
+print(json.dumps({
+    'settings': settings_loaded - start,
+    'apps ready': apps_ready - settings_loaded,
+    'middleware': handler_ready - apps_ready,
+    'boot': handler_ready - start,
+    'urls': urls_loaded - handler_ready,
+}))
+'''
+
+
+def parse_import_times(output):
+    """Returns {module: (self seconds, cumulative seconds)} from the stderr of `python -X importtime`."""
+    times = {}
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line.removeprefix('import time:').split('|')
+        times[name.strip()] = (int(self_us) / 1e6, int(cumulative_us) / 1e6)
+    return times
+
+
+class Command(BaseCommand):
+    help = (
+        "Profiles the cold start of a web worker in fresh interpreters: the time to load the settings, "
+        "to get the apps ready, to build the WSGI handler and to import the URLconf on the first request, "
+        "and the modules and packages that take the most time to import. "
+        "With --budget-ms, exits with an error if the median boot time is over the budget."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=5, help='Interpreters started, the median is reported')
+        parser.add_argument('--top', type=int, default=15, help='Number of modules and packages listed')
+        parser.add_argument('--budget-ms', type=float, default=None,
+                            help='Maximum median boot time (settings, apps and middleware), in milliseconds')
+
+    def handle(self, *args, **options):
+        env = {**os.environ, 'DJANGO_SETTINGS_MODULE': os.environ.get('DJANGO_SETTINGS_MODULE', settings.SETTINGS_MODULE)}
+        phases = defaultdict(list)
+        import_times = {}
+        for run in range(options['runs']):
+            # Import times are reported for one run only, -X importtime slows the imports down
+            command = [sys.executable, *(['-X', 'importtime'] if run == 0 else []), '-c', BOOT_SCRIPT]
+            result = subprocess.run(command, env=env, cwd=settings.BASE_DIR, capture_output=True, text=True)
+            if result.returncode:
+                raise CommandError(f'The boot failed:\n{result.stderr[-2000:]}')
+            if run == 0:
+                import_times = parse_import_times(result.stderr)
+                continue
+            for phase, seconds in json.loads(result.stdout.splitlines()[-1]).items():
+                phases[phase].append(seconds)
+        if not phases:
+            raise CommandError('--runs must be at least 2: the first run only collects the import times.')
+
+        self.stdout.write(f'Median of {options["runs"] - 1} runs:')
+        for phase, values in phases.items():
+            self.stdout.write(f'  {phase:<12} {median(values) * 1000:8.1f} ms')
+
+        top = options['top']
+        self.stdout.write('\nSlowest modules (self time):')
+        for name, (self_time, cumulative) in sorted(import_times.items(), key=lambda item: -item[1][0])[:top]:
+            self.stdout.write(f'  {self_time * 1000:8.1f} ms  (cumulative {cumulative * 1000:7.1f} ms)  {name}')
+
+        packages = defaultdict(float)
+        for name, (self_time, _) in import_times.items():
+            packages[name.partition('.')[0]] += self_time
+        self.stdout.write('\nSlowest packages (total self time):')
+        for name, self_time in sorted(packages.items(), key=lambda item: -item[1])[:top]:
+            self.stdout.write(f'  {self_time * 1000:8.1f} ms  {name}')
+
+        boot = median(phases['boot']) * 1000
+        if options['budget_ms'] is not None:
+            if boot > options['budget_ms']:
+                raise CommandError(f'Boot took {boot:.1f} ms, over the budget of {options["budget_ms"]:.1f} ms.')
+            self.stdout.write(self.style.SUCCESS(f'\nBoot took {boot:.1f} ms, within the budget of '
+                                                 f'{options["budget_ms"]:.1f} ms.'))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from rest_framework_simplejwt.settings import api_settings
+
+from userapp.models import RevokedToken, TokenCutoff
+
+
+class Command(BaseCommand):
+    help = (
+        "Deletes the revoked tokens that have expired, and the logout-everywhere cutoffs older "
+        "than the refresh token lifetime, which no valid token can predate."
+    )
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        tokens, _ = RevokedToken.objects.filter(expires_at__lte=now).delete()
+        cutoffs, _ = TokenCutoff.objects.filter(not_before__lte=now - api_settings.REFRESH_TOKEN_LIFETIME).delete()
+        self.stdout.write(self.style.SUCCESS(f'Purged {tokens} revoked tokens and {cutoffs} cutoffs.'))
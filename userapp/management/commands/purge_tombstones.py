@@ -0,0 +1,48 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from userapp.models import UserCreatedLessons, UserDetails, UserLearningTopic
+
+
+class Command(BaseCommand):
+    help = (
+        "Deletes the tombstones of deleted topics and custom lessons that are older than the retention period. "
+        "Each user's sync_floor is raised to the change_seq of their newest purged tombstone, so clients "
+        "holding an older sync token are told to refetch their listings instead of missing the deletes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=getattr(settings, 'SYNC_TOMBSTONE_RETENTION_DAYS', 30),
+                            help='Keep the tombstones of the last N days')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Tombstones deleted per transaction')
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        for model in (UserLearningTopic, UserCreatedLessons):
+            purged = self.purge(model, cutoff, options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(f'Purged {purged} tombstones from {model._meta.db_table}.'))
+
+    def purge(self, model, cutoff, batch_size):
+        purged = 0
+        last_id = 0
+        while True:
+            # Walk the table in id order so every batch starts where the previous one ended
+            batch = list(model.all_objects.filter(id__gt=last_id, is_deleted=True, updated_at__lt=cutoff)
+                         .order_by('id').values_list('id', 'user_id', 'change_seq')[:batch_size])
+            if not batch:
+                return purged
+            last_id = batch[-1][0]
+
+            floors = {}
+            for _, user_id, change_seq in batch:
+                floors[user_id] = max(floors.get(user_id, 0), change_seq)
+            with transaction.atomic():
+                for user_id, floor in floors.items():
+                    UserDetails.objects.filter(id=user_id).update(sync_floor=Greatest('sync_floor', floor))
+                model.all_objects.filter(id__in=[row[0] for row in batch]).delete()
+            purged += len(batch)
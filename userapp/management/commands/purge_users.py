@@ -0,0 +1,41 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.utils import timezone
+
+from userapp.models import UserDetails
+from userapp.purge import get_chunk_pause, get_chunk_size, purge_pending, request_purge
+
+
+class Command(BaseCommand):
+    help = (
+        "Deletes the users queued for deletion, with their topics, lessons and other related rows "
+        "deleted in bounded chunks. With --inactive-days, first queues the non-staff users who have not "
+        "logged in for that many days. An interrupted purge resumes where it stopped when run again."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--inactive-days', type=int, default=None,
+                            help='Also queue the users who have not logged in for this many days')
+        parser.add_argument('--users-per-batch', type=int, default=100, help='Users purged together')
+        parser.add_argument('--chunk-size', type=int, default=get_chunk_size(), help='Related rows deleted per DELETE')
+        parser.add_argument('--pause', type=float, default=get_chunk_pause(), help='Seconds to sleep between chunks')
+
+    def handle(self, *args, **options):
+        if options['inactive_days'] is not None:
+            cutoff = timezone.now() - timedelta(days=options['inactive_days'])
+            inactive = (UserDetails.objects.filter(is_staff=False, is_superuser=False)
+                        .filter(Q(last_login__lt=cutoff) | Q(last_login__isnull=True, date_joined__lt=cutoff))
+                        .values_list('id', flat=True))
+            queued = 0
+            last_id = 0
+            while user_ids := list(inactive.filter(id__gt=last_id).order_by('id')[:options['users_per_batch']]):
+                queued += request_purge(user_ids)
+                last_id = user_ids[-1]
+            self.stdout.write(f'Queued {queued} inactive users.')
+
+        purged = 0
+        for purged in purge_pending(options['users_per_batch'], options['chunk_size'], options['pause']):
+            self.stdout.write(f'{purged} users purged')
+        self.stdout.write(self.style.SUCCESS(f'Purged {purged} users.'))
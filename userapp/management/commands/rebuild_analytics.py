@@ -0,0 +1,33 @@
+from collections import Counter
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from userapp.analytics import lesson_name_key
+from userapp.models import LessonNameStat, Topic, UserCreatedLessons, UserLearningTopic
+
+
+class Command(BaseCommand):
+    help = (
+        "Recomputes the topic learner counts and the lesson name counts from the topics and custom lessons. "
+        "The counters are maintained incrementally; run this after deleting users in bulk or to correct drift."
+    )
+
+    def handle(self, *args, **options):
+        learners = (UserLearningTopic.objects.filter(topic_id=OuterRef('id')).order_by()
+                    .values('topic_id').annotate(count=Count('*')).values('count'))
+        topics = Topic.objects.update(learner_count=Coalesce(Subquery(learners), Value(0)))
+        self.stdout.write(self.style.SUCCESS(f'Recounted the learners of {topics} topics.'))
+
+        # Grouped by the exact name in the database, then merged under the normalized name
+        counts = Counter()
+        names = UserCreatedLessons.objects.order_by().values_list('lesson_name').annotate(count=Count('*'))
+        for name, count in names.iterator(chunk_size=10000):
+            counts[lesson_name_key(name)] += count
+        with transaction.atomic():
+            LessonNameStat.objects.all().delete()
+            LessonNameStat.objects.bulk_create(
+                [LessonNameStat(name=name, lesson_count=count) for name, count in counts.items()], batch_size=1000)
+        self.stdout.write(self.style.SUCCESS(f'Recounted {len(counts)} lesson names.'))
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from userapp.models import UserDetails
+from userapp.search import SEARCH_FIELDS, index_users
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuilds the search terms used by the admin's user search for every user. "
+        "Run it once after adding the UserSearchTerm table, or after changing how the terms are built."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Users re-indexed per transaction')
+
+    def handle(self, *args, **options):
+        indexed = 0
+        last_id = 0
+        while True:
+            users = list(UserDetails.objects.filter(id__gt=last_id).order_by('id')
+                         .only('id', *SEARCH_FIELDS)[:options['batch_size']])
+            if not users:
+                break
+            index_users(users)
+            last_id = users[-1].id
+            indexed += len(users)
+            self.stdout.write(f'{indexed} users indexed')
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt the search terms of {indexed} users.'))
@@ -0,0 +1,85 @@
+import logging
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, connections
+
+from userapp.taskqueue import claim_tasks, finish_task, get_lease, renew_leases, requeue_expired, run_task
+
+
+logger = logging.getLogger(__name__)
+
+
+def _init_worker():
+    # Needed when the pool starts its processes with 'spawn' instead of 'fork'
+    import django
+    django.setup()
+
+
+class Command(BaseCommand):
+    help = (
+        "Runs the queued background tasks (see userapp/taskqueue.py) in a thread or process pool, "
+        "retrying failed tasks with exponential backoff. Several workers can run at the same time."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=4, help='Tasks run at the same time')
+        parser.add_argument('--pool', choices=['thread', 'process'], default='thread',
+                            help='Run the tasks in threads (I/O bound tasks) or processes (CPU bound tasks)')
+        parser.add_argument('--poll-interval', type=float, default=1.0,
+                            help='Seconds to wait before checking an empty queue again')
+        parser.add_argument('--once', action='store_true', help='Exit once no task is due instead of waiting')
+
+    def handle(self, *args, **options):
+        concurrency = options['concurrency']
+        if options['pool'] == 'process':
+            # Forked processes must not share the parent's database connections
+            connections.close_all()
+            pool = ProcessPoolExecutor(max_workers=concurrency, initializer=_init_worker)
+        else:
+            pool = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='task-worker')
+
+        processed = 0
+        with pool:
+            try:
+                while True:
+                    try:
+                        ran = self.run_due_tasks(pool, concurrency)
+                    except DatabaseError:
+                        # The database went away or the claim failed: the claimed tasks are taken over
+                        # once their lease expires, keep the worker alive and try again
+                        logger.exception('Task worker database error')
+                        connections.close_all()
+                        time.sleep(options['poll_interval'])
+                        continue
+                    if not ran:
+                        if options['once']:
+                            break
+                        time.sleep(options['poll_interval'])
+                    processed += ran
+            except KeyboardInterrupt:
+                pass
+        self.stdout.write(self.style.SUCCESS(f'Ran {processed} tasks.'))
+
+    def run_due_tasks(self, pool, concurrency):
+        """Claims up to `concurrency` due tasks, runs them and returns how many ran."""
+        requeue_expired()
+        tasks = claim_tasks(concurrency)
+        futures = {pool.submit(run_task, task.name, task.args, task.kwargs): task for task in tasks}
+        pending = set(futures)
+        renew_every = get_lease().total_seconds() / 3
+        while pending:
+            _, pending = wait(pending, timeout=renew_every)
+            if pending:
+                # Still running: keep the leases, or another worker would run the tasks a second time
+                try:
+                    renew_leases([futures[future].id for future in pending])
+                except DatabaseError:
+                    logger.exception('Task lease renewal failed')
+        for future, task in futures.items():
+            try:
+                finish_task(task, future.exception())
+            except DatabaseError:
+                logger.exception('Task could not be finished', extra={'task': task.name, 'task_id': task.id})
+        return len(tasks)
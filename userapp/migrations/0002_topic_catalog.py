@@ -0,0 +1,28 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# The topics move to the catalog in three migrations: this one adds the nullable topic_ref,
+# 0003 fills it and 0004 replaces the free-text topic column with it. PostgreSQL can not
+# alter a table in the transaction that updated its rows (pending trigger events).
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('userapp', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Topic',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=300)),
+                ('slug', models.SlugField(allow_unicode=True, max_length=300, unique=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='userlearningtopic',
+            name='topic_ref',
+            field=models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, to='userapp.topic'),
+        ),
+    ]
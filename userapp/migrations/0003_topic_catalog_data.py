@@ -0,0 +1,49 @@
+import hashlib
+
+from django.db import migrations
+from django.db.models import Exists, OuterRef
+from django.utils.text import slugify
+
+
+def _slug(name):
+    # Mirrors userapp.models.topic_slug; names without any sluggable character get a stable hashed slug
+    return slugify(name, allow_unicode=True) or 'topic-' + hashlib.sha1(name.encode()).hexdigest()[:12]
+
+
+def move_topics_to_catalog(apps, schema_editor):
+    """
+    Creates one Topic per distinct slug of the free-text topics, points the UserLearningTopic
+    rows at it with one UPDATE per distinct name and removes the rows that become duplicates
+    (same user, same topic), keeping the oldest one.
+    """
+    Topic = apps.get_model('userapp', 'Topic')
+    UserLearningTopic = apps.get_model('userapp', 'UserLearningTopic')
+
+    topic_ids = {}
+    for name in UserLearningTopic.objects.values_list('topic', flat=True).distinct().iterator():
+        slug = _slug(name)
+        if slug not in topic_ids:
+            topic_ids[slug] = Topic.objects.create(name=name, slug=slug).id
+        UserLearningTopic.objects.filter(topic=name).update(topic_ref=topic_ids[slug])
+
+    older = UserLearningTopic.objects.filter(user_id=OuterRef('user_id'), topic_ref=OuterRef('topic_ref'),
+                                             id__lt=OuterRef('id'))
+    UserLearningTopic.objects.filter(Exists(older)).delete()
+
+
+def move_topics_out_of_catalog(apps, schema_editor):
+    Topic = apps.get_model('userapp', 'Topic')
+    UserLearningTopic = apps.get_model('userapp', 'UserLearningTopic')
+    for topic_id, name in Topic.objects.values_list('id', 'name').iterator():
+        UserLearningTopic.objects.filter(topic_ref=topic_id).update(topic=name)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('userapp', '0002_topic_catalog'),
+    ]
+
+    operations = [
+        migrations.RunPython(move_topics_to_catalog, move_topics_out_of_catalog),
+    ]
@@ -0,0 +1,39 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('userapp', '0003_topic_catalog_data'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='userlearningtopic',
+            name='topic',
+        ),
+        migrations.RenameField(
+            model_name='userlearningtopic',
+            old_name='topic_ref',
+            new_name='topic',
+        ),
+        migrations.AlterField(
+            model_name='userlearningtopic',
+            name='topic',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='userapp.topic'),
+        ),
+        migrations.AddField(
+            model_name='userdetails',
+            name='topics',
+            field=models.ManyToManyField(blank=True, related_name='users', through='userapp.UserLearningTopic', to='userapp.topic'),
+        ),
+        migrations.AddConstraint(
+            model_name='userlearningtopic',
+            constraint=models.UniqueConstraint(fields=('user', 'topic'), name='unique_user_learning_topic'),
+        ),
+        migrations.AddIndex(
+            model_name='userlearningtopic',
+            index=models.Index(fields=['topic', 'user'], name='userapp_topic_user_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1 on 2026-10-18 14:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('userapp', '0004_topic_catalog_references'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userdetails',
+            name='content_version',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.1 on 2026-10-18 14:17
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('userapp', '0005_userdetails_content_version'),
+    ]
+
+    operations = [
+        # Create the composite indexes before dropping the single column ones they replace
+        migrations.AddIndex(
+            model_name='usercreatedlessons',
+            index=models.Index(fields=['user', 'id'], name='userapp_lesson_user_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='userlearningtopic',
+            index=models.Index(fields=['user', 'id'], name='userapp_ltopic_user_id_idx'),
+        ),
+        migrations.AlterField(
+            model_name='usercreatedlessons',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='userlearningtopic',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+    ]
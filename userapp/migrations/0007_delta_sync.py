@@ -0,0 +1,72 @@
+# Generated by Django 5.1 on 2026-10-18 14:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('userapp', '0006_user_id_indexes'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='userlearningtopic',
+            name='unique_user_learning_topic',
+        ),
+        migrations.RemoveIndex(
+            model_name='userlearningtopic',
+            name='userapp_topic_user_idx',
+        ),
+        migrations.AddField(
+            model_name='usercreatedlessons',
+            name='change_seq',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='usercreatedlessons',
+            name='is_deleted',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='usercreatedlessons',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='userdetails',
+            name='sync_floor',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='userlearningtopic',
+            name='change_seq',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='userlearningtopic',
+            name='is_deleted',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='userlearningtopic',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddIndex(
+            model_name='usercreatedlessons',
+            index=models.Index(fields=['user', 'change_seq'], name='userapp_lesson_user_seq_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='userlearningtopic',
+            index=models.Index(fields=['topic', 'user', 'is_deleted'], name='userapp_topic_user_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='userlearningtopic',
+            index=models.Index(fields=['user', 'change_seq'], name='userapp_ltopic_user_seq_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='userlearningtopic',
+            constraint=models.UniqueConstraint(condition=models.Q(('is_deleted', False)), fields=('user', 'topic'), name='unique_user_learning_topic'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.1 on 2026-10-18 14:24
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('userapp', '0007_delta_sync'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='userdetails',
+            name='otp',
+        ),
+        migrations.CreateModel(
+            name='OneTimeCode',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('email', models.EmailField(max_length=254)),
+                ('purpose', models.CharField(max_length=30)),
+                ('code_hash', models.CharField(blank=True, max_length=64)),
+                ('issued_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('expires_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('issue_count', models.PositiveSmallIntegerField(default=0)),
+                ('window_started_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('email', 'purpose'), name='unique_one_time_code')],
+            },
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.1 on 2026-10-18 14:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('userapp', '0011_user_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AppliedCounterBatch',
+            fields=[
+                ('batch_id', models.UUIDField(primary_key=True, serialize=False)),
+                ('applied_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='LessonNameStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=350, unique=True)),
+                ('lesson_count', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='topic',
+            name='learner_count',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='topic',
+            index=models.Index(fields=['-learner_count', 'id'], name='userapp_topic_popular_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='lessonnamestat',
+            index=models.Index(fields=['-lesson_count', 'id'], name='userapp_lesson_name_top_idx'),
+        ),
+    ]
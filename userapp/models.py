@@ -1,8 +1,19 @@
-from django.db import models
+import hashlib
+
+from django.db import models, transaction
 from django.contrib.auth.base_user import AbstractBaseUser, BaseUserManager
 from django.contrib.auth.models import PermissionsMixin, AbstractUser
 from django.db import models
+from django.dispatch import Signal
 from django.utils import timezone
+from django.utils.text import slugify
+
+from .hashers import amake_password, averify_password, make_password, verify_password
+
+
+# Sent by the bulk writes of UserContent rows, which send no post_save, with the `added` and
+# `removed` values of the model's `counted_field` (see userapp/analytics.py)
+user_content_changed = Signal()
 
 
 # USER_GENDER = [
@@ -15,9 +26,7 @@ class CustomUserManager(BaseUserManager):
     def create_user(self, email, password=None, **extra_fields):
         if not email:
             raise ValueError('The Email field must be set')
-        if email is not None:
-            if UserDetails.objects.filter(email=email).exists():
-                raise ValueError('Email must be unique.')
+        # Uniqueness is enforced by the unique constraint, callers handle the IntegrityError
         email = self.normalize_email(email)
         user = self.model(email=email, **extra_fields)
         user.set_password(password)
@@ -37,6 +46,22 @@ class CustomUserManager(BaseUserManager):
 
         return self.create_user(email, password, **extra_fields)
 
+    def bump_content_version(self, user_id):
+        """
+        Marks the user's topics or custom lessons as changed, invalidating the ETags of their listings,
+        and returns the new version, which is the `change_seq` of the rows written in this change.
+        Call it inside the transaction that writes the rows, before writing them: the UPDATE locks the
+        user's row, so the changes of one user commit in `change_seq` order.
+        """
+        self.filter(id=user_id).update(content_version=models.F('content_version') + 1)
+        return self.db_manager('default').get_content_version(user_id)
+
+    def get_content_version(self, user_id):
+        return self.filter(id=user_id).values_list('content_version', flat=True).first()
+
+    async def aget_content_version(self, user_id):
+        return await self.filter(id=user_id).values_list('content_version', flat=True).afirst()
+
 
 class UserDetails(AbstractUser):
     username = None
@@ -51,7 +76,11 @@ class UserDetails(AbstractUser):
     is_staff = models.BooleanField(default=False)
     is_superuser = models.BooleanField(default=False)
     date_joined = models.DateTimeField(default=timezone.now)
-    otp = models.CharField(max_length=10, default = '0000')
+    # Incremented on every write to the user's topics or custom lessons
+    content_version = models.PositiveBigIntegerField(default=0)
+    # Highest change_seq of the tombstones purged by purge_tombstones; older sync tokens must resync
+    sync_floor = models.PositiveBigIntegerField(default=0)
+    topics = models.ManyToManyField('Topic', through='UserLearningTopic', related_name='users', blank=True)
 
     objects = CustomUserManager()
 
@@ -60,26 +89,191 @@ class UserDetails(AbstractUser):
 
     def __str__(self):
         return self.email
+
+    def set_password(self, raw_password):
+        # Hashed through the bounded hashing pool, see userapp.hashers
+        self.password = make_password(raw_password)
+        self._password = raw_password
+
+    def check_password(self, raw_password):
+        """Checks the password and transparently rehashes it if the hashing policy changed."""
+        is_correct, must_update = verify_password(raw_password, self.password)
+        if is_correct and must_update:
+            self.set_password(raw_password)
+            self.save(update_fields=['password'])
+        return is_correct
+
+    async def acheck_password(self, raw_password):
+        """Async version of check_password, hashing through userapp.hashers without blocking the event loop."""
+        is_correct, must_update = await averify_password(raw_password, self.password)
+        if is_correct and must_update:
+            self.password = await amake_password(raw_password)
+            self._password = raw_password
+            await self.asave(update_fields=['password'])
+        return is_correct
     
 
-class UserLearningTopic(models.Model):
+class UserContentQuerySet(models.QuerySet):
+    def tombstone(self, user_id):
+        """
+        Soft-deletes the live rows of this queryset, which must only hold rows of `user_id`,
+        with a single UPDATE. Returns the number of rows deleted.
+        """
+        with transaction.atomic():
+            change_seq = UserDetails.objects.bump_content_version(user_id)
+            live = self.filter(is_deleted=False)
+            removed = []
+            if user_content_changed.has_listeners(self.model):
+                # Read after the version bump, which locks the user's row, so no other delete races this one
+                removed = list(live.values_list(self.model.counted_field, flat=True))
+            deleted = live.update(is_deleted=True, change_seq=change_seq, updated_at=timezone.now())
+            if not deleted:
+                # Nothing changed, keep the version and the listings' ETags as they were
+                transaction.set_rollback(True)
+            elif removed:
+                user_content_changed.send(sender=self.model, user_id=user_id, added=[], removed=removed)
+        return deleted
+
+
+class LiveContentManager(models.Manager.from_queryset(UserContentQuerySet)):
+    """Only returns the rows that are not soft-deleted."""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(is_deleted=False)
+
+
+class UserContent(models.Model):
+    """
+    Base class of the per-user content models (topics and custom lessons).
+
+    Every write stamps the row with the owner's new `content_version` as its `change_seq`, and
+    deletes only mark the row as `is_deleted` (a tombstone), so clients can fetch what changed
+    since a given version (see userapp/sync.py). Tombstones are purged by the purge_tombstones command.
+
+    `objects` hides the tombstones, `all_objects` includes them. Saving or deleting a single row
+    takes care of the version; code that writes with bulk_create/bulk_update must call
+    `bump_content_version` first and set `change_seq` itself, and deletes go through `tombstone`.
+    Bulk writes also send `user_content_changed` with the `counted_field` values they added and removed.
+    """
+
+    change_seq = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    is_deleted = models.BooleanField(default=False)
+
+    objects = LiveContentManager()
+    all_objects = UserContentQuerySet.as_manager()
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = {*update_fields, 'change_seq', 'updated_at'}
+        with transaction.atomic():
+            self.change_seq = UserDetails.objects.bump_content_version(self.user_id)
+            if self.change_seq is None:
+                raise UserDetails.DoesNotExist('The owner of the row does not exist.')
+            super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        self.is_deleted = True
+        self.save(update_fields=['is_deleted'])
+        return 1, {self._meta.label: 1}
+
+
+def topic_slug(name):
+    """
+    Returns the catalog key of a topic name, e.g. 'Machine  Learning' -> 'machine-learning'.
+    Names without any sluggable character get a stable hashed slug instead.
+    """
+    return slugify(name, allow_unicode=True) or 'topic-' + hashlib.sha1(name.encode()).hexdigest()[:12]
+
+
+class TopicManager(models.Manager):
+    def resolve(self, names):
+        """
+        Returns a dict mapping the slug of every name in `names` to its Topic id,
+        adding the topics that are not in the catalog yet with a single bulk INSERT.
+        """
+        names_by_slug = {}
+        for name in names:
+            names_by_slug.setdefault(topic_slug(name), name)
+        if not names_by_slug:
+            return {}
+        self.bulk_create([Topic(name=name, slug=slug) for slug, name in names_by_slug.items()],
+                         ignore_conflicts=True)
+        return dict(self.filter(slug__in=names_by_slug).values_list('slug', 'id'))
+
+
+class Topic(models.Model):
+    """
+    This model represents a learning topic in the shared topic catalog.
+
+    Fields:
+    - name: A CharField holding the display name of the topic, as it was first entered.
+    - slug: A unique, indexed SlugField derived from the name (see `topic_slug`), used to
+            de-duplicate topics that only differ in case, spacing or punctuation.
+    - learner_count: The number of users learning the topic, maintained by userapp/analytics.py.
+    """
+
+    name = models.CharField(max_length=300)
+    slug = models.SlugField(max_length=300, unique=True, allow_unicode=True)
+    learner_count = models.BigIntegerField(default=0)
+
+    objects = TopicManager()
+
+    class Meta:
+        indexes = [
+            # Most learned topics, read from the top of the index
+            models.Index(fields=['-learner_count', 'id'], name='userapp_topic_popular_idx'),
+        ]
+
+    def __str__(self):
+        return self.name
+
+
+class UserLearningTopic(UserContent):
     """
     This model represents the topics a user has selected to learn.
+    It is the through table of `UserDetails.topics`.
     
     Fields:
     - user : A ForeignKey to the UserDetails model, representing the user who selected the topics.
-    - topic: A CharField that holds the name of the learning topic chosen by the user,
-             with a maximum length of 300 characters. The default value is 'NIL'.
+    - topic: A ForeignKey to the Topic catalog, representing the topic chosen by the user.
+
+    A user can select a topic only once. The (user, id) index serves the per-user listing and
+    the (topic, user) index lets "which users learn topic X" be answered from the index alone.
+    The unique constraint only covers the live rows, so a topic can be selected again after it
+    was deleted. Note that `UserDetails.topics` and `Topic.users` read the table directly and
+    also return the tombstones.
     """
 
-    user = models.ForeignKey(UserDetails, on_delete=models.CASCADE)
-    topic = models.CharField(max_length=300, default = 'NIL')
+    # Both columns are covered by the composite indexes below
+    user = models.ForeignKey(UserDetails, on_delete=models.CASCADE, db_index=False)
+    topic = models.ForeignKey(Topic, on_delete=models.CASCADE, db_index=False)
+
+    counted_field = 'topic_id'
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'topic'], condition=models.Q(is_deleted=False),
+                                    name='unique_user_learning_topic'),
+        ]
+        indexes = [
+            # Ordered, cursor paginated listing of a user's topics
+            models.Index(fields=['user', 'id'], name='userapp_ltopic_user_id_idx'),
+            # is_deleted is part of the index so the tombstones are skipped without reading the table
+            models.Index(fields=['topic', 'user', 'is_deleted'], name='userapp_topic_user_idx'),
+            # Changes since a sync token
+            models.Index(fields=['user', 'change_seq'], name='userapp_ltopic_user_seq_idx'),
+        ]
 
     def __str__(self):
         return self.user.email
     
 
-class UserCreatedLessons(models.Model):
+class UserCreatedLessons(UserContent):
     """
     This model represents the lessons created by the user.
 
@@ -88,10 +282,182 @@ class UserCreatedLessons(models.Model):
     - lesson_name: A CharField to store the name of the lesson, with a maximum length of 350 characters.
     """
 
-    user = models.ForeignKey(UserDetails, on_delete= models.CASCADE)
+    # Covered by the (user, id) index
+    user = models.ForeignKey(UserDetails, on_delete= models.CASCADE, db_index=False)
     lesson_name = models.CharField(max_length=350,default='NIL')
 
+    counted_field = 'lesson_name'
 
+    class Meta:
+        indexes = [
+            # Ordered, cursor paginated listing of a user's lessons
+            models.Index(fields=['user', 'id'], name='userapp_lesson_user_id_idx'),
+            # Changes since a sync token
+            models.Index(fields=['user', 'change_seq'], name='userapp_lesson_user_seq_idx'),
+        ]
+
+
+class LessonNameStat(models.Model):
+    """
+    This model counts the custom lessons by name, maintained by userapp/analytics.py.
+
+    Fields:
+    - name: The normalized lesson name (see `analytics.lesson_name_key`).
+    - lesson_count: The number of live custom lessons with that name.
+    """
 
+    name = models.CharField(max_length=350, unique=True)
+    lesson_count = models.BigIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            # Most common lesson names, read from the top of the index
+            models.Index(fields=['-lesson_count', 'id'], name='userapp_lesson_name_top_idx'),
+        ]
+
+
+class AppliedCounterBatch(models.Model):
+    """
+    This model records the counter delta batches already applied (see userapp/analytics.py),
+    so a batch whose task runs twice is only counted once.
+
+    Fields:
+    - batch_id: The id the batch was given when it was flushed.
+    - applied_at: When it was applied; old rows are deleted after ANALYTICS_BATCH_RETENTION seconds.
+    """
+
+    batch_id = models.UUIDField(primary_key=True)
+    applied_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+
+class OneTimeCode(models.Model):
+    """
+    This model holds the current one-time code of an email address for a purpose (see userapp/otp.py).
+
+    Fields:
+    - email, purpose: Identify the code; there is at most one row per pair.
+    - code_hash: Keyed hash of the code, empty once the code was used.
+    - issued_at, expires_at: When the code was issued and until when it is valid.
+    - attempts: Wrong guesses made against the current code.
+    - issue_count, window_started_at: Codes issued in the current rate limit window.
+    """
+
+    email = models.EmailField()
+    purpose = models.CharField(max_length=30)
+    code_hash = models.CharField(max_length=64, blank=True)
+    issued_at = models.DateTimeField(default=timezone.now)
+    expires_at = models.DateTimeField(default=timezone.now)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    issue_count = models.PositiveSmallIntegerField(default=0)
+    window_started_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['email', 'purpose'], name='unique_one_time_code'),
+        ]
+
+
+class QueuedTask(models.Model):
+    """
+    This model is the queue of the background tasks (see userapp/taskqueue.py).
+
+    Fields:
+    - name: Import path of the task.
+    - args, kwargs: The JSON encoded arguments of the task.
+    - status: 'pending' until a worker claims it, 'running' while a worker holds it and
+              'failed' once it ran out of attempts. Tasks that succeed are deleted.
+    - run_at: When the task becomes due, pushed back after each failure.
+    - attempts, max_attempts: Attempts made so far and allowed in total.
+    - locked_until: End of the running worker's lease.
+    - last_error: Traceback of the last failure.
+    """
+
+    PENDING = 'pending'
+    RUNNING = 'running'
+    FAILED = 'failed'
+    STATUS_CHOICES = [(PENDING, 'Pending'), (RUNNING, 'Running'), (FAILED, 'Failed')]
+
+    name = models.CharField(max_length=200)
+    args = models.JSONField(default=list)
+    kwargs = models.JSONField(default=dict)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    run_at = models.DateTimeField(default=timezone.now)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    locked_until = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # Due tasks, oldest first
+            models.Index(fields=['status', 'run_at'], name='userapp_task_status_run_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.name} ({self.status})'
+
+
+class RevokedToken(models.Model):
+    """
+    This model holds the JWTs revoked one by one, e.g. on logout (see userapp/revocation.py).
+
+    Fields:
+    - jti: The token's unique id claim.
+    - expires_at: When the token expires; the row is useless afterwards and can be purged.
+    - revoked_at: When the token was revoked, used to sync the in-memory lists incrementally.
+    """
+
+    jti = models.CharField(max_length=255, unique=True)
+    expires_at = models.DateTimeField(db_index=True)
+    revoked_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+
+class TokenCutoff(models.Model):
+    """
+    This model revokes all the JWTs of a user issued up to `not_before` (logout everywhere).
+    `updated_at` is used to sync the in-memory lists incrementally.
+    The row is kept when the user is deleted, so their tokens stay revoked until they expire;
+    purge_revoked_tokens deletes it afterwards.
+    """
+
+    user = models.OneToOneField(UserDetails, on_delete=models.DO_NOTHING, db_constraint=False, primary_key=True)
+    not_before = models.DateTimeField()
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+
+class PendingPurge(models.Model):
+    """
+    This model queues a user account for deletion (see userapp/purge.py).
+
+    Fields:
+    - user_id: The id of the user, not a foreign key: the row is deleted with the user, by the purge itself.
+    - requested_at: When the deletion was requested.
+    """
+
+    user_id = models.BigIntegerField(primary_key=True)
+    requested_at = models.DateTimeField(auto_now_add=True)
+
+
+class UserSearchTerm(models.Model):
+    """
+    This model holds the search terms of a user, used by the admin's user search (see userapp/search.py).
+
+    Fields:
+    - user: A ForeignKey to the UserDetails model.
+    - term: A lowercased word or whole value of the user's email, names or phone number.
+    """
 
+    # Covered by the (term, user) index for searches and the unique constraint for re-indexing
+    user = models.ForeignKey(UserDetails, on_delete=models.CASCADE, related_name='search_terms', db_index=False)
+    term = models.CharField(max_length=100)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'term'], name='unique_user_search_term'),
+        ]
+        indexes = [
+            # Prefix searches; the operator classes only apply on PostgreSQL
+            models.Index(fields=['term', 'user'], opclasses=['varchar_pattern_ops', 'int8_ops'],
+                         name='userapp_search_term_idx'),
+        ]
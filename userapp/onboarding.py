@@ -0,0 +1,93 @@
+from django.db import transaction
+from django.utils import timezone
+
+from userapp.models import Topic, UserDetails, UserLearningTopic, topic_slug, user_content_changed
+
+
+ONBOARDING_MODES = ('append', 'replace')
+
+MAX_TOPIC_LENGTH = Topic._meta.get_field('name').max_length
+
+
+def clean_topics(topics):
+    """
+    Validates the topics sent during onboarding and removes duplicates.
+
+    Surrounding whitespace is stripped, blank entries are dropped and the first
+    occurrence of each topic (compared by its catalog slug) wins, so the original
+    order is preserved.
+    Raises ValueError with a user facing message if a topic is invalid.
+    """
+
+    cleaned = []
+    seen = set()
+    for topic in topics:
+        if not isinstance(topic, str):
+            raise ValueError('Each topic must be a string.')
+        topic = topic.strip()
+        if not topic:
+            continue
+        if len(topic) > MAX_TOPIC_LENGTH:
+            raise ValueError(f'A topic can not be longer than {MAX_TOPIC_LENGTH} characters.')
+        slug = topic_slug(topic)
+        if slug in seen:
+            continue
+        seen.add(slug)
+        cleaned.append(topic)
+    return cleaned
+
+
+def save_onboarding(user, topics, image=None, gender=None, mode='append'):
+    """
+    Saves the onboarding details of a user in a single transaction, holding the lock of the
+    user's row (on the databases with row locks; SQLite serializes the writers anyway).
+
+    - The profile image and gender are written with one UPDATE.
+    - The topics are resolved against the Topic catalog, adding the unknown ones.
+    - The user's existing topics are read once and only the missing ones are
+      inserted, with a single bulk INSERT.
+    - In 'replace' mode the topics that are no longer selected are soft-deleted with
+      a single UPDATE, so repeating the request is a no-op.
+    - All the changes share one new `change_seq`.
+
+    `topics` must already be cleaned with `clean_topics`.
+    Returns a tuple of (number of topics added, number of topics removed).
+    """
+
+    with transaction.atomic():
+        # Lock the user's row before reading their topics: concurrent onboardings of the same user
+        # then run one after the other instead of inserting the same topics twice
+        list(UserDetails.objects.select_for_update().filter(id=user.id).values_list('id', flat=True))
+
+        update_fields = []
+        if image:
+            user.profile_image = image
+            update_fields.append('profile_image')
+        if gender:
+            user.gender = gender
+            update_fields.append('gender')
+        if update_fields:
+            user.save(update_fields=update_fields)
+
+        topic_ids = Topic.objects.resolve(topics)
+        wanted = set(topic_ids.values())
+        existing = set(UserLearningTopic.objects.filter(user=user).values_list('topic_id', flat=True))
+
+        new_topics = [UserLearningTopic(user=user, topic_id=topic_ids[topic_slug(topic)])
+                      for topic in topics if topic_ids[topic_slug(topic)] not in existing]
+        stale_ids = existing - wanted if mode == 'replace' else set()
+
+        removed = 0
+        if new_topics or stale_ids:
+            change_seq = UserDetails.objects.bump_content_version(user.id)
+            for new_topic in new_topics:
+                new_topic.change_seq = change_seq
+            UserLearningTopic.objects.bulk_create(new_topics)
+            if stale_ids:
+                removed = UserLearningTopic.objects.filter(user=user, topic_id__in=stale_ids).update(
+                    is_deleted=True, change_seq=change_seq, updated_at=timezone.now())
+            user_content_changed.send(sender=UserLearningTopic, user_id=user.id,
+                                      added=[new_topic.topic_id for new_topic in new_topics],
+                                      removed=list(stale_ids) if removed else [])
+
+    return len(new_topics), removed
@@ -0,0 +1,128 @@
+"""
+One-time codes, e.g. for password resets.
+
+Codes live in the OneTimeCode table, one row per (email, purpose), never in UserDetails.
+Only a keyed hash of the code is stored. The code itself is derived from the row with a keyed
+hash as well, so `send_code` queues the row id and the email task rebuilds the code: it is
+never written to the task queue. A code expires after OTP_TTL seconds and is burned
+after OTP_MAX_ATTEMPTS wrong guesses. Issuing is rate limited per email: a new code can be
+requested OTP_RESEND_INTERVAL seconds after the previous one, and at most
+OTP_MAX_ISSUES_PER_WINDOW times per OTP_ISSUE_WINDOW seconds.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.crypto import constant_time_compare, salted_hmac
+
+from userapp.models import OneTimeCode
+from userapp.outbox import deliver_email
+from userapp.taskqueue import task
+
+
+PASSWORD_RESET = 'password_reset'
+
+# Subject and body of the emails carrying the codes, per purpose
+MESSAGES = {
+    PASSWORD_RESET: ('Your password reset code',
+                     'Your password reset code is {code}. It expires in {minutes} minutes.'),
+}
+
+
+class OTPRateLimited(Exception):
+    def __init__(self, retry_after):
+        super().__init__(f'Try again in {retry_after} seconds.')
+        self.retry_after = retry_after
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def get_ttl():
+    """Seconds a code stays valid."""
+    return _setting('OTP_TTL', 10 * 60)
+
+
+def _hash_code(email, purpose, code):
+    return salted_hmac('userapp.otp', f'{purpose}:{email}:{code}', algorithm='sha256').hexdigest()
+
+
+def _normalize(email):
+    return str(email).strip().lower()
+
+
+def get_code(entry):
+    """Returns the code of a OneTimeCode row, derived from its email, purpose and issue time."""
+    length = _setting('OTP_LENGTH', 6)
+    digest = salted_hmac('userapp.otp.code', f'{entry.purpose}:{entry.email}:{entry.issued_at.isoformat()}',
+                         algorithm='sha256').hexdigest()
+    return f'{int(digest, 16) % 10 ** length:0{length}d}'
+
+
+def issue_code(email, purpose=PASSWORD_RESET):
+    """
+    Creates a new code for `email`, replacing the previous one, and returns its OneTimeCode row
+    (see `get_code` and `send_code`). Raises OTPRateLimited if a code was issued too recently or too often.
+    """
+    email = _normalize(email)
+    now = timezone.now()
+
+    with transaction.atomic():
+        entry, created = OneTimeCode.objects.select_for_update().get_or_create(
+            email=email, purpose=purpose, defaults={'window_started_at': now})
+        if not created:
+            retry_after = (entry.issued_at + timedelta(seconds=_setting('OTP_RESEND_INTERVAL', 60)) - now).total_seconds()
+            if retry_after > 0:
+                raise OTPRateLimited(int(retry_after) + 1)
+            window_end = entry.window_started_at + timedelta(seconds=_setting('OTP_ISSUE_WINDOW', 60 * 60))
+            if window_end <= now:
+                entry.window_started_at = now
+                entry.issue_count = 0
+            elif entry.issue_count >= _setting('OTP_MAX_ISSUES_PER_WINDOW', 5):
+                raise OTPRateLimited(int((window_end - now).total_seconds()) + 1)
+
+        entry.issued_at = now
+        entry.code_hash = _hash_code(email, purpose, get_code(entry))
+        entry.expires_at = now + timedelta(seconds=get_ttl())
+        entry.attempts = 0
+        entry.issue_count += 1
+        entry.save()
+    return entry
+
+
+@task(max_attempts=5, retry_backoff=60)
+def deliver_code(code_id, issued_at):
+    """Emails the code of OneTimeCode `code_id` issued at `issued_at`, unless it was used, replaced or expired."""
+    entry = OneTimeCode.objects.filter(id=code_id, expires_at__gt=timezone.now()).exclude(code_hash='').first()
+    if entry is None or entry.issued_at.isoformat() != issued_at:
+        return
+    subject, body = MESSAGES[entry.purpose]
+    deliver_email(subject, body.format(code=get_code(entry), minutes=get_ttl() // 60), [entry.email])
+
+
+def send_code(entry):
+    """Queues the email of the code issued in `entry`, sent after the current transaction commits."""
+    deliver_code.delay(entry.id, entry.issued_at.isoformat())
+
+
+def verify_code(email, code, purpose=PASSWORD_RESET):
+    """
+    Returns True if `code` is the current, unexpired code of `email`, consuming it.
+    Every wrong guess counts against OTP_MAX_ATTEMPTS, after which the code is burned.
+    """
+    email = _normalize(email)
+    now = timezone.now()
+    with transaction.atomic():
+        entry = (OneTimeCode.objects.select_for_update()
+                 .filter(email=email, purpose=purpose, expires_at__gt=now).exclude(code_hash='').first())
+        if entry is None or entry.attempts >= _setting('OTP_MAX_ATTEMPTS', 5):
+            return False
+        if not constant_time_compare(entry.code_hash, _hash_code(email, purpose, str(code).strip())):
+            OneTimeCode.objects.filter(pk=entry.pk).update(attempts=F('attempts') + 1)
+            return False
+        # Consumed; the row stays so the issue rate limit keeps counting
+        OneTimeCode.objects.filter(pk=entry.pk).update(code_hash='')
+    return True
@@ -0,0 +1,21 @@
+"""
+Email outbox.
+
+`send_email` queues a message as a background task (see userapp/taskqueue.py) and returns
+immediately; the task worker sends it through Django's EMAIL_BACKEND once the current
+transaction commits. Any backend works: SMTP in production, the console or file backend
+locally and the locmem backend in tests.
+"""
+from django.core.mail import EmailMessage
+
+from userapp.taskqueue import task
+
+
+@task(max_attempts=5, retry_backoff=60)
+def deliver_email(subject, body, to):
+    EmailMessage(subject, body, to=to).send()
+
+
+def send_email(subject, body, to):
+    """Queues an email to the addresses in `to`, sent after the current transaction commits."""
+    deliver_email.delay(subject, body, list(to))
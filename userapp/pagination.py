@@ -0,0 +1,81 @@
+import base64
+import binascii
+
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset (cursor) pagination on the primary key.
+
+    Each page is read with `WHERE id > <last id of the previous page> ORDER BY id LIMIT n`,
+    so the cost of a page does not depend on how deep into the list it is.
+
+    Query Parameters:
+    - `cursor`: The opaque `next_cursor` returned with the previous page.
+    - `page_size`: Number of rows per page, defaults to REST_FRAMEWORK['PAGE_SIZE'] and is capped at `max_page_size`.
+
+    Works with DRF requests as well as plain Django requests (see `apaginate_queryset`).
+    """
+
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+
+    def get_page_size(self, request):
+        page_size = api_settings.PAGE_SIZE or 100
+        try:
+            page_size = int(request.GET[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return page_size
+        return max(1, min(page_size, self.max_page_size))
+
+    def decode_cursor(self, request):
+        cursor = request.GET.get(self.cursor_query_param)
+        if not cursor:
+            return None
+        try:
+            return int(base64.urlsafe_b64decode(cursor.encode()).decode())
+        except (binascii.Error, UnicodeDecodeError, ValueError):
+            raise NotFound('Invalid cursor')
+
+    def encode_cursor(self, pk):
+        return base64.urlsafe_b64encode(str(pk).encode()).decode()
+
+    def limit_queryset(self, queryset, request):
+        """Returns the queryset of the requested page, with one extra row to detect a next page."""
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        after = self.decode_cursor(request)
+        if after is not None:
+            queryset = queryset.filter(pk__gt=after)
+        return queryset.order_by('pk')[:self.page_size + 1]
+
+    def trim_page(self, rows):
+        self.next_cursor = self.encode_cursor(rows[self.page_size - 1].pk) if len(rows) > self.page_size else None
+        return rows[:self.page_size]
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.trim_page(list(self.limit_queryset(queryset, request)))
+
+    async def apaginate_queryset(self, queryset, request):
+        return self.trim_page([row async for row in self.limit_queryset(queryset, request)])
+
+    def get_next_link(self):
+        if self.next_cursor is None:
+            return None
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_data(self, data):
+        return {
+            'next': self.get_next_link(),
+            'next_cursor': self.next_cursor,
+            'results': data,
+        }
+
+    def get_paginated_response(self, data):
+        return Response(self.get_paginated_data(data))
@@ -0,0 +1,94 @@
+"""
+Read-through cache of the rendered user profiles.
+
+Each user has a version number in the cache, and their profile is cached under a key that
+includes it. Writes bump the version (see signals.py, after the save and once more after the
+commit) instead of deleting the entry: a reader that loaded the row before a write stores it
+under the old version, which no reader looks up anymore, rather than putting a stale profile
+back under the current key. Versions start from the clock, so a version evicted from the cache
+and created again never matches the entries cached under the old one.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from userapp.models import UserDetails
+from userapp.renderers import dumps
+from userapp.serializers import PROFILE_FIELDS, render_profile
+from iveye_backend.metrics import serializer_timer
+
+
+# Bump whenever the serialized profile changes shape, so stale entries are never served
+PROFILE_CACHE_VERSION = 4
+
+
+def profile_version_key(user_id):
+    return f'userapp:profile-version:{user_id}'
+
+
+def profile_cache_key(user_id, version):
+    return f'userapp:profile:v{PROFILE_CACHE_VERSION}:{user_id}:{version}'
+
+
+def _new_version():
+    return time.time_ns() // 1000
+
+
+def get_profile_version(user_id):
+    key = profile_version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        # add() keeps the version another process created meanwhile
+        cache.add(key, _new_version(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+async def aget_profile_version(user_id):
+    key = profile_version_key(user_id)
+    version = await cache.aget(key)
+    if version is None:
+        await cache.aadd(key, _new_version(), timeout=None)
+        version = await cache.aget(key)
+    return version
+
+
+def get_profile_json(user_id):
+    """
+    Returns the rendered JSON bytes of the user's profile.
+
+    The bytes are read from Django's cache when present; otherwise only the profile
+    columns are loaded from the database, rendered and stored for PROFILE_CACHE_TIMEOUT seconds.
+    Raises UserDetails.DoesNotExist if the user is gone.
+    """
+    key = profile_cache_key(user_id, get_profile_version(user_id))
+    content = cache.get(key)
+    if content is None:
+        # Read from the primary database, not the in-process row cache or a replica, so the
+        # shared cache is never re-populated with a row older than the last invalidation.
+        row = UserDetails.objects.db_manager('default').values(*PROFILE_FIELDS).get(id=user_id)
+        with serializer_timer():
+            content = dumps(render_profile(row))
+        cache.set(key, content, timeout=getattr(settings, 'PROFILE_CACHE_TIMEOUT', 300))
+    return content
+
+
+async def aget_profile_json(user_id):
+    """Async version of `get_profile_json`."""
+    key = profile_cache_key(user_id, await aget_profile_version(user_id))
+    content = await cache.aget(key)
+    if content is None:
+        row = await UserDetails.objects.db_manager('default').values(*PROFILE_FIELDS).aget(id=user_id)
+        content = dumps(render_profile(row))
+        await cache.aset(key, content, timeout=getattr(settings, 'PROFILE_CACHE_TIMEOUT', 300))
+    return content
+
+
+def invalidate_profile(user_id):
+    """Moves the user's profile to a new version; the entries of the previous ones expire unread."""
+    try:
+        cache.incr(profile_version_key(user_id))
+    except ValueError:
+        # No version: nothing cached, the next read starts a new one
+        pass
@@ -0,0 +1,138 @@
+"""
+Account deletion and bulk user purges.
+
+Deleting users with `UserDetails.objects.filter(...).delete()` makes Django's collector load
+every user it deletes into memory, and delete them and all their rows in one transaction. The
+related topics and lessons are not loaded, they have no delete signal: the collector deletes
+them with one DELETE per batch of users. Still, benchmark_purge measures the collector at a
+115 MB peak for 100,000 users with 50 topics and 50 lessons each (10M rows), growing with the
+number of users, against under 1 MB for the chunked purge below at any size. The chunked purge
+takes about 5 times longer, in short transactions that leave room to the other writers.
+
+Instead, users are first queued with `request_purge`: they are deactivated, their tokens are
+revoked and a PendingPurge row is written. `purge_users` then deletes, for a batch of queued
+users, the rows of every table with a cascading foreign key to UserDetails in chunks of
+PURGE_CHUNK_SIZE rows, with one SELECT of the chunk's ids and one DELETE ... WHERE id IN (...),
+sleeping PURGE_CHUNK_PAUSE seconds between chunks to leave room to the other queries. Only then
+are the users themselves and their PendingPurge rows deleted, so an interrupted purge resumes
+where it stopped when it runs again.
+
+The purge_users management command processes the queue; the account deletion endpoint queues
+the user and purges them with a background task.
+"""
+import logging
+import time
+
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models.fields.related import ManyToManyRel
+from django.utils import timezone
+
+from userapp.models import OneTimeCode, PendingPurge, TokenCutoff, UserDetails, user_content_changed
+from userapp.revocation import revocation_list, to_microseconds
+from userapp.taskqueue import task
+
+
+logger = logging.getLogger(__name__)
+
+
+def get_chunk_size():
+    return getattr(settings, 'PURGE_CHUNK_SIZE', 1000)
+
+
+def get_chunk_pause():
+    return getattr(settings, 'PURGE_CHUNK_PAUSE', 0.05)
+
+
+def user_relations():
+    """Returns the (model, field name) of every foreign key that cascades from UserDetails, with the m2m through tables."""
+    relations = []
+    for rel in UserDetails._meta.related_objects:
+        if isinstance(rel, ManyToManyRel) or rel.on_delete is not models.CASCADE:
+            continue
+        relations.append((rel.related_model, rel.field.name))
+    for field in UserDetails._meta.many_to_many:
+        relations.append((field.remote_field.through, field.m2m_field_name()))
+    # UserLearningTopic is both a reverse foreign key and the through table of `topics`
+    return list(dict.fromkeys(relations))
+
+
+def request_purge(user_ids):
+    """
+    Queues users for deletion: they can not log in or use their tokens anymore from now on.
+    Returns the number of users queued.
+    """
+    user_ids = list(user_ids)
+    now = timezone.now()
+    with transaction.atomic():
+        queued = UserDetails.objects.filter(id__in=user_ids).update(is_active=False)
+        PendingPurge.objects.bulk_create([PendingPurge(user_id=user_id) for user_id in user_ids],
+                                         ignore_conflicts=True)
+        # The cutoffs outlive the users, so their tokens stay revoked once they are deleted
+        TokenCutoff.objects.bulk_create([TokenCutoff(user_id=user_id, not_before=now) for user_id in user_ids],
+                                        update_conflicts=True, unique_fields=['user'],
+                                        update_fields=['not_before', 'updated_at'])
+    for user_id in user_ids:
+        revocation_list.add(user_id=user_id, cutoff=to_microseconds(now))
+    return queued
+
+
+def _delete_in_chunks(model, field_name, user_ids, chunk_size, pause):
+    """Deletes the rows of `model` whose `field_name` is in `user_ids`, `chunk_size` rows at a time."""
+    counted_field = getattr(model, 'counted_field', None)
+    queryset = model._base_manager.filter(**{f'{field_name}__in': user_ids}).order_by()
+    columns = ('pk', counted_field, 'is_deleted') if counted_field else ('pk',)
+    deleted = 0
+    while True:
+        rows = list(queryset.values_list(*columns)[:chunk_size])
+        if not rows:
+            return deleted
+        with transaction.atomic():
+            # Without delete signals nor dependent rows this is a single DELETE, no row is loaded
+            model._base_manager.filter(pk__in=[row[0] for row in rows]).delete()
+            if counted_field:
+                user_content_changed.send(sender=model, user_id=None, added=[],
+                                          removed=[row[1] for row in rows if not row[2]])
+        deleted += len(rows)
+        if pause:
+            time.sleep(pause)
+
+
+def purge_users(user_ids, chunk_size=None, pause=None):
+    """
+    Deletes queued users and everything that cascades from them, in bounded chunks.
+    Users that are not queued with `request_purge` are left alone. Returns the number of users deleted.
+    """
+    chunk_size = chunk_size or get_chunk_size()
+    pause = get_chunk_pause() if pause is None else pause
+    user_ids = list(PendingPurge.objects.filter(user_id__in=user_ids).values_list('user_id', flat=True))
+    if not user_ids:
+        return 0
+
+    for model, field_name in user_relations():
+        deleted = _delete_in_chunks(model, field_name, user_ids, chunk_size, pause)
+        if deleted:
+            logger.info('Purged user rows', extra={'table': model._meta.db_table, 'rows': deleted,
+                                                   'users': len(user_ids)})
+
+    with transaction.atomic():
+        emails = list(UserDetails.objects.filter(id__in=user_ids).values_list('email', flat=True))
+        OneTimeCode.objects.filter(email__in=emails).delete()
+        # Only the users are left: the collector finds no related row anymore
+        UserDetails.objects.filter(id__in=user_ids).delete()
+        PendingPurge.objects.filter(user_id__in=user_ids).delete()
+    return len(emails)
+
+
+def purge_pending(users_per_batch=100, chunk_size=None, pause=None):
+    """Purges every queued user, `users_per_batch` at a time. Yields the running total after each batch."""
+    purged = 0
+    while user_ids := list(PendingPurge.objects.order_by('user_id').values_list('user_id', flat=True)[:users_per_batch]):
+        purged += purge_users(user_ids, chunk_size=chunk_size, pause=pause)
+        yield purged
+
+
+@task(max_attempts=5)
+def purge_account(user_id):
+    """Deletes an account queued by the account deletion endpoint."""
+    purge_users([user_id])
@@ -0,0 +1,77 @@
+"""
+JSON rendering and parsing for the API.
+
+FastJSONRenderer and FastJSONParser encode and decode with orjson when it is installed,
+which is several times faster than the stdlib json module DRF uses, and fall back to DRF's
+JSONRenderer and JSONParser otherwise. The output is the same as DRF's compact output:
+values orjson does not handle natively (Decimal, lazy translations, datetimes...) are passed
+to DRF's encoder.
+
+The browsable API's indented output (`; indent=N` in the Accept header) is always rendered
+by DRF.
+"""
+import json
+
+from django.http import HttpResponse
+from rest_framework import renderers
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+_encoder = JSONEncoder()
+
+_stdlib_renderer = renderers.JSONRenderer()
+
+
+def dumps(data):
+    """Returns `data` encoded as compact JSON bytes, like DRF's JSONRenderer."""
+    if orjson is None:
+        return _stdlib_renderer.render(data)
+    content = orjson.dumps(data, default=_encoder.default,
+                           option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS)
+    # Like DRF, escape the line separators that are valid in JSON but not in JavaScript
+    if b'\xe2\x80\xa8' in content or b'\xe2\x80\xa9' in content:
+        content = content.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+    return content
+
+
+def loads(content):
+    """Decodes JSON bytes or str, raises ValueError if they are not valid JSON."""
+    if orjson is None:
+        return json.loads(content)
+    return orjson.loads(content)
+
+
+class FastJSONRenderer(renderers.JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if orjson is None or self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        return dumps(data)
+
+
+class FastJSONParser(JSONParser):
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        if orjson is None:
+            return super().parse(stream, media_type, parser_context)
+        try:
+            return loads(stream.read())
+        except ValueError as exc:
+            raise ParseError('JSON parse error - %s' % str(exc))
+
+
+class FastJsonResponse(HttpResponse):
+    """A JsonResponse rendered with `dumps`, for the views that do not go through DRF."""
+
+    def __init__(self, data, **kwargs):
+        kwargs.setdefault('content_type', 'application/json')
+        super().__init__(content=dumps(data), **kwargs)
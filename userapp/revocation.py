@@ -0,0 +1,182 @@
+"""
+JWT revocation.
+
+Revocations are stored in the database: RevokedToken holds the `jti` of single tokens
+(logout) and TokenCutoff a per-user time before which every token is revoked (logout
+everywhere). Every process keeps them in memory, in `revocation_list`, so checking a
+token costs no query:
+
+- A revoked jti is kept as a 64-bit fingerprint. The bulk of them live in a sorted,
+  packed array (8 bytes per token) searched with bisect; the ones revoked since the last
+  compaction sit in a small set until they are merged in.
+- The cutoffs are a dict of user id -> time in microseconds. Tokens carry the time they were
+  issued at in microseconds (ISSUED_AT_CLAIM, set by `stamp_issued_at`), so a login right after
+  a logout everywhere, within the same second, is not revoked with the older tokens. Tokens
+  without the claim fall back to their `iat`, in seconds, and are revoked within that second.
+
+The list is loaded on first use, then synced incrementally from the database every
+REVOCATION_SYNC_INTERVAL seconds, so a revocation made by another process takes effect
+within that delay (immediately in the process that made it). Every REVOCATION_COMPACT_INTERVAL
+seconds it is rebuilt from the database, which drops the tokens that expired in the meantime.
+The purge_revoked_tokens command deletes the expired rows from the database.
+"""
+import hashlib
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.utils import timezone
+from rest_framework_simplejwt.settings import api_settings
+
+from userapp.models import RevokedToken, TokenCutoff
+
+
+# Issue time of the token in microseconds, `iat` only has seconds
+ISSUED_AT_CLAIM = 'iat_us'
+
+
+def fingerprint(jti):
+    return int.from_bytes(hashlib.blake2b(str(jti).encode(), digest_size=8).digest(), 'big')
+
+
+def _timestamp(value):
+    return datetime.fromtimestamp(value, tz=dt_timezone.utc)
+
+
+def to_microseconds(moment):
+    """Returns an aware datetime as integer microseconds since the epoch, without float rounding."""
+    return int(moment.replace(microsecond=0).timestamp()) * 1_000_000 + moment.microsecond
+
+
+def stamp_issued_at(token):
+    """Adds the issue time in microseconds to a new token; the access tokens of a refresh token inherit it."""
+    token[ISSUED_AT_CLAIM] = to_microseconds(token.current_time)
+
+
+def issued_at(token):
+    issued = token.get(ISSUED_AT_CLAIM)
+    if issued is None:
+        # Issued anywhere within its `iat` second, it goes with a cutoff in that second
+        return token.get('iat', 0) * 1_000_000
+    return issued
+
+
+class RevocationList:
+    def __init__(self):
+        self._revoked = array('Q')
+        self._recent = set()
+        self._cutoffs = {}
+        self._synced_at = None
+        self._compacted_at = 0.0
+        self._next_sync = 0.0
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+
+    @property
+    def sync_interval(self):
+        return getattr(settings, 'REVOCATION_SYNC_INTERVAL', 5)
+
+    @property
+    def compact_interval(self):
+        return getattr(settings, 'REVOCATION_COMPACT_INTERVAL', 60 * 60)
+
+    def __len__(self):
+        return len(self._revoked) + len(self._recent)
+
+    def is_revoked(self, token):
+        """Returns True if the validated `token` was revoked. Never queries the database."""
+        cutoff = self._cutoffs.get(token.get(api_settings.USER_ID_CLAIM))
+        if cutoff is not None and issued_at(token) <= cutoff:
+            return True
+
+        value = fingerprint(token.get(api_settings.JTI_CLAIM))
+        return value in self._recent or self._contains(self._revoked, value)
+
+    @staticmethod
+    def _contains(revoked, value):
+        index = bisect_left(revoked, value)
+        return index < len(revoked) and revoked[index] == value
+
+    def add(self, jti=None, user_id=None, cutoff=None):
+        """Applies a revocation right away, e.g. one made by this process."""
+        with self._write_lock:
+            if jti is not None:
+                self._recent.add(fingerprint(jti))
+            if user_id is not None:
+                self._cutoffs[user_id] = max(cutoff, self._cutoffs.get(user_id, cutoff))
+
+    def sync_due(self):
+        return time.monotonic() >= self._next_sync
+
+    def sync_if_due(self):
+        """Syncs with the database if the sync interval passed; only one thread syncs at a time."""
+        if not self.sync_due() or not self._lock.acquire(blocking=self._synced_at is None):
+            return
+        try:
+            if self.sync_due():
+                self.sync()
+        finally:
+            self._lock.release()
+
+    def sync(self):
+        now = timezone.now()
+        if self._synced_at is None or time.monotonic() - self._compacted_at >= self.compact_interval:
+            self.compact(now)
+        else:
+            # Re-read a window before the last sync: rows of transactions that committed late are not missed
+            since = self._synced_at - timedelta(seconds=getattr(settings, 'REVOCATION_SYNC_OVERLAP', 60))
+            for jti in RevokedToken.objects.filter(revoked_at__gte=since).values_list('jti', flat=True):
+                self.add(jti=jti)
+            for user_id, not_before in TokenCutoff.objects.filter(updated_at__gte=since).values_list(
+                    'user_id', 'not_before'):
+                self.add(user_id=user_id, cutoff=to_microseconds(not_before))
+        self._synced_at = now
+        self._next_sync = time.monotonic() + self.sync_interval
+
+    def compact(self, now=None):
+        """Rebuilds the list from the unexpired revocations in the database."""
+        now = now or timezone.now()
+        jtis = RevokedToken.objects.filter(expires_at__gt=now).values_list('jti', flat=True)
+        revoked = array('Q', sorted(fingerprint(jti) for jti in jtis.iterator(chunk_size=10000)))
+        # Tokens issued before now minus the refresh lifetime have expired anyway
+        oldest = now - api_settings.REFRESH_TOKEN_LIFETIME
+        cutoffs = {user_id: to_microseconds(not_before) for user_id, not_before in
+                   TokenCutoff.objects.filter(not_before__gt=oldest).values_list('user_id', 'not_before')}
+        oldest = to_microseconds(oldest)
+
+        with self._write_lock:
+            # Keep what was revoked while the rebuild ran and is not in its snapshot yet
+            recent = {value for value in self._recent if not self._contains(revoked, value)}
+            for user_id, cutoff in self._cutoffs.items():
+                if cutoff > max(oldest, cutoffs.get(user_id, 0)):
+                    cutoffs[user_id] = cutoff
+            self._revoked, self._recent, self._cutoffs = revoked, recent, cutoffs
+        self._compacted_at = time.monotonic()
+
+    def load_fingerprints(self, values):
+        """Replaces the revoked tokens with the given fingerprints, without the database (benchmarks)."""
+        self._revoked = array('Q', sorted(values))
+        self._recent = set()
+        self._synced_at = timezone.now()
+        self._next_sync = float('inf')
+
+
+revocation_list = RevocationList()
+
+
+def revoke_token(token):
+    """Revokes a single validated token (access or refresh) until it expires."""
+    jti = token[api_settings.JTI_CLAIM]
+    RevokedToken.objects.bulk_create([RevokedToken(jti=jti, expires_at=_timestamp(token['exp']))],
+                                     ignore_conflicts=True)
+    revocation_list.add(jti=jti)
+
+
+def revoke_user_tokens(user_id):
+    """Revokes every token issued to the user so far."""
+    now = timezone.now()
+    TokenCutoff.objects.update_or_create(user_id=user_id, defaults={'not_before': now})
+    revocation_list.add(user_id=user_id, cutoff=to_microseconds(now))
@@ -0,0 +1,69 @@
+"""
+User search for the admin.
+
+Searching UserDetails with `icontains` is a LIKE '%term%' scan over the whole table.
+Instead, every user has a set of search terms in the UserSearchTerm table: their email,
+first name, last name and phone number, lowercased, whole and split into words. A search
+matches the users having, for every word of the query, a term that starts with that word,
+which is a range scan of the (term, user) index.
+
+The terms are kept up to date when a user is saved (see signals.py). Users written with
+bulk_create must be indexed with `index_users`; the rebuild_user_search command
+re-indexes everyone.
+"""
+import re
+
+from django.db import connection, transaction
+
+from userapp.models import UserDetails, UserSearchTerm
+
+
+SEARCH_FIELDS = ('email', 'first_name', 'last_name', 'phone_number')
+
+MAX_TERM_LENGTH = UserSearchTerm._meta.get_field('term').max_length
+
+_WORD_SEPARATORS = re.compile(r'[\W_]+')
+
+
+def search_terms(user):
+    """Returns the set of search terms of a user."""
+    terms = set()
+    for field in SEARCH_FIELDS:
+        value = getattr(user, field)
+        if value in (None, ''):
+            continue
+        value = str(value).lower()
+        terms.add(value[:MAX_TERM_LENGTH])
+        terms.update(word[:MAX_TERM_LENGTH] for word in _WORD_SEPARATORS.split(value) if word)
+    return terms
+
+
+def index_users(users, replace=True):
+    """
+    Replaces the search terms of `users` (saved UserDetails instances) with a DELETE and one bulk INSERT.
+    Pass replace=False for users that were just created and have no terms yet.
+    """
+    users = list(users)
+    with transaction.atomic():
+        if replace:
+            UserSearchTerm.objects.filter(user_id__in=[user.id for user in users]).delete()
+        UserSearchTerm.objects.bulk_create(
+            [UserSearchTerm(user_id=user.id, term=term) for user in users for term in search_terms(user)],
+            batch_size=1000)
+
+
+def _prefix(word):
+    if connection.vendor == 'postgresql':
+        # LIKE 'word%' uses the varchar_pattern_ops index whatever the database collation
+        return {'term__startswith': word}
+    # SQLite's LIKE is case insensitive and can not use the index, a range on the binary ordering can
+    return {'term__gte': word, 'term__lt': word + '\U0010ffff'}
+
+
+def filter_users(queryset, query):
+    """Narrows a UserDetails queryset to the users matching every word of `query`."""
+    for word in _WORD_SEPARATORS.split(query.lower()):
+        if word:
+            matching = UserSearchTerm.objects.filter(**_prefix(word[:MAX_TERM_LENGTH])).values('user_id')
+            queryset = queryset.filter(id__in=matching)
+    return queryset
@@ -1,7 +1,10 @@
 from rest_framework import serializers
-from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
 
+from userapp.images import profile_image_url, profile_image_variant_urls
 from userapp.models import (UserDetails, UserLearningTopic, UserCreatedLessons)
+from userapp.revocation import revocation_list, stamp_issued_at
 
 
 class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
@@ -13,24 +16,144 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
 
         if user.email:
             token['email'] = user.email
+        # Lets the stateless authentication answer IsAdminUser checks from the token
+        token['is_staff'] = user.is_staff
+        stamp_issued_at(token)
         return token
 
 
+class RevocationCheckingTokenRefreshSerializer(TokenRefreshSerializer):
+    """Refuses to refresh a revoked refresh token (see userapp.revocation)."""
+
+    def validate(self, attrs):
+        revocation_list.sync_if_due()
+        if revocation_list.is_revoked(self.token_class(attrs['refresh'])):
+            raise InvalidToken('Token has been revoked')
+        return super().validate(attrs)
+
+
 class UserDetailsSerializer(serializers.ModelSerializer):
     class Meta:
         model = UserDetails
         fields = '__all__'
+        read_only_fields = ['content_version', 'sync_floor']
         # exclude = ['password']
 
     def create(self, validated_data):
         return UserDetails.objects.create_user(**validated_data)
     
 
+class UserProfileUpdateSerializer(serializers.ModelSerializer):
+    """
+    Validates a profile update. Only the fields users may change about themselves are writable:
+    never the password, the permission flags or the email used to log in.
+    """
+
+    class Meta:
+        model = UserDetails
+        fields = ['first_name', 'last_name', 'phone_number', 'gender']
+
+
+class UserRegistrationSerializer(serializers.ModelSerializer):
+    """
+    Validates the registration fields.
+
+    The unique validators of email and phone_number are disabled: each of them would cost a
+    query and still race with concurrent signups. The database constraints enforce uniqueness
+    instead, see `registration_conflict_message`.
+    """
+
+    class Meta:
+        model = UserDetails
+        fields = ['email', 'password', 'first_name', 'last_name', 'phone_number']
+        extra_kwargs = {
+            'email': {'validators': []},
+            'phone_number': {'validators': []},
+            'password': {'write_only': True},
+        }
+
+    def create(self, validated_data):
+        return UserDetails.objects.create_user(**validated_data)
+
+
+def registration_conflict_message(error):
+    """
+    Maps the IntegrityError raised by a registration INSERT to the message shown to the user,
+    or returns None if it is not a uniqueness conflict on email or phone number.
+    """
+    # SQLite: 'UNIQUE constraint failed: userapp_userdetails.email'
+    # PostgreSQL: 'duplicate key value violates unique constraint "userapp_userdetails_email_key"'
+    message = str(error)
+    if 'email' in message:
+        return "An account already exists with this email id"
+    if 'phone_number' in message:
+        return "An account already exists with this phone number"
+    return None
+
+
+# The only UserDetails columns a profile read needs; use with .only() or .values()
+PROFILE_FIELDS = ('id', 'email', 'first_name', 'last_name', 'phone_number', 'profile_image', 'gender', 'date_joined')
+
+_date_joined_field = serializers.DateTimeField()
+
+
+def render_profile(row, request=None):
+    """
+    Builds the profile representation from a `.values(*PROFILE_FIELDS)` row.
+
+    Produces the same output as the DRF fields would, without instantiating them per call,
+    except for `profile_image`, the URL of the default resized variant rather than of the
+    uploaded file, plus the URLs of all the variants (see userapp.images).
+    """
+    image = row['profile_image']
+    image = getattr(image, 'name', image)
+    image_url = profile_image_url(image)
+    image_variants = profile_image_variant_urls(image)
+    if image and request is not None:
+        image_url = request.build_absolute_uri(image_url)
+        image_variants = {size: {extension: request.build_absolute_uri(url) for extension, url in urls.items()}
+                          for size, urls in image_variants.items()}
+    return {
+        'id': row['id'],
+        'email': row['email'],
+        'first_name': row['first_name'],
+        'last_name': row['last_name'],
+        'phone_number': row['phone_number'],
+        'profile_image': image_url,
+        'profile_image_variants': image_variants,
+        'gender': row['gender'],
+        'date_joined': _date_joined_field.to_representation(row['date_joined']),
+    }
+
+
+class UserProfileSerializer(serializers.ModelSerializer):
+    """
+    Read-only serializer of the public profile fields.
+
+    Unlike UserDetailsSerializer it never exposes the password hash, groups or
+    user_permissions, so it needs no extra queries, and `to_representation` skips
+    DRF's per-field machinery (see `render_profile`).
+    """
+
+    class Meta:
+        model = UserDetails
+        fields = PROFILE_FIELDS
+        read_only_fields = PROFILE_FIELDS
+
+    def to_representation(self, instance):
+        row = {field: getattr(instance, field) for field in PROFILE_FIELDS}
+        return render_profile(row, self.context.get('request'))
+
+
 class UserLearningTopicSerializer(serializers.ModelSerializer):
     # user = UserDetailsSerializer()
+    # Expects a queryset with select_related('topic')
+    topic = serializers.CharField(source='topic.name')
+    slug = serializers.CharField(source='topic.slug')
+
     class Meta:
         model = UserLearningTopic
-        fields = ['topic']
+        fields = ['id', 'topic', 'slug']
 
 
 # class UserTopicsSerializer(serializers.ModelSerializer):
@@ -42,4 +165,4 @@ class UserLearningTopicSerializer(serializers.ModelSerializer):
 class UserCreatedLessonsSerializer(serializers.ModelSerializer):
     class Meta:
         model = UserCreatedLessons
-        fields = ['lesson_name']
\ No newline at end of file
+        fields = ['id', 'lesson_name']
\ No newline at end of file
@@ -0,0 +1,54 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .analytics import record_changes
+from .models import UserCreatedLessons, UserDetails, UserLearningTopic, user_content_changed
+from .search import SEARCH_FIELDS, index_users
+
+
+def invalidate_user(user_id):
+    # Imported here: this module is loaded at startup, they pull in simplejwt and DRF's serializers
+    from .authentication import user_details_cache
+    from .profile_cache import invalidate_profile
+
+    user_details_cache.invalidate(user_id)
+    invalidate_profile(user_id)
+
+
+@receiver(post_save, sender=UserDetails)
+@receiver(post_delete, sender=UserDetails)
+def invalidate_cached_user_details(sender, instance, **kwargs):
+    """Drop the cached row and profile whenever a profile is saved or deleted."""
+    invalidate_user(instance.id)
+    # Once more after commit, so a concurrent read can not cache the pre-commit row
+    transaction.on_commit(partial(invalidate_user, instance.id))
+
+
+@receiver(post_save, sender=UserDetails)
+def update_search_terms(sender, instance, created, update_fields=None, raw=False, **kwargs):
+    """Re-index the user for the admin search when a searchable field may have changed."""
+    if raw or (update_fields is not None and not set(update_fields) & set(SEARCH_FIELDS)):
+        return
+    index_users([instance], replace=not created)
+
+
+@receiver(post_save, sender=UserLearningTopic)
+@receiver(post_save, sender=UserCreatedLessons)
+def count_saved_content(sender, instance, created, update_fields=None, raw=False, **kwargs):
+    """Count the topics and lessons created, or soft-deleted by `delete()`, one at a time."""
+    if raw:
+        return
+    value = getattr(instance, sender.counted_field)
+    if created:
+        record_changes(sender, added=[value])
+    elif update_fields and 'is_deleted' in update_fields and instance.is_deleted:
+        record_changes(sender, removed=[value])
+
+
+@receiver(user_content_changed)
+def count_changed_content(sender, added=(), removed=(), **kwargs):
+    """Count the topics and lessons written in bulk."""
+    record_changes(sender, added=added, removed=removed)
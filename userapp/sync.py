@@ -0,0 +1,53 @@
+from django.conf import settings
+
+from userapp.models import UserCreatedLessons, UserDetails, UserLearningTopic
+from userapp.serializers import UserCreatedLessonsSerializer, UserLearningTopicSerializer
+
+
+def get_max_changes():
+    return getattr(settings, 'SYNC_MAX_CHANGES', 1000)
+
+
+def _changes(queryset, serializer_class, since, version):
+    """Returns (upserts, deleted ids) of the rows changed after `since` and up to `version`, or None if there are too many."""
+    rows = list(queryset.filter(change_seq__gt=since, change_seq__lte=version)
+                .order_by('change_seq', 'id')[:get_max_changes() + 1])
+    if len(rows) > get_max_changes():
+        return None
+    upserts = serializer_class([row for row in rows if not row.is_deleted], many=True).data
+    return upserts, [row.id for row in rows if row.is_deleted]
+
+
+def get_changes(user_id, since):
+    """
+    Returns the changes to the user's topics and custom lessons since the sync token `since`.
+
+    The token is the user's `content_version`: every change stamps the rows it writes with
+    the new version as their `change_seq`, and deletes leave a tombstone behind. The result has
+    the new `token` and, per listing, the created or updated rows and the ids of the deleted ones.
+
+    Returns {'reset': True, 'token': ...} instead when the changes can not be computed, because
+    the tombstones after `since` were purged, the token is unknown or there are more than
+    SYNC_MAX_CHANGES changes. The client then refetches the full listings and continues from `token`.
+    Raises UserDetails.DoesNotExist if the user is gone.
+    """
+    sync_floor, version = UserDetails.objects.filter(id=user_id).values_list('sync_floor', 'content_version').get()
+    if since < sync_floor or since > version:
+        return {'reset': True, 'token': version}
+
+    changes = {'reset': False, 'token': version}
+    listings = (
+        ('topics', UserLearningTopic.all_objects.filter(user_id=user_id).select_related('topic'),
+         UserLearningTopicSerializer),
+        ('lessons', UserCreatedLessons.all_objects.filter(user_id=user_id), UserCreatedLessonsSerializer),
+    )
+    for name, queryset, serializer_class in listings:
+        if since == version:
+            changes[name] = {'upserts': [], 'deleted': []}
+            continue
+        listing_changes = _changes(queryset, serializer_class, since, version)
+        if listing_changes is None:
+            return {'reset': True, 'token': version}
+        upserts, deleted = listing_changes
+        changes[name] = {'upserts': upserts, 'deleted': deleted}
+    return changes
@@ -0,0 +1,137 @@
+"""
+Background task queue.
+
+Slow side effects (image processing, emails) are declared with the @task decorator and
+enqueued with `.delay(...)`, which inserts a QueuedTask row in the current transaction:
+the task is only visible to the workers once the request's changes commit, and it is
+dropped with them if the transaction rolls back. The arguments must be JSON serializable.
+
+The `run_task_worker` management command claims due tasks and runs them in a thread or
+process pool. A failing task is retried with exponential backoff up to its `max_attempts`,
+then kept as 'failed' with its last error. A task whose worker died is picked up again once
+its lease (TASK_QUEUE_LEASE seconds) expires, so tasks must be safe to run twice. The worker
+renews the leases of its running tasks every third of TASK_QUEUE_LEASE: a task may run for
+longer than the lease, it is only taken over once its worker stopped renewing it.
+
+With TASK_QUEUE_EAGER = True, `.delay()` runs the task in the calling thread once the
+transaction commits, without touching the queue table; tests and local setups without a
+worker use that.
+"""
+import logging
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, connections, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from userapp.models import QueuedTask
+
+
+logger = logging.getLogger(__name__)
+
+MAX_BACKOFF = 60 * 60
+
+
+class Task:
+    def __init__(self, func, max_attempts, retry_backoff):
+        self.func = func
+        self.name = f'{func.__module__}.{func.__qualname__}'
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        self.__doc__ = func.__doc__
+
+    def __call__(self, *args, **kwargs):
+        return self.func(*args, **kwargs)
+
+    def delay(self, *args, **kwargs):
+        """Runs the task in the background once the current transaction commits."""
+        if getattr(settings, 'TASK_QUEUE_EAGER', False):
+            transaction.on_commit(lambda: self.func(*args, **kwargs))
+            return None
+        return QueuedTask.objects.create(name=self.name, args=list(args), kwargs=kwargs,
+                                         max_attempts=self.max_attempts)
+
+    def retry_delay(self, attempts):
+        """Seconds to wait before the next attempt, after `attempts` failed ones."""
+        return min(self.retry_backoff * 2 ** (attempts - 1), MAX_BACKOFF)
+
+
+def task(func=None, *, max_attempts=3, retry_backoff=30):
+    """
+    Turns a module level function into a Task. Calling the task still runs the function
+    directly; `task.delay(*args, **kwargs)` queues it.
+    """
+    if func is None:
+        return lambda func: Task(func, max_attempts, retry_backoff)
+    return Task(func, max_attempts, retry_backoff)
+
+
+def run_task(name, args, kwargs):
+    """Runs a queued task in a worker thread or process."""
+    try:
+        import_string(name).func(*args, **kwargs)
+    finally:
+        # Worker threads open their own connections, do not leave them behind
+        connections.close_all()
+
+
+def get_lease():
+    return timedelta(seconds=getattr(settings, 'TASK_QUEUE_LEASE', 300))
+
+
+def renew_leases(task_ids):
+    """Extends the leases of this worker's running tasks, so no other worker takes them over."""
+    return (QueuedTask.objects.filter(id__in=task_ids, status=QueuedTask.RUNNING)
+            .update(locked_until=timezone.now() + get_lease()))
+
+
+def requeue_expired():
+    """Makes the tasks whose worker stopped before finishing them runnable again."""
+    return (QueuedTask.objects.filter(status=QueuedTask.RUNNING, locked_until__lt=timezone.now())
+            .update(status=QueuedTask.PENDING, locked_until=None))
+
+
+def claim_tasks(limit):
+    """Marks up to `limit` due tasks as running for this worker and returns them."""
+    now = timezone.now()
+    lease = get_lease()
+    due = QueuedTask.objects.filter(status=QueuedTask.PENDING, run_at__lte=now).order_by('run_at', 'id')
+    claim = {'status': QueuedTask.RUNNING, 'locked_until': now + lease, 'attempts': F('attempts') + 1}
+
+    with transaction.atomic():
+        if connection.features.has_select_for_update_skip_locked:
+            claimed = list(due.select_for_update(skip_locked=True).values_list('id', flat=True)[:limit])
+            QueuedTask.objects.filter(id__in=claimed).update(**claim)
+        else:
+            # No row locks (SQLite): claim one by one, a row another worker took is not pending anymore
+            claimed = [task_id for task_id in due.values_list('id', flat=True)[:limit]
+                       if QueuedTask.objects.filter(id=task_id, status=QueuedTask.PENDING).update(**claim)]
+    return list(QueuedTask.objects.filter(id__in=claimed).order_by('run_at', 'id'))
+
+
+def finish_task(queued_task, error=None):
+    """Deletes a task that succeeded, or schedules the retry of a task that failed with `error`."""
+    if error is None:
+        queued_task.delete()
+        return
+
+    message = ''.join(traceback.format_exception(error))
+    if queued_task.attempts >= queued_task.max_attempts:
+        logger.error('Task failed', extra={'task': queued_task.name, 'task_id': queued_task.id,
+                                           'attempts': queued_task.attempts})
+        QueuedTask.objects.filter(id=queued_task.id).update(status=QueuedTask.FAILED, locked_until=None,
+                                                            last_error=message)
+        return
+
+    try:
+        retry_delay = import_string(queued_task.name).retry_delay(queued_task.attempts)
+    except ImportError:
+        retry_delay = MAX_BACKOFF
+    logger.warning('Task failed, retrying', extra={'task': queued_task.name, 'task_id': queued_task.id,
+                                                   'attempts': queued_task.attempts, 'retry_in': retry_delay})
+    QueuedTask.objects.filter(id=queued_task.id).update(
+        status=QueuedTask.PENDING, locked_until=None, last_error=message,
+        run_at=timezone.now() + timedelta(seconds=retry_delay))
@@ -0,0 +1,48 @@
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from userapp.authentication import user_details_cache
+from userapp.models import UserDetails
+from userapp.revocation import revocation_list
+from userapp.serializers import CustomTokenObtainPairSerializer
+from userapp.throttling import LocalBucketStore, _stores
+
+
+PASSWORD = 'Secretpw123!'
+
+
+def reset_process_state():
+    """Empties the in-process and cache state that outlives a test's rolled back transaction."""
+    for cache in caches.all():
+        cache.clear()
+    user_details_cache.clear()
+    for store in _stores.values():
+        if isinstance(store, LocalBucketStore):
+            store.clear()
+    # The database is rolled back between tests and user ids are reused: forget the revocations,
+    # and do not sync them from the database during the test (no query counted by assertNumQueries)
+    revocation_list.load_fingerprints([])
+    revocation_list._cutoffs = {}
+
+
+# Fast password hashing, the tests are not about its cost
+@override_settings(PASSWORD_PBKDF2_ITERATIONS=1000)
+class UserAPITestCase(TestCase):
+    """A TestCase with an API client authenticated as `self.user`, a regular user."""
+
+    def setUp(self):
+        reset_process_state()
+        self.user = self.create_user('learner@example.com')
+        self.client = self.client_for(self.user)
+
+    @staticmethod
+    def create_user(email, **extra_fields):
+        return UserDetails.objects.create_user(email=email, password=PASSWORD, **extra_fields)
+
+    @staticmethod
+    def client_for(user):
+        client = APIClient()
+        token = CustomTokenObtainPairSerializer.get_token(user).access_token
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        return client
@@ -0,0 +1,38 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from userapp.models import Topic, UserCreatedLessons, UserDetails, UserLearningTopic
+from userapp.tests.base import PASSWORD, UserAPITestCase
+
+
+class ContentAdminTests(UserAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        admin_user = UserDetails.objects.create_superuser(email='admin@example.com', password=PASSWORD)
+        self.client.force_login(admin_user)
+        self.lesson = UserCreatedLessons.objects.create(user=self.user, lesson_name='Algebra')
+        self.learning_topic = UserLearningTopic.objects.create(
+            user=self.user, topic=Topic.objects.create(name='Physics', slug='physics'))
+
+    def selects_from(self, table, make_request):
+        with CaptureQueriesContext(connection) as context:
+            response = make_request()
+        self.assertEqual(response.status_code, 200)
+        return [query['sql'] for query in context.captured_queries
+                if query['sql'].startswith('SELECT') and f'FROM "{table}"' in query['sql']]
+
+    def test_changelist_only_loads_the_listed_columns(self):
+        for model in (UserCreatedLessons, UserLearningTopic):
+            url = reverse(f'admin:userapp_{model._meta.model_name}_changelist')
+            selects = self.selects_from(model._meta.db_table, lambda: self.client.get(url))
+            self.assertTrue(any('"change_seq"' not in sql and 'LIMIT' in sql for sql in selects), selects)
+
+    def test_change_form_loads_the_row_once(self):
+        for obj in (self.lesson, self.learning_topic):
+            url = reverse(f'admin:userapp_{obj._meta.model_name}_change', args=[obj.pk])
+            selects = self.selects_from(obj._meta.db_table, lambda: self.client.get(url))
+            # One query for the whole row, no deferred column loaded on its own
+            self.assertEqual(len(selects), 1, selects)
+            self.assertIn('"change_seq"', selects[0])
@@ -0,0 +1,42 @@
+import uuid
+
+from userapp.analytics import apply_counter_deltas, counter_buffer
+from userapp.models import AppliedCounterBatch, LessonNameStat, QueuedTask, Topic
+from userapp.tests.base import UserAPITestCase
+
+
+class CounterDeltaTests(UserAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        counter_buffer.take()
+        self.topic = Topic.objects.create(name='Physics', slug='physics')
+
+    def test_a_batch_run_twice_is_applied_once(self):
+        batch = {'batch_id': str(uuid.uuid4()), 'topics': [[self.topic.id, 2]], 'lesson_names': [['algebra', 3]]}
+        apply_counter_deltas(**batch)
+        apply_counter_deltas(**batch)
+        self.topic.refresh_from_db()
+        self.assertEqual(self.topic.learner_count, 2)
+        self.assertEqual(LessonNameStat.objects.get(name='algebra').lesson_count, 3)
+
+    def test_flush_queues_the_deltas_with_a_batch_id(self):
+        counter_buffer.add('topics', {self.topic.id: 1})
+        with self.settings(TASK_QUEUE_EAGER=False):
+            counter_buffer.flush()
+        queued = QueuedTask.objects.get(name='userapp.analytics.apply_counter_deltas')
+        self.assertEqual(queued.kwargs['topics'], [[self.topic.id, 1]])
+
+        apply_counter_deltas(*queued.args, **queued.kwargs)
+        apply_counter_deltas(*queued.args, **queued.kwargs)
+        self.topic.refresh_from_db()
+        self.assertEqual(self.topic.learner_count, 1)
+        self.assertTrue(AppliedCounterBatch.objects.filter(batch_id=queued.kwargs['batch_id']).exists())
+
+    def test_flush_applies_the_deltas_without_a_worker(self):
+        counter_buffer.add('topics', {self.topic.id: 1})
+        with self.settings(TASK_QUEUE_EAGER=True):
+            counter_buffer.flush()
+        self.topic.refresh_from_db()
+        self.assertEqual(self.topic.learner_count, 1)
+        self.assertFalse(QueuedTask.objects.exists())
@@ -0,0 +1,76 @@
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from django.core.handlers.asgi import ASGIHandler
+from django.test import override_settings
+from django.urls import path
+from rest_framework_simplejwt.tokens import AccessToken
+
+from iveye_backend.metrics import DB_QUERIES
+from userapp import hashers
+from userapp.async_views import AsyncCustomTokenObtainPairView, AsyncGetUserSpecificTopics, AsyncUserProfileView
+from userapp.serializers import CustomTokenObtainPairSerializer
+from userapp.tests.base import PASSWORD, UserAPITestCase
+
+
+class AsyncRoutes:
+    urlpatterns = [
+        path('profile', AsyncUserProfileView.as_view()),
+        path('topics', AsyncGetUserSpecificTopics.as_view()),
+        path('login', AsyncCustomTokenObtainPairView.as_view()),
+    ]
+
+
+@override_settings(ROOT_URLCONF=AsyncRoutes)
+class AsyncViewTests(UserAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        token = CustomTokenObtainPairSerializer.get_token(self.user).access_token
+        self.headers = {'authorization': f'Bearer {token}'}
+
+    @override_settings(DEBUG=True)
+    def test_the_middlewares_do_not_adapt_the_async_handler(self):
+        # With DEBUG, Django logs every middleware it has to run through sync_to_async
+        with self.assertNoLogs('django.request', 'DEBUG'):
+            ASGIHandler()
+
+    async def test_the_queries_of_async_views_are_recorded(self):
+        response = await self.async_client.get('/topics', headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        labels = (('method', 'GET'), ('route', 'topics'), ('status', '200'))
+        _, count, queries = DB_QUERIES._series[labels]
+        self.assertGreater(queries / count, 0)
+
+    @override_settings(THROTTLE_RATES={'default': {'user': '2/m'}})
+    async def test_async_views_are_throttled(self):
+        statuses = [(await self.async_client.get('/profile', headers=self.headers)).status_code for _ in range(2)]
+        self.assertEqual(statuses, [200, 200])
+        response = await self.async_client.get('/profile', headers=self.headers)
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '30')
+
+
+@override_settings(ROOT_URLCONF=AsyncRoutes, THROTTLE_RATES={})
+class AsyncLoginTests(UserAPITestCase):
+
+    async def login(self, password, email=None):
+        data = {'email': email or self.user.email, 'password': password}
+        return await self.async_client.post('/login', data, content_type='application/json')
+
+    async def test_the_login_returns_tokens(self):
+        response = await self.login(PASSWORD)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(AccessToken(response.json()['access'])['email'], self.user.email)
+
+    async def test_wrong_credentials_are_rejected(self):
+        for response in (await self.login('wrong'), await self.login(PASSWORD, email='nobody@example.com')):
+            self.assertEqual(response.status_code, 401)
+            self.assertEqual(response.json()['detail'], 'No active account found with the given credentials')
+
+    async def test_the_hash_is_awaited_from_the_pool(self):
+        with ThreadPoolExecutor(max_workers=1) as pool, mock.patch.object(hashers, '_get_pool', return_value=pool), \
+                mock.patch.object(pool, 'submit', wraps=pool.submit) as submit:
+            response = await self.login(PASSWORD)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(submit.called)
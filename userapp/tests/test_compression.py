@@ -0,0 +1,90 @@
+import asyncio
+import gzip
+import json
+
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from django.urls import reverse
+
+from iveye_backend.compression import CompressionMiddleware, accepted_encodings, choose_encoding
+from userapp.models import UserCreatedLessons
+from userapp.tests.base import UserAPITestCase
+
+
+BODY = json.dumps([{'lesson_name': f'Lesson {index}'} for index in range(200)]).encode()
+
+
+@override_settings(COMPRESSION_MIN_SIZE=1024, COMPRESSION_MAX_RANDOM_BYTES=100)
+class CompressionMiddlewareTests(SimpleTestCase):
+
+    def compress(self, response, accept_encoding='gzip, deflate'):
+        request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING=accept_encoding)
+        return CompressionMiddleware(lambda request: response)(request)
+
+    def test_accept_encoding_is_negotiated(self):
+        self.assertEqual(accepted_encodings('gzip;q=0.5, br;q=0, identity'), {'gzip', 'identity'})
+        self.assertEqual(choose_encoding('deflate, gzip')[0], 'gzip')
+        self.assertEqual(choose_encoding('*')[0], 'gzip')
+        self.assertIsNone(choose_encoding('gzip;q=0, identity'))
+        self.assertIsNone(choose_encoding(''))
+
+    def test_large_json_is_compressed(self):
+        response = self.compress(HttpResponse(BODY, content_type='application/json', headers={'ETag': '"v1"'}))
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertEqual(response['ETag'], 'W/"v1"')
+        self.assertEqual(int(response['Content-Length']), len(response.content))
+        self.assertLess(len(response.content), len(BODY))
+        self.assertEqual(gzip.decompress(response.content), BODY)
+
+    def test_small_and_binary_responses_are_sent_as_they_are(self):
+        for response in (HttpResponse(b'{}', content_type='application/json'),
+                         HttpResponse(BODY, content_type='image/png')):
+            response = self.compress(response)
+            self.assertFalse(response.has_header('Content-Encoding'))
+            self.assertFalse(response.has_header('Vary'))
+
+    def test_the_response_varies_even_when_not_compressed(self):
+        response = self.compress(HttpResponse(BODY, content_type='application/json'), accept_encoding='identity')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertEqual(response.content, BODY)
+
+    def test_streams_are_compressed(self):
+        chunks = [BODY[index:index + 500] for index in range(0, len(BODY), 500)]
+        response = self.compress(StreamingHttpResponse(iter(chunks), content_type='application/x-ndjson'))
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(b''.join(response.streaming_content)), BODY)
+
+    def test_async_streams_are_compressed(self):
+        async def chunks():
+            yield BODY[:1000]
+            yield BODY[1000:]
+
+        async def consume(response):
+            return b''.join([chunk async for chunk in response.streaming_content])
+
+        response = self.compress(StreamingHttpResponse(chunks(), content_type='application/x-ndjson'))
+        self.assertEqual(gzip.decompress(asyncio.run(consume(response))), BODY)
+
+    def test_the_length_is_padded_at_random(self):
+        lengths = {len(self.compress(HttpResponse(BODY, content_type='application/json')).content)
+                   for _ in range(20)}
+        self.assertGreater(len(lengths), 1)
+
+    @override_settings(COMPRESSION_MAX_RANDOM_BYTES=0)
+    def test_the_padding_can_be_disabled(self):
+        lengths = {len(self.compress(HttpResponse(BODY, content_type='application/json')).content)
+                   for _ in range(5)}
+        self.assertEqual(len(lengths), 1)
+
+
+class CompressedAPITests(UserAPITestCase):
+
+    def test_api_responses_are_compressed(self):
+        UserCreatedLessons.objects.bulk_create([UserCreatedLessons(user=self.user, lesson_name=f'Lesson {index}')
+                                                for index in range(50)])
+        response = self.client.get(reverse('get_custom_lessons_of_user'), HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(len(json.loads(gzip.decompress(response.content))['results']), 50)
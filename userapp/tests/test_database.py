@@ -0,0 +1,94 @@
+import os
+import tempfile
+import time
+
+from django.db import connections
+from django.test import TestCase
+from django.urls import reverse
+
+from iveye_backend.database import ReplicaReads, ReplicaRouter, _replica_reads
+from userapp.models import UserCreatedLessons, UserDetails
+from userapp.tests.base import UserAPITestCase
+
+
+class ReplicaRoutingTests(UserAPITestCase):
+    """
+    Runs with a second SQLite database as the 'replica' alias, never written to by replication:
+    rows only found in it show a read was served by the replica.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.TemporaryDirectory()
+        connections.settings['replica'] = {
+            **connections['default'].settings_dict,
+            'NAME': os.path.join(cls.directory.name, 'replica.sqlite3'),
+        }
+        # The router only migrates 'default', the replica gets the tables the lesson listing reads
+        with connections['replica'].schema_editor() as editor:
+            editor.create_model(UserDetails)
+            editor.create_model(UserCreatedLessons)
+        # Only declared now: the test runner checks the databases of the tests before the alias exists
+        cls.databases = {'default', 'replica'}
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections['replica'].close()
+        del connections['replica']
+        del connections.settings['replica']
+        cls.directory.cleanup()
+
+    def setUp(self):
+        super().setUp()
+        replica_user = UserDetails(id=self.user.id, email=self.user.email,
+                                   content_version=self.user.content_version)
+        UserDetails.objects.using('replica').bulk_create([replica_user])
+        UserCreatedLessons.objects.using('replica').bulk_create(
+            [UserCreatedLessons(user=replica_user, lesson_name='From the replica')])
+
+    def lesson_names(self, client):
+        response = client.get(reverse('get_custom_lessons_of_user'))
+        self.assertEqual(response.status_code, 200)
+        return [lesson['lesson_name'] for lesson in response.data['results']]
+
+    def test_get_reads_from_the_replica(self):
+        self.assertEqual(self.lesson_names(self.client), ['From the replica'])
+
+    def test_writes_go_to_default(self):
+        response = self.client.post(reverse('user_add_custom_lesson'), {'lesson_name': 'Algebra'}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(UserCreatedLessons.objects.using('default').filter(lesson_name='Algebra').exists())
+        self.assertFalse(UserCreatedLessons.objects.using('replica').filter(lesson_name='Algebra').exists())
+
+    def test_reads_after_a_write_are_pinned_to_default(self):
+        self.client.post(reverse('user_add_custom_lesson'), {'lesson_name': 'Algebra'}, format='json')
+        self.assertEqual(self.lesson_names(self.client), ['Algebra'])
+
+        # Another session of the user, with its own token, still reads from the replica
+        self.assertEqual(self.lesson_names(self.client_for(self.user)), ['From the replica'])
+
+    def test_pin_expires(self):
+        with self.settings(REPLICA_PIN_SECONDS=0.01):
+            self.client.post(reverse('user_add_custom_lesson'), {'lesson_name': 'Algebra'}, format='json')
+        time.sleep(0.02)
+        self.assertEqual(self.lesson_names(self.client), ['From the replica'])
+
+
+class ReplicaRouterTests(TestCase):
+
+    def test_reads_go_to_default_outside_of_replica_requests(self):
+        self.assertEqual(ReplicaRouter().db_for_read(UserDetails), 'default')
+
+    def test_a_write_pins_the_next_reads_of_the_request(self):
+        router = ReplicaRouter()
+        token = _replica_reads.set(ReplicaReads())
+        try:
+            connections.settings['replica'] = connections['default'].settings_dict
+            self.assertEqual(router.db_for_read(UserDetails), 'replica')
+            self.assertEqual(router.db_for_write(UserDetails), 'default')
+            self.assertEqual(router.db_for_read(UserDetails), 'default')
+        finally:
+            del connections.settings['replica']
+            _replica_reads.reset(token)
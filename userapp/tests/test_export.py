@@ -0,0 +1,62 @@
+import io
+import json
+import zipfile
+
+from django.urls import reverse
+
+from userapp.models import Topic, UserCreatedLessons, UserLearningTopic
+from userapp.tests.base import UserAPITestCase
+
+
+class DataExportTests(UserAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.other = self.create_user('other@example.com')
+        topic = Topic.objects.create(name='Physics', slug='physics')
+        for user in (self.user, self.other):
+            UserLearningTopic.objects.create(user=user, topic=topic)
+            UserCreatedLessons.objects.create(user=user, lesson_name=f'Notes of {user.email}')
+
+    def export(self, client, url_name, file_format):
+        response = client.get(reverse(url_name), {'file_format': file_format})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content)
+
+    @staticmethod
+    def records(content):
+        return [json.loads(line) for line in content.decode().splitlines()]
+
+    def test_user_export_streams_only_the_user_data(self):
+        response, content = self.export(self.client, 'user_data_export', 'ndjson')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="my-data.ndjson"')
+        records = self.records(content)
+        self.assertEqual([record['type'] for record in records], ['user', 'topic', 'lesson'])
+        self.assertEqual(records[0]['email'], self.user.email)
+        self.assertEqual(records[1]['topic_slug'], 'physics')
+        self.assertEqual(records[2]['lesson_name'], f'Notes of {self.user.email}')
+        self.assertNotIn('password', records[0])
+
+    def test_zip_export_holds_one_ndjson_file_per_record_type(self):
+        response, content = self.export(self.client, 'user_data_export', 'zip')
+        self.assertEqual(response['Content-Type'], 'application/zip')
+        with zipfile.ZipFile(io.BytesIO(content)) as archive:
+            self.assertIsNone(archive.testzip())
+            self.assertEqual(archive.namelist(), ['users.ndjson', 'topics.ndjson', 'lessons.ndjson'])
+            lessons = self.records(archive.read('lessons.ndjson'))
+        self.assertEqual([lesson['lesson_name'] for lesson in lessons], [f'Notes of {self.user.email}'])
+
+    def test_unknown_format_is_rejected(self):
+        response = self.client.get(reverse('user_data_export'), {'file_format': 'csv'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_all_users_export_is_for_admins_only(self):
+        self.assertEqual(self.client.get(reverse('all_users_data_export')).status_code, 403)
+        self.assertEqual(self.client_class().get(reverse('all_users_data_export')).status_code, 401)
+
+        admin = self.client_for(self.create_user('admin@example.com', is_staff=True))
+        _, content = self.export(admin, 'all_users_data_export', 'ndjson')
+        users = [record['email'] for record in self.records(content) if record['type'] == 'user']
+        self.assertEqual(users, [self.user.email, self.other.email, 'admin@example.com'])
@@ -0,0 +1,110 @@
+import io
+
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import SimpleTestCase, override_settings
+from PIL import Image
+
+from userapp.images import (process_profile_image, profile_image_url, staged_name, store_profile_image,
+                            variant_name)
+from userapp.serializers import render_profile
+from userapp.tests.base import UserAPITestCase
+
+
+GPS_IFD = 0x8825
+
+
+def photo(name='photo.jpg', size=(3000, 2000), image_format='JPEG'):
+    image = Image.new('RGB', size, 'orange')
+    exif = Image.Exif()
+    exif[0x010F] = 'Camera maker'
+    exif.get_ifd(GPS_IFD)[2] = (48.0, 51.0, 24.0)
+    buffer = io.BytesIO()
+    image.save(buffer, format=image_format, exif=exif)
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/jpeg')
+
+
+image_settings = override_settings(
+    STORAGES={'default': {'BACKEND': 'django.core.files.storage.InMemoryStorage'},
+              'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'}},
+    PROFILE_IMAGE_VARIANT_SIZES=(64, 256), PROFILE_IMAGE_DEFAULT_SIZE=256, PROFILE_IMAGE_MAX_SIZE=1024,
+)
+
+
+def store_and_process(upload):
+    name = store_profile_image(upload)
+    process_profile_image(name)
+    return name
+
+
+@image_settings
+class ProfileImageTests(SimpleTestCase):
+    def open_stored(self, name):
+        with default_storage.open(name) as stored:
+            image = Image.open(io.BytesIO(stored.read()))
+            image.load()
+        return image
+
+    def test_the_upload_is_staged_as_it_is(self):
+        upload = photo(size=(300, 200))
+        name = store_profile_image(upload)
+        self.assertFalse(default_storage.exists(name))
+        with default_storage.open(staged_name(name)) as staged:
+            self.assertEqual(staged.read(), upload.file.getvalue())
+
+    def test_stored_image_has_no_metadata_and_is_downscaled(self):
+        name = store_and_process(photo())
+        image = self.open_stored(name)
+        self.assertEqual(len(image.getexif()), 0)
+        self.assertEqual(image.size, (1024, 683))
+        self.assertFalse(default_storage.exists(staged_name(name)))
+
+    def test_extension_comes_from_the_image_format(self):
+        self.assertTrue(store_profile_image(photo(name='photo.html')).endswith('.jpg'))
+        self.assertTrue(store_profile_image(photo(name='photo.jpg', image_format='PNG')).endswith('.png'))
+        self.assertTrue(store_profile_image(photo(name='photo.png', image_format='TIFF')).endswith('.png'))
+
+    def test_invalid_upload_is_rejected(self):
+        with self.assertRaises(ValueError):
+            store_profile_image(SimpleUploadedFile('photo.jpg', b'<html></html>'))
+
+    def test_profile_serves_the_default_variant(self):
+        name = store_and_process(photo())
+        default_variant = variant_name(name, 256, 'jpeg')
+        self.assertTrue(default_storage.exists(default_variant))
+        self.assertEqual(self.open_stored(default_variant).size, (256, 171))
+        self.assertEqual(profile_image_url(name), default_storage.url(default_variant))
+        row = {'id': 1, 'email': 'a@example.com', 'first_name': '', 'last_name': '', 'phone_number': None,
+               'profile_image': name, 'gender': None, 'date_joined': None}
+        self.assertEqual(render_profile(row)['profile_image'], default_storage.url(default_variant))
+
+    def test_background_variants(self):
+        name = store_and_process(photo())
+        for size in (64, 256):
+            for extension in ('jpeg', 'webp'):
+                variant = self.open_stored(variant_name(name, size, extension))
+                self.assertEqual(max(variant.size), size)
+                self.assertEqual(len(variant.getexif()), 0)
+
+    def test_processing_twice_changes_nothing(self):
+        name = store_and_process(photo())
+        with default_storage.open(name) as stored:
+            content = stored.read()
+        process_profile_image(name)
+        with default_storage.open(name) as stored:
+            self.assertEqual(stored.read(), content)
+
+
+@image_settings
+class UndecodableImageTests(UserAPITestCase):
+
+    def test_an_upload_that_does_not_decode_is_dropped(self):
+        content = photo().file.getvalue()
+        name = store_profile_image(SimpleUploadedFile('photo.jpg', content[:len(content) // 2]))
+        self.user.profile_image = name
+        self.user.save()
+        process_profile_image(name)
+        self.user.refresh_from_db()
+        self.assertFalse(self.user.profile_image)
+        self.assertFalse(default_storage.exists(name))
+        self.assertFalse(default_storage.exists(staged_name(name)))
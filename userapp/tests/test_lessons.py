@@ -0,0 +1,91 @@
+from unittest import mock
+
+from django.db import IntegrityError
+from django.test import override_settings
+from django.urls import reverse
+
+from userapp.models import UserCreatedLessons, UserDetails
+from userapp.tests.base import UserAPITestCase
+
+
+class AddLessonTests(UserAPITestCase):
+
+    def add_lesson(self):
+        return self.client.post(reverse('user_add_custom_lesson'), {'lesson_name': 'Algebra'}, format='json')
+
+    def test_a_user_deleted_during_the_insert_is_not_found(self):
+        def delete_the_user(**fields):
+            UserDetails.objects.filter(id=self.user.id).delete()
+            raise IntegrityError('FOREIGN KEY constraint failed')
+
+        with mock.patch.object(UserCreatedLessons.objects, 'create', delete_the_user):
+            response = self.add_lesson()
+        self.assertEqual(response.status_code, 404)
+
+    def test_other_integrity_errors_are_raised(self):
+        # Whatever the message says, the user still exists: not a missing user
+        error = IntegrityError('insert or update on table "x" violates foreign key constraint "y"')
+        with mock.patch.object(UserCreatedLessons.objects, 'create', side_effect=error):
+            with self.assertRaises(IntegrityError):
+                self.add_lesson()
+
+
+class LessonBatchTests(UserAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.kept = UserCreatedLessons.objects.create(user=self.user, lesson_name='Algebra')
+        self.deleted = UserCreatedLessons.objects.create(user=self.user, lesson_name='Geometry')
+        other = self.create_user('other@example.com')
+        self.others = UserCreatedLessons.objects.create(user=other, lesson_name='Not yours')
+
+    def apply(self, operations):
+        return self.client.post(reverse('user_custom_lessons_batch'), {'operations': operations}, format='json')
+
+    def test_valid_operations_are_applied_despite_failed_ones(self):
+        response = self.apply([
+            {'op': 'create', 'lesson_name': ' Physics '},
+            {'op': 'update', 'id': self.kept.id, 'lesson_name': 'Linear algebra'},
+            {'op': 'delete', 'id': str(self.deleted.id)},
+            {'op': 'update', 'id': self.others.id, 'lesson_name': 'Mine now'},
+            {'op': 'delete', 'id': self.kept.id},
+            {'op': 'rename', 'id': self.kept.id},
+            {'op': 'create', 'lesson_name': 'x' * 1000},
+            'create',
+        ])
+        self.assertEqual(response.status_code, 200)
+        results = response.data['results']
+        self.assertEqual([result['status'] for result in results],
+                         ['created', 'updated', 'deleted', 'not_found', 'invalid', 'invalid', 'invalid', 'invalid'])
+        self.assertEqual(results[4]['error'], 'The same lesson can only be changed once per batch.')
+
+        created = UserCreatedLessons.objects.get(id=results[0]['id'])
+        self.assertEqual(created.lesson_name, 'Physics')
+        self.kept.refresh_from_db()
+        self.assertEqual(self.kept.lesson_name, 'Linear algebra')
+        self.assertTrue(UserCreatedLessons.all_objects.get(id=self.deleted.id).is_deleted)
+        self.others.refresh_from_db()
+        self.assertEqual(self.others.lesson_name, 'Not yours')
+
+        # One change: every written row carries the user's new content version
+        version = UserDetails.objects.get(id=self.user.id).content_version
+        seqs = UserCreatedLessons.all_objects.filter(id__in=[created.id, self.kept.id, self.deleted.id])
+        self.assertEqual(set(seqs.values_list('change_seq', flat=True)), {version})
+
+    def test_a_batch_of_failed_operations_changes_nothing(self):
+        version = UserDetails.objects.get(id=self.user.id).content_version
+        response = self.apply([{'op': 'delete', 'id': self.others.id}])
+        self.assertEqual(response.data['results'][0]['status'], 'not_found')
+        self.assertEqual(UserDetails.objects.get(id=self.user.id).content_version, version)
+
+    @override_settings(LESSON_BATCH_MAX_OPERATIONS=2)
+    def test_invalid_batches_are_rejected(self):
+        for operations in ([{'op': 'create', 'lesson_name': 'A'}] * 3, {'op': 'create'}, None):
+            self.assertEqual(self.apply(operations).status_code, 400)
+        self.assertEqual(UserCreatedLessons.objects.filter(user=self.user).count(), 2)
+
+    def test_a_deleted_user_is_not_found(self):
+        UserDetails.objects.filter(id=self.user.id).delete()
+        response = self.apply([{'op': 'create', 'lesson_name': 'Physics'}])
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(UserCreatedLessons.objects.filter(lesson_name='Physics').exists())
@@ -0,0 +1,38 @@
+from django.test import override_settings
+from django.urls import reverse
+
+from userapp.tests.base import PASSWORD, UserAPITestCase
+
+
+@override_settings(THROTTLE_RATES={}, LOGIN_MAX_FAILURES_PER_ACCOUNT_AND_IP=5, LOGIN_MAX_FAILURES_PER_IP=50)
+class LoginGuardTests(UserAPITestCase):
+    def login(self, email, password, **headers):
+        return self.client.post(reverse('user_login'), {'email': email, 'password': password},
+                                format='json', **headers)
+
+    def test_account_is_blocked_after_too_many_failures_from_an_ip(self):
+        statuses = [self.login(self.user.email, 'wrong', REMOTE_ADDR='10.0.0.1').status_code for _ in range(6)]
+        self.assertEqual(statuses, [401] * 5 + [429])
+        response = self.login(self.user.email, PASSWORD, REMOTE_ADDR='10.0.0.1')
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+
+    def test_failures_from_other_ips_do_not_lock_the_owner_out(self):
+        for index in range(10):
+            self.assertEqual(self.login(self.user.email, 'wrong', REMOTE_ADDR=f'10.0.0.{index}').status_code, 401)
+        self.assertEqual(self.login(self.user.email, PASSWORD, REMOTE_ADDR='192.0.2.1').status_code, 200)
+
+    def test_ip_is_blocked_even_with_a_spoofed_forwarded_for(self):
+        for index in range(50):
+            response = self.login(f'user{index}@example.com', 'wrong', HTTP_X_FORWARDED_FOR=f'203.0.113.{index}')
+            self.assertEqual(response.status_code, 401)
+        response = self.login('user50@example.com', 'wrong', HTTP_X_FORWARDED_FOR='198.51.100.1')
+        self.assertEqual(response.status_code, 429)
+        # Another client is not affected
+        self.assertEqual(self.login(self.user.email, PASSWORD, REMOTE_ADDR='10.0.0.1').status_code, 200)
+
+    def test_success_resets_the_account_failures(self):
+        for _ in range(4):
+            self.login(self.user.email, 'wrong')
+        self.assertEqual(self.login(self.user.email, PASSWORD).status_code, 200)
+        self.assertEqual(self.login(self.user.email, 'wrong').status_code, 401)
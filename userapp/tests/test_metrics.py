@@ -0,0 +1,19 @@
+from django.test import override_settings
+from django.urls import reverse
+
+from userapp.tests.base import UserAPITestCase
+
+
+class SlowRequestLogTests(UserAPITestCase):
+
+    @override_settings(METRICS_SLOW_REQUEST_MS=0)
+    def test_logs_the_sql_without_its_parameters(self):
+        with self.assertLogs('iveye_backend.metrics.slow', 'WARNING') as logs:
+            response = self.client.post(reverse('user_add_custom_lesson'), {'lesson_name': 'Private notes'},
+                                        format='json')
+        self.assertEqual(response.status_code, 201)
+        record = logs.records[-1]
+        insert = [query['sql'] for query in record.sql if query['sql'].startswith('INSERT')]
+        self.assertIn('%s', insert[0])
+        self.assertNotIn('Private notes', str(record.sql))
+        self.assertNotIn('params', record.sql[0])
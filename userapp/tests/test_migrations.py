@@ -0,0 +1,43 @@
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+
+
+class TopicCatalogMigrationTests(TransactionTestCase):
+
+    def migrate(self, target):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate([('userapp', target)])
+        return executor.loader.project_state([('userapp', target)]).apps
+
+    def tearDown(self):
+        self.migrate(MigrationExecutor(connection).loader.graph.leaf_nodes('userapp')[0][1])
+
+    def test_free_text_topics_move_to_the_catalog(self):
+        apps = self.migrate('0002_topic_catalog')
+        UserDetails = apps.get_model('userapp', 'UserDetails')
+        UserLearningTopic = apps.get_model('userapp', 'UserLearningTopic')
+        first = UserDetails.objects.create(email='first@example.com')
+        second = UserDetails.objects.create(email='second@example.com')
+        for user, name in ((first, 'Physics'), (first, 'physics'), (first, 'Algebra'), (second, 'physics')):
+            UserLearningTopic.objects.create(user=user, topic=name)
+        oldest_id = UserLearningTopic.objects.get(user=first, topic='Physics').id
+
+        with CaptureQueriesContext(connection) as context:
+            self.migrate('0003_topic_catalog_data')
+        updates = [query['sql'] for query in context.captured_queries
+                   if query['sql'].startswith('UPDATE "userapp_userlearningtopic"')]
+        # One per distinct name, not per row
+        self.assertEqual(len(updates), 3)
+
+        apps = self.migrate('0004_topic_catalog_references')
+        Topic = apps.get_model('userapp', 'Topic')
+        UserLearningTopic = apps.get_model('userapp', 'UserLearningTopic')
+        self.assertEqual(sorted(Topic.objects.values_list('slug', flat=True)), ['algebra', 'physics'])
+        rows = UserLearningTopic.objects.order_by('id').values_list('id', 'user__email', 'topic__slug')
+        self.assertEqual(list(rows)[0], (oldest_id, 'first@example.com', 'physics'))
+        self.assertEqual(sorted(row[1:] for row in rows), [('first@example.com', 'algebra'),
+                                                           ('first@example.com', 'physics'),
+                                                           ('second@example.com', 'physics')])
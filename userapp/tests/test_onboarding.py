@@ -0,0 +1,36 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from userapp.models import UserLearningTopic
+from userapp.tests.base import UserAPITestCase
+
+
+class OnboardingTests(UserAPITestCase):
+    def onboard(self, topics, **data):
+        return self.client.post(reverse('user_onboarding'), {'topics': topics, **data}, format='json')
+
+    def topic_names(self):
+        return set(UserLearningTopic.objects.filter(user=self.user).values_list('topic__name', flat=True))
+
+    def test_duplicates_and_existing_topics_are_skipped(self):
+        self.assertEqual(self.onboard(['Python', ' python ', 'Go']).data['topics_added'], 2)
+        response = self.onboard(['Go', 'Rust'])
+        self.assertEqual((response.data['topics_added'], response.data['topics_removed']), (1, 0))
+        self.assertEqual(self.topic_names(), {'Python', 'Go', 'Rust'})
+
+    def test_replace_mode_is_idempotent(self):
+        self.onboard(['Python', 'Go'])
+        response = self.onboard(['Go', 'Rust'], mode='replace')
+        self.assertEqual((response.data['topics_added'], response.data['topics_removed']), (1, 1))
+        response = self.onboard(['Go', 'Rust'], mode='replace')
+        self.assertEqual((response.data['topics_added'], response.data['topics_removed']), (0, 0))
+        self.assertEqual(self.topic_names(), {'Go', 'Rust'})
+
+    def test_topics_are_inserted_with_one_query(self):
+        with CaptureQueriesContext(connection) as context:
+            self.onboard([f'Topic {index}' for index in range(50)])
+        inserts = [query['sql'] for query in context.captured_queries
+                   if query['sql'].startswith('INSERT INTO "userapp_userlearningtopic"')]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(len(self.topic_names()), 50)
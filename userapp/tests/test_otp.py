@@ -0,0 +1,55 @@
+import json
+
+from django.core import mail
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from userapp import otp
+from userapp.models import OneTimeCode, QueuedTask
+from userapp.tests.base import PASSWORD, UserAPITestCase
+
+
+class PasswordResetCodeTests(UserAPITestCase):
+
+    def request_code(self):
+        response = self.client.post(reverse('forgot_password_request'), {'email': self.user.email}, format='json')
+        self.assertEqual(response.status_code, 200)
+        return QueuedTask.objects.get(name='userapp.otp.deliver_code')
+
+    def run(self, result=None):
+        with self.settings(TASK_QUEUE_EAGER=False):
+            return super().run(result)
+
+    def test_the_code_is_not_queued(self):
+        queued = self.request_code()
+        code = otp.get_code(OneTimeCode.objects.get(email=self.user.email))
+        self.assertNotIn(code, json.dumps([queued.args, queued.kwargs]))
+
+        otp.deliver_code(*queued.args, **queued.kwargs)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertIn(code, mail.outbox[0].body)
+        self.assertTrue(otp.verify_code(self.user.email, code))
+
+    def test_a_used_code_is_not_sent(self):
+        queued = self.request_code()
+        self.assertTrue(otp.verify_code(self.user.email, otp.get_code(OneTimeCode.objects.get(email=self.user.email))))
+        otp.deliver_code(*queued.args, **queued.kwargs)
+        self.assertEqual(mail.outbox, [])
+
+    def test_a_replaced_code_is_not_sent(self):
+        queued = self.request_code()
+        with self.settings(OTP_RESEND_INTERVAL=0):
+            otp.issue_code(self.user.email)
+        otp.deliver_code(*queued.args, **queued.kwargs)
+        self.assertEqual(mail.outbox, [])
+
+    def test_the_reset_logs_every_device_out(self):
+        self.request_code()
+        code = otp.get_code(OneTimeCode.objects.get(email=self.user.email))
+        data = {'email': self.user.email, 'otp': code, 'new_password': 'Newsecret456!'}
+        response = APIClient().post(reverse('forgot_password_confirm'), data, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get(reverse('user_profile_details')).status_code, 401)
+
+        login = {'email': self.user.email, 'password': PASSWORD}
+        self.assertEqual(self.client.post(reverse('user_login'), login, format='json').status_code, 401)
@@ -0,0 +1,77 @@
+import json
+from unittest import mock
+
+from django.core.cache import cache
+from django.urls import reverse
+
+from userapp import profile_cache
+from userapp.models import UserDetails
+from userapp.profile_cache import aget_profile_json, get_profile_json, profile_version_key
+from userapp.serializers import render_profile
+from userapp.tests.base import PASSWORD, UserAPITestCase
+
+
+class ProfileUpdateTests(UserAPITestCase):
+
+    def test_users_can_not_grant_themselves_permissions(self):
+        response = self.client.patch(reverse('user_profile_updation'),
+                                     {'first_name': 'Ada', 'is_staff': True, 'is_superuser': True,
+                                      'password': 'changed', 'email': 'taken-over@example.com'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        user = UserDetails.objects.get(id=self.user.id)
+        self.assertEqual(user.first_name, 'Ada')
+        self.assertFalse(user.is_staff)
+        self.assertFalse(user.is_superuser)
+        self.assertEqual(user.email, self.user.email)
+        self.assertTrue(user.check_password(PASSWORD))
+
+    def test_invalid_field_is_rejected(self):
+        response = self.client.patch(reverse('user_profile_updation'), {'phone_number': 'not a number'},
+                                     format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('phone_number', response.data['errors'])
+
+
+class ProfileCacheTests(UserAPITestCase):
+
+    def first_name(self):
+        return json.loads(get_profile_json(self.user.id))['first_name']
+
+    def rename(self, first_name):
+        user = UserDetails.objects.get(id=self.user.id)
+        user.first_name = first_name
+        user.save(update_fields=['first_name'])
+
+    def test_the_profile_is_served_from_the_cache(self):
+        get_profile_json(self.user.id)
+        with self.assertNumQueries(0):
+            get_profile_json(self.user.id)
+
+    def test_a_write_moves_the_profile_to_a_new_version(self):
+        self.first_name()
+        version = cache.get(profile_version_key(self.user.id))
+        self.rename('Ada')
+        self.assertGreater(cache.get(profile_version_key(self.user.id)), version)
+        self.assertEqual(self.first_name(), 'Ada')
+
+    def test_a_read_racing_a_write_does_not_cache_the_old_profile(self):
+        def render_then_rename(row):
+            # The row was loaded before the write and is rendered after it
+            self.rename('Ada')
+            return render_profile(row)
+
+        with mock.patch.object(profile_cache, 'render_profile', render_then_rename):
+            self.assertEqual(self.first_name(), '')
+        self.assertEqual(self.first_name(), 'Ada')
+
+    def test_an_evicted_version_does_not_serve_old_entries(self):
+        self.first_name()
+        UserDetails.objects.filter(id=self.user.id).update(first_name='Ada')
+        cache.delete(profile_version_key(self.user.id))
+        self.assertEqual(self.first_name(), 'Ada')
+
+    async def test_the_async_read_shares_the_versions(self):
+        self.assertEqual(json.loads(await aget_profile_json(self.user.id))['first_name'], '')
+        await UserDetails.objects.filter(id=self.user.id).aupdate(first_name='Ada')
+        profile_cache.invalidate_profile(self.user.id)
+        self.assertEqual(json.loads(await aget_profile_json(self.user.id))['first_name'], 'Ada')
@@ -0,0 +1,82 @@
+from django.test import override_settings
+from django.urls import reverse
+
+from userapp import otp
+from userapp.models import (OneTimeCode, PendingPurge, QueuedTask, Topic, TokenCutoff, UserCreatedLessons,
+                            UserDetails, UserLearningTopic)
+from userapp.purge import purge_account, purge_users, request_purge
+from userapp.tests.base import PASSWORD, UserAPITestCase
+
+
+class PurgeTests(UserAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        topics = Topic.objects.bulk_create([Topic(name=f'Topic {index}', slug=f'topic-{index}') for index in range(5)])
+        self.other = self.create_user('other@example.com')
+        for user in (self.user, self.other):
+            UserLearningTopic.objects.bulk_create([UserLearningTopic(user=user, topic=topic) for topic in topics])
+            UserCreatedLessons.objects.bulk_create([UserCreatedLessons(user=user, lesson_name=f'Lesson {index}')
+                                                    for index in range(5)])
+
+    def assertPurged(self, user):
+        self.assertFalse(UserDetails.objects.filter(id=user.id).exists())
+        self.assertFalse(UserLearningTopic.objects.filter(user_id=user.id).exists())
+        self.assertFalse(UserCreatedLessons.objects.filter(user_id=user.id).exists())
+        self.assertFalse(PendingPurge.objects.filter(user_id=user.id).exists())
+
+    def assertUntouched(self, user):
+        self.assertTrue(UserDetails.objects.get(id=user.id).is_active)
+        self.assertEqual(UserLearningTopic.objects.filter(user=user).count(), 5)
+        self.assertEqual(UserCreatedLessons.objects.filter(user=user).count(), 5)
+
+    def test_request_purge_locks_the_user_out(self):
+        self.assertEqual(request_purge([self.user.id]), 1)
+        self.assertFalse(UserDetails.objects.get(id=self.user.id).is_active)
+        self.assertTrue(PendingPurge.objects.filter(user_id=self.user.id).exists())
+        self.assertTrue(TokenCutoff.objects.filter(user_id=self.user.id).exists())
+        self.assertEqual(self.client.get(reverse('user_profile_details')).status_code, 401)
+        self.assertUntouched(self.other)
+
+    def test_purge_users_deletes_the_queued_users_in_chunks(self):
+        otp.issue_code(self.user.email)
+        request_purge([self.user.id])
+        self.assertEqual(purge_users([self.user.id, self.other.id], chunk_size=2, pause=0), 1)
+        self.assertPurged(self.user)
+        self.assertFalse(OneTimeCode.objects.filter(email=self.user.email).exists())
+        # Its cutoff outlives the user, the tokens stay revoked
+        self.assertTrue(TokenCutoff.objects.filter(user_id=self.user.id).exists())
+        self.assertUntouched(self.other)
+
+    def test_an_interrupted_purge_resumes(self):
+        request_purge([self.user.id])
+        # Stopped after the lessons, before the topics and the user
+        UserCreatedLessons.objects.filter(user=self.user).delete()
+        self.assertEqual(purge_users([self.user.id], pause=0), 1)
+        self.assertPurged(self.user)
+
+    def test_users_that_are_not_queued_are_left_alone(self):
+        self.assertEqual(purge_users([self.user.id], pause=0), 0)
+        self.assertUntouched(self.user)
+
+
+@override_settings(TASK_QUEUE_EAGER=False)
+class DeleteAccountTests(UserAPITestCase):
+
+    def delete_account(self, password):
+        return self.client.delete(reverse('user_delete_account'), {'password': password}, format='json')
+
+    def test_wrong_password_is_rejected(self):
+        self.assertEqual(self.delete_account('wrong').status_code, 400)
+        self.assertTrue(UserDetails.objects.get(id=self.user.id).is_active)
+        self.assertFalse(PendingPurge.objects.exists())
+
+    def test_the_account_is_deleted_in_the_background(self):
+        response = self.delete_account(PASSWORD)
+        self.assertEqual(response.status_code, 202)
+        self.assertFalse(UserDetails.objects.get(id=self.user.id).is_active)
+        queued = QueuedTask.objects.get(name=purge_account.name)
+        self.assertEqual(self.client.get(reverse('user_profile_details')).status_code, 401)
+
+        purge_account(*queued.args, **queued.kwargs)
+        self.assertFalse(UserDetails.objects.filter(id=self.user.id).exists())
@@ -0,0 +1,68 @@
+from django.test import TransactionTestCase
+from django.urls import reverse
+
+from userapp.models import Topic, UserCreatedLessons, UserLearningTopic
+from userapp.tests.base import UserAPITestCase, reset_process_state
+
+
+class EndpointQueryCountTests(UserAPITestCase):
+    """
+    Authenticated requests are served from the token claims: no endpoint loads the UserDetails row
+    to authenticate, the counts below are the queries of the endpoints themselves.
+    """
+
+    def setUp(self):
+        super().setUp()
+        topics = Topic.objects.bulk_create([Topic(name=f'Topic {n}', slug=f'topic-{n}') for n in range(3)])
+        UserLearningTopic.objects.bulk_create([UserLearningTopic(user=self.user, topic=topic) for topic in topics])
+        UserCreatedLessons.objects.bulk_create([UserCreatedLessons(user=self.user, lesson_name=f'Lesson {n}')
+                                                for n in range(3)])
+
+    def test_profile_is_read_once_then_from_the_cache(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get(reverse('user_profile_details')).status_code, 200)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(reverse('user_profile_details')).status_code, 200)
+
+    def test_topic_listing(self):
+        # The content version for the ETag, then the page with its topics joined in
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('user_specific_topic'))
+        self.assertEqual(len(response.data['results']), 3)
+
+    def test_lesson_listing(self):
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('get_custom_lessons_of_user'))
+        self.assertEqual(len(response.data['results']), 3)
+
+    def test_not_modified_listing_only_reads_the_content_version(self):
+        etag = self.client.get(reverse('get_custom_lessons_of_user'))['ETag']
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('get_custom_lessons_of_user'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_add_custom_lesson(self):
+        # The content version bump and the INSERT, in a savepoint
+        with self.assertNumQueries(5):
+            response = self.client.post(reverse('user_add_custom_lesson'), {'lesson_name': 'Algebra'}, format='json')
+        self.assertEqual(response.status_code, 201)
+
+    def test_add_custom_lesson_without_a_name_is_rejected_without_a_query(self):
+        for data in ({}, {'lesson_name': '  '}, {'lesson_name': 'x' * 351}):
+            with self.assertNumQueries(0):
+                response = self.client.post(reverse('user_add_custom_lesson'), data, format='json')
+            self.assertEqual(response.status_code, 400)
+
+
+class MissingUserTests(TransactionTestCase):
+    """Runs outside of a test transaction, like a request: SQLite checks the foreign keys on commit."""
+
+    def setUp(self):
+        reset_process_state()
+
+    def test_lesson_of_a_deleted_user_is_not_found(self):
+        user = UserAPITestCase.create_user('gone@example.com')
+        client = UserAPITestCase.client_for(user)
+        user.delete()
+        response = client.post(reverse('user_add_custom_lesson'), {'lesson_name': 'Algebra'}, format='json')
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,170 @@
+from unittest import skipUnless
+
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from userapp import otp
+from userapp.models import OneTimeCode, Topic, UserCreatedLessons, UserDetails, UserLearningTopic
+from userapp.purge import purge_account
+from userapp.search import filter_users, index_users
+from userapp.tests.base import PASSWORD, UserAPITestCase
+
+
+@skipUnless(connection.vendor == 'sqlite', 'Reads the plans of SQLite')
+@override_settings(TASK_QUEUE_EAGER=False)
+class QueryPlanTests(UserAPITestCase):
+    """
+    Runs the queries of the hot paths and checks their EXPLAIN QUERY PLAN: every table is searched
+    through an index, never scanned, and the rows come out in the index order, without a sort.
+    The plan of an INSERT lists the lookups of the rows referencing the new one, by foreign key.
+    """
+
+    def setUp(self):
+        super().setUp()
+        topics = Topic.objects.bulk_create([Topic(name=f'Topic {n}', slug=f'topic-{n}') for n in range(5)])
+        UserLearningTopic.objects.bulk_create([UserLearningTopic(user=self.user, topic=topic) for topic in topics])
+        UserCreatedLessons.objects.bulk_create([UserCreatedLessons(user=self.user, lesson_name=f'Lesson {n}')
+                                                for n in range(5)])
+
+    def plans_of(self, make_queries, statements=('SELECT', 'UPDATE', 'DELETE', 'INSERT')):
+        """Returns the query plan lines of the `statements` run by `make_queries()`."""
+        with CaptureQueriesContext(connection) as context:
+            make_queries()
+        plans = []
+        with connection.cursor() as cursor:
+            for query in context.captured_queries:
+                if query['sql'].startswith(statements):
+                    cursor.execute('EXPLAIN QUERY PLAN ' + query['sql'])
+                    # Skips the VALUES rows of an INSERT, only its lookups matter
+                    plans.append([row[3] for row in cursor.fetchall() if 'CONSTANT ROW' not in row[3]])
+        self.assertTrue(plans)
+        return plans
+
+    def assertIndexed(self, plans, *indexes, scanned=()):
+        """
+        Checks that no table is scanned but the `scanned` ones, read whole in the order of their
+        primary key or of an index, and that no query sorts its rows. Each of `indexes` must be used.
+        """
+        for plan in plans:
+            for line in plan:
+                if line.startswith('SCAN'):
+                    self.assertIn(line.split()[1], scanned, plan)
+                self.assertNotIn('TEMP B-TREE', line, plan)
+        used = '\n'.join(line for plan in plans for line in plan)
+        for index in indexes:
+            self.assertRegex(used, rf'INDEX {index}\b')
+
+    def get_page(self, name, **params):
+        response = self.client.get(reverse(name), {'page_size': 2, **params})
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_topic_listing(self):
+        plans = self.plans_of(lambda: self.get_page('user_specific_topic'))
+        self.assertIndexed(plans, 'userapp_ltopic_user_id_idx')
+
+    def test_lesson_listing(self):
+        plans = self.plans_of(lambda: self.get_page('get_custom_lessons_of_user'))
+        self.assertIndexed(plans, 'userapp_lesson_user_id_idx')
+
+    def test_keyset_pages(self):
+        for name, index in (('user_specific_topic', 'userapp_ltopic_user_id_idx'),
+                            ('get_custom_lessons_of_user', 'userapp_lesson_user_id_idx')):
+            cursor = self.get_page(name)['next_cursor']
+            plans = self.plans_of(lambda: self.get_page(name, cursor=cursor))
+            self.assertIndexed(plans, index)
+            self.assertIn('id>?', '\n'.join(line for plan in plans for line in plan))
+
+    def test_sync_changes(self):
+        def get_changes():
+            response = self.client.get(reverse('user_content_changes'), {'since': 1})
+            self.assertEqual(response.status_code, 200)
+            self.assertFalse(response.data['reset'])
+
+        self.user.refresh_from_db()
+        UserDetails.objects.filter(id=self.user.id).update(content_version=10)
+        UserLearningTopic.all_objects.filter(user=self.user).update(change_seq=5)
+        UserCreatedLessons.all_objects.filter(user=self.user).update(change_seq=5)
+        plans = self.plans_of(get_changes)
+        self.assertIndexed(plans, 'userapp_ltopic_user_seq_idx', 'userapp_lesson_user_seq_idx')
+
+    def test_search_term_lookup(self):
+        self.create_user('ann.smith@example.com', first_name='Ann', last_name='Smith')
+        index_users(UserDetails.objects.all())
+        found = []
+        plans = self.plans_of(lambda: found.extend(filter_users(UserDetails.objects.order_by('pk'), 'ann smi')[:100]))
+        self.assertEqual([user.email for user in found], ['ann.smith@example.com'])
+        self.assertIndexed(plans)
+        self.assertIn('USING COVERING INDEX userapp_search_term_idx (term>? AND term<?)', '\n'.join(plans[0]))
+
+    def test_tombstone_updates(self):
+        topic = UserLearningTopic.objects.filter(user=self.user).first()
+        lesson = UserCreatedLessons.objects.filter(user=self.user).first()
+        plans = self.plans_of(lambda: (self.client.delete(reverse('delete_user_topic', args=[topic.id])),
+                                       self.client.delete(reverse('user_delete_custom_lesson', args=[lesson.id]))),
+                              statements=('UPDATE',))
+        # The content version bump and the tombstone of each
+        self.assertEqual(len(plans), 4)
+        self.assertIndexed(plans)
+
+    def test_onboarding(self):
+        def onboard():
+            response = self.client.post(reverse('user_onboarding'), {'topics': ['Topic 1', 'Chemistry'],
+                                                                     'mode': 'replace'}, format='json')
+            self.assertEqual(response.status_code, 200)
+
+        self.assertIndexed(self.plans_of(onboard), 'unique_user_learning_topic')
+
+    def test_topic_learners(self):
+        admin = self.client_for(self.create_user('admin@example.com', is_staff=True))
+        plans = self.plans_of(lambda: admin.get(reverse('topic_learners', args=['topic-1'])))
+        self.assertIndexed(plans, 'userapp_topic_user_idx')
+
+    def test_top_n(self):
+        admin = self.client_for(self.create_user('admin@example.com', is_staff=True))
+        for name, index in (('top_topics', 'userapp_topic_popular_idx'),
+                            ('top_lesson_names', 'userapp_lesson_name_top_idx')):
+            plans = self.plans_of(lambda: self.assertEqual(admin.get(reverse(name)).status_code, 200))
+            self.assertIndexed(plans, index)
+
+    def test_one_time_code_issue_and_verify(self):
+        plans = self.plans_of(lambda: self.client.post(reverse('forgot_password_request'), {'email': self.user.email},
+                                                       format='json'))
+        self.assertIndexed(plans)
+        code = otp.get_code(OneTimeCode.objects.get(email=self.user.email))
+        plans = self.plans_of(lambda: self.assertTrue(otp.verify_code(self.user.email, code)))
+        self.assertIndexed(plans)
+
+    def test_registration(self):
+        def register():
+            response = self.client.post(reverse('user_registration'), {'email': 'new@example.com',
+                                                                       'password': PASSWORD}, format='json')
+            self.assertEqual(response.status_code, 201)
+
+        # The INSERT looks up the rows of every table referencing the user
+        self.assertIndexed(self.plans_of(register), 'userapp_ltopic_user_seq_idx', 'userapp_lesson_user_seq_idx')
+
+    def test_delete_account(self):
+        def delete_account():
+            response = self.client.delete(reverse('user_delete_account'), {'password': PASSWORD}, format='json')
+            self.assertEqual(response.status_code, 202)
+            purge_account(self.user.id)
+
+        self.assertIndexed(self.plans_of(delete_account), 'userapp_ltopic_user_seq_idx', 'userapp_lesson_user_seq_idx')
+
+    def test_exports(self):
+        def export(client, name):
+            response = client.get(reverse(name))
+            self.assertEqual(response.status_code, 200)
+            b''.join(response.streaming_content)
+
+        plans = self.plans_of(lambda: export(self.client, 'user_data_export'))
+        self.assertIndexed(plans, 'userapp_ltopic_user_id_idx', 'userapp_lesson_user_id_idx')
+
+        admin = self.client_for(self.create_user('admin@example.com', is_staff=True))
+        plans = self.plans_of(lambda: export(admin, 'all_users_data_export'))
+        # Every row is exported, in the order of the primary key or of the (user, id) indexes
+        self.assertIndexed(plans, 'userapp_ltopic_user_id_idx', 'userapp_lesson_user_id_idx',
+                           scanned=('userapp_userdetails', 'userapp_userlearningtopic', 'userapp_usercreatedlessons'))
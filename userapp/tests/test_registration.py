@@ -0,0 +1,58 @@
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from userapp.models import UserDetails
+from userapp.tests.base import PASSWORD, UserAPITestCase
+
+
+class RegistrationTests(UserAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        UserDetails.objects.filter(id=self.user.id).update(phone_number=5550100)
+
+    def register(self, **fields):
+        data = {'email': 'new@example.com', 'password': PASSWORD, 'first_name': 'New', 'last_name': 'User', **fields}
+        with self.assertLogs('userapp.views', 'INFO'):
+            return APIClient().post(reverse('user_registration'), data, format='json')
+
+    def test_a_new_account_is_created(self):
+        response = self.register(phone_number=5550101)
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(UserDetails.objects.filter(email='new@example.com', phone_number=5550101).exists())
+
+    def test_an_existing_email_is_rejected(self):
+        response = self.register(email=self.user.email)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['message'], 'An account already exists with this email id')
+
+    def test_an_existing_phone_number_is_rejected(self):
+        response = self.register(phone_number=5550100)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['message'], 'An account already exists with this phone number')
+        self.assertFalse(UserDetails.objects.filter(email='new@example.com').exists())
+
+
+class ImportUsersTests(UserAPITestCase):
+
+    def test_existing_users_are_skipped_and_not_counted(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'users.csv')
+            with open(path, 'w', newline='', encoding='utf-8') as source:
+                source.write('email,first_name,password_hash\n')
+                source.write(f'{self.user.email},Existing,\n')
+                source.write('imported@example.com,Imported,\n')
+            stdout = StringIO()
+            with CaptureQueriesContext(connection) as context:
+                call_command('import_users', path, workers=1, stdout=stdout)
+
+        self.assertIn('Imported 1 of 2 users.', stdout.getvalue())
+        self.assertTrue(UserDetails.objects.filter(email='imported@example.com', search_terms__isnull=False).exists())
+        self.assertEqual([query for query in context.captured_queries if 'COUNT(' in query['sql']], [])
@@ -0,0 +1,35 @@
+import datetime
+import io
+from decimal import Decimal
+
+from django.test import SimpleTestCase
+from django.utils.translation import gettext_lazy
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
+
+from userapp.renderers import FastJSONParser, FastJSONRenderer, dumps, loads
+
+
+class RendererTests(SimpleTestCase):
+
+    def test_the_output_is_the_same_as_drf(self):
+        data = {'price': Decimal('1.50'), 'when': datetime.datetime(2024, 1, 2, 3, 4, 5, 600000),
+                'day': datetime.date(2024, 1, 2), 'label': gettext_lazy('Topics'), 'text': 'a\u2028b\u2029c',
+                'nested': [1, 2.5, None, True], 1: 'int key'}
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+        self.assertEqual(dumps(data), JSONRenderer().render(data))
+
+    def test_nothing_renders_empty(self):
+        self.assertEqual(FastJSONRenderer().render(None), b'')
+
+    def test_indented_output_is_rendered_by_drf(self):
+        content = FastJSONRenderer().render({'a': 1}, 'application/json; indent=2')
+        self.assertEqual(content, b'{\n  "a": 1\n}')
+
+    def test_parsing(self):
+        self.assertEqual(loads(b'{"a": [1, "b"]}'), {'a': [1, 'b']})
+        self.assertEqual(FastJSONParser().parse(io.BytesIO(b'{"a": 1}')), {'a': 1})
+        with self.assertRaises(ValueError):
+            loads(b'{')
+        with self.assertRaises(ParseError):
+            FastJSONParser().parse(io.BytesIO(b'{'))
@@ -0,0 +1,52 @@
+import time
+from datetime import datetime, timedelta, timezone
+from unittest import mock
+
+from django.urls import reverse
+from rest_framework_simplejwt.tokens import AccessToken
+
+from userapp.revocation import ISSUED_AT_CLAIM, revocation_list
+from userapp.tests.base import PASSWORD, UserAPITestCase
+
+
+class SteppingClock:
+    """A clock starting at the beginning of a second, one millisecond later at every reading."""
+
+    def __init__(self):
+        self.now = datetime.fromtimestamp(int(time.time()), tz=timezone.utc)
+
+    def __call__(self):
+        self.now += timedelta(milliseconds=1)
+        return self.now
+
+
+class LogoutEverywhereTests(UserAPITestCase):
+
+    def login(self):
+        response = self.client.post(reverse('user_login'), {'email': self.user.email, 'password': PASSWORD},
+                                    format='json')
+        self.assertEqual(response.status_code, 200)
+        return response.data['access']
+
+    def get_profile(self, access):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+        return self.client.get(reverse('user_profile_details')).status_code
+
+    def test_login_in_the_same_second_as_the_logout_is_not_revoked(self):
+        clock = SteppingClock()
+        with mock.patch('django.utils.timezone.now', clock), \
+                mock.patch('rest_framework_simplejwt.tokens.aware_utcnow', clock):
+            old_access = self.login()
+            self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {old_access}')
+            self.assertEqual(self.client.post(reverse('user_logout_all')).status_code, 200)
+            new_access = self.login()
+
+        self.assertEqual(AccessToken(old_access)['iat'], AccessToken(new_access)['iat'])
+        self.assertEqual(self.get_profile(new_access), 200)
+        self.assertEqual(self.get_profile(old_access), 401)
+
+    def test_token_without_the_claim_is_revoked_within_its_second(self):
+        token = AccessToken(self.login())
+        del token[ISSUED_AT_CLAIM]
+        revocation_list.add(user_id=self.user.id, cutoff=token['iat'] * 1_000_000 + 500_000)
+        self.assertTrue(revocation_list.is_revoked(token))
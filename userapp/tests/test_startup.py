@@ -0,0 +1,44 @@
+import json
+import os
+import subprocess
+import sys
+from io import StringIO
+
+from django.conf import settings
+from django.core.management import CommandError, call_command
+from django.test import SimpleTestCase
+
+
+# Generous for slow CI machines, the boot takes about 150 ms locally
+STARTUP_BUDGET_MS = float(os.environ.get('STARTUP_BUDGET_MS', 1000))
+
+# Only needed to serve requests: imported with the URLconf, never while a worker boots
+REQUEST_TIME_MODULES = ('PIL', 'rest_framework_simplejwt', 'rest_framework.serializers', 'userapp.serializers')
+
+IMPORTS_SCRIPT = '''
+import json, sys
+import django
+django.setup(set_prefix=False)
+from django.core.handlers.wsgi import WSGIHandler
+WSGIHandler()
+print(json.dumps(sorted(sys.modules)))
+'''
+
+
+class StartupTests(SimpleTestCase):
+
+    def test_boot_is_within_budget(self):
+        stdout = StringIO()
+        call_command('profile_startup', runs=2, top=0, budget_ms=STARTUP_BUDGET_MS, stdout=stdout)
+        self.assertIn('within the budget', stdout.getvalue())
+
+    def test_boot_over_budget_fails(self):
+        with self.assertRaisesMessage(CommandError, 'over the budget'):
+            call_command('profile_startup', runs=2, top=0, budget_ms=0.001, stdout=StringIO())
+
+    def test_boot_does_not_import_the_request_time_modules(self):
+        env = {**os.environ, 'DJANGO_SETTINGS_MODULE': settings.SETTINGS_MODULE}
+        result = subprocess.run([sys.executable, '-c', IMPORTS_SCRIPT], env=env, cwd=settings.BASE_DIR,
+                                capture_output=True, text=True, check=True)
+        modules = set(json.loads(result.stdout.splitlines()[-1]))
+        self.assertEqual([name for name in REQUEST_TIME_MODULES if name in modules], [])
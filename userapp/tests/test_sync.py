@@ -0,0 +1,104 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from userapp.models import Topic, UserCreatedLessons, UserDetails, UserLearningTopic
+from userapp.tests.base import UserAPITestCase
+
+
+class SyncTestCase(UserAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.topic = UserLearningTopic.objects.create(user=self.user, topic=Topic.objects.create(name='Physics',
+                                                                                               slug='physics'))
+        self.lesson = UserCreatedLessons.objects.create(user=self.user, lesson_name='Algebra')
+
+    def changes(self, since):
+        response = self.client.get(reverse('user_content_changes'), {'since': since})
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def token(self):
+        return UserDetails.objects.get(id=self.user.id).content_version
+
+
+class DeltaSyncTests(SyncTestCase):
+
+    def test_the_first_sync_returns_everything(self):
+        changes = self.changes(0)
+        self.assertEqual(changes['token'], self.token())
+        self.assertFalse(changes['reset'])
+        self.assertEqual([row['slug'] for row in changes['topics']['upserts']], ['physics'])
+        self.assertEqual([row['id'] for row in changes['lessons']['upserts']], [self.lesson.id])
+
+    def test_only_the_changes_since_the_token_are_returned(self):
+        token = self.changes(0)['token']
+        self.lesson.lesson_name = 'Linear algebra'
+        self.lesson.save(update_fields=['lesson_name'])
+        created = UserCreatedLessons.objects.create(user=self.user, lesson_name='Geometry')
+        UserLearningTopic.objects.filter(id=self.topic.id).tombstone(self.user.id)
+        # Another user's changes bump their own version, not this user's
+        UserCreatedLessons.objects.create(user=self.create_user('other@example.com'), lesson_name='Other')
+
+        changes = self.changes(token)
+        self.assertEqual(changes['token'], token + 3)
+        self.assertEqual([(row['id'], row['lesson_name']) for row in changes['lessons']['upserts']],
+                         [(self.lesson.id, 'Linear algebra'), (created.id, 'Geometry')])
+        self.assertEqual(changes['lessons']['deleted'], [])
+        self.assertEqual(changes['topics'], {'upserts': [], 'deleted': [self.topic.id]})
+
+        self.assertEqual(self.changes(changes['token'])['lessons'], {'upserts': [], 'deleted': []})
+
+    def test_a_deleted_lesson_is_a_tombstone(self):
+        token = self.changes(0)['token']
+        self.lesson.delete()
+        self.assertEqual(self.changes(token)['lessons'], {'upserts': [], 'deleted': [self.lesson.id]})
+
+    def test_an_unknown_token_resets(self):
+        self.assertEqual(self.changes(self.token() + 1), {'reset': True, 'token': self.token()})
+
+    @override_settings(SYNC_MAX_CHANGES=1)
+    def test_too_many_changes_reset(self):
+        UserCreatedLessons.objects.create(user=self.user, lesson_name='Geometry')
+        self.assertEqual(self.changes(0), {'reset': True, 'token': self.token()})
+
+    def test_an_invalid_token_is_rejected(self):
+        response = self.client.get(reverse('user_content_changes'), {'since': '-1'})
+        self.assertEqual(response.status_code, 400)
+
+
+class PurgeTombstonesTests(SyncTestCase):
+
+    def purge(self, **options):
+        call_command('purge_tombstones', days=30, stdout=StringIO(), **options)
+
+    def test_old_tombstones_are_purged_and_older_tokens_reset(self):
+        token = self.changes(0)['token']
+        recent = UserCreatedLessons.objects.create(user=self.user, lesson_name='Geometry')
+        self.lesson.delete()
+        recent.delete()
+        old_seq = UserCreatedLessons.all_objects.get(id=self.lesson.id).change_seq
+        UserCreatedLessons.all_objects.filter(id=self.lesson.id).update(
+            updated_at=timezone.now() - timedelta(days=31))
+
+        self.purge(batch_size=1)
+        self.assertFalse(UserCreatedLessons.all_objects.filter(id=self.lesson.id).exists())
+        self.assertTrue(UserCreatedLessons.all_objects.filter(id=recent.id, is_deleted=True).exists())
+        self.assertEqual(UserDetails.objects.get(id=self.user.id).sync_floor, old_seq)
+
+        # The purged delete can not be reported anymore
+        self.assertEqual(self.changes(token), {'reset': True, 'token': self.token()})
+        self.assertEqual(self.changes(old_seq)['lessons']['deleted'], [recent.id])
+
+    def test_live_rows_are_kept(self):
+        UserCreatedLessons.all_objects.update(updated_at=timezone.now() - timedelta(days=365))
+        UserLearningTopic.all_objects.update(updated_at=timezone.now() - timedelta(days=365))
+        self.purge()
+        self.assertTrue(UserCreatedLessons.objects.filter(id=self.lesson.id).exists())
+        self.assertTrue(UserLearningTopic.objects.filter(id=self.topic.id).exists())
+        self.assertEqual(UserDetails.objects.get(id=self.user.id).sync_floor, 0)
@@ -0,0 +1,144 @@
+import time
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import OperationalError
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from userapp.models import QueuedTask
+from userapp.taskqueue import claim_tasks, finish_task, renew_leases, requeue_expired, task
+
+
+calls = []
+
+
+@task(max_attempts=2, retry_backoff=10)
+def record(value, pause=0):
+    time.sleep(pause)
+    calls.append(value)
+
+
+WORKER = 'userapp.management.commands.run_task_worker'
+
+
+@override_settings(TASK_QUEUE_EAGER=False)
+class TaskQueueTests(TestCase):
+
+    def setUp(self):
+        calls.clear()
+
+    def test_delay_queues_the_task(self):
+        queued = record.delay('a', pause=0)
+        self.assertEqual((queued.name, queued.args, queued.kwargs), (record.name, ['a'], {'pause': 0}))
+        self.assertEqual((queued.status, queued.max_attempts), (QueuedTask.PENDING, 2))
+        self.assertEqual(calls, [])
+
+    @override_settings(TASK_QUEUE_EAGER=True)
+    def test_eager_delay_runs_the_task_on_commit(self):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            self.assertIsNone(record.delay('a'))
+            self.assertEqual(calls, [])
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(calls, ['a'])
+        self.assertFalse(QueuedTask.objects.exists())
+
+    def test_claim_takes_the_due_tasks_once(self):
+        due = record.delay('a')
+        QueuedTask.objects.create(name=record.name, run_at=timezone.now() + timedelta(minutes=1))
+        [claimed] = claim_tasks(10)
+        self.assertEqual(claimed.id, due.id)
+        self.assertEqual((claimed.status, claimed.attempts), (QueuedTask.RUNNING, 1))
+        self.assertGreater(claimed.locked_until, timezone.now())
+        self.assertEqual(claim_tasks(10), [])
+
+    def test_claim_respects_the_limit(self):
+        for value in 'abc':
+            record.delay(value)
+        self.assertEqual([claimed.args for claimed in claim_tasks(2)], [['a'], ['b']])
+
+    def test_finished_tasks_are_deleted(self):
+        record.delay('a')
+        [claimed] = claim_tasks(1)
+        finish_task(claimed)
+        self.assertFalse(QueuedTask.objects.exists())
+
+    def test_failed_tasks_are_retried_with_backoff(self):
+        record.delay('a')
+        [claimed] = claim_tasks(1)
+        with self.assertLogs('userapp.taskqueue', 'WARNING'):
+            finish_task(claimed, ValueError('boom'))
+        queued = QueuedTask.objects.get()
+        self.assertEqual(queued.status, QueuedTask.PENDING)
+        self.assertIn('ValueError: boom', queued.last_error)
+        self.assertAlmostEqual((queued.run_at - timezone.now()).total_seconds(), 10, delta=2)
+        self.assertEqual(claim_tasks(1), [])
+        self.assertEqual(record.retry_delay(2), 20)
+
+    def test_tasks_fail_after_their_last_attempt(self):
+        record.delay('a')
+        QueuedTask.objects.update(attempts=1)
+        [claimed] = claim_tasks(1)
+        with self.assertLogs('userapp.taskqueue', 'ERROR'):
+            finish_task(claimed, ValueError('boom'))
+        self.assertEqual(QueuedTask.objects.get().status, QueuedTask.FAILED)
+        self.assertEqual(claim_tasks(1), [])
+
+    def test_expired_leases_are_requeued(self):
+        record.delay('a')
+        claim_tasks(1)
+        self.assertEqual(requeue_expired(), 0)
+        QueuedTask.objects.update(locked_until=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(requeue_expired(), 1)
+        self.assertEqual(claim_tasks(1)[0].attempts, 2)
+
+    def test_renewed_leases_are_not_requeued(self):
+        record.delay('a')
+        [claimed] = claim_tasks(1)
+        QueuedTask.objects.update(locked_until=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(renew_leases([claimed.id]), 1)
+        self.assertEqual(requeue_expired(), 0)
+
+
+@override_settings(TASK_QUEUE_EAGER=False)
+class TaskWorkerTests(TestCase):
+
+    def setUp(self):
+        calls.clear()
+
+    def run_worker(self):
+        stdout = StringIO()
+        call_command('run_task_worker', once=True, poll_interval=0, stdout=stdout)
+        return stdout.getvalue()
+
+    def test_the_worker_runs_the_due_tasks(self):
+        record.delay('a')
+        record.delay('b')
+        self.assertIn('Ran 2 tasks.', self.run_worker())
+        self.assertEqual(sorted(calls), ['a', 'b'])
+        self.assertFalse(QueuedTask.objects.exists())
+
+    @override_settings(TASK_QUEUE_LEASE=0.03)
+    def test_the_worker_renews_the_leases_of_long_tasks(self):
+        record.delay('a', pause=0.1)
+        with mock.patch(f'{WORKER}.renew_leases', wraps=renew_leases) as renew:
+            self.run_worker()
+        self.assertTrue(renew.called)
+        self.assertEqual(calls, ['a'])
+
+    def test_database_errors_are_logged_and_the_worker_goes_on(self):
+        record.delay('a')
+        failures = [OperationalError('gone')]
+
+        def flaky_claim(limit):
+            if failures:
+                raise failures.pop()
+            return claim_tasks(limit)
+
+        with mock.patch(f'{WORKER}.claim_tasks', flaky_claim), self.assertLogs(WORKER, 'ERROR') as logs:
+            output = self.run_worker()
+        self.assertIn('Task worker database error', logs.output[0])
+        self.assertIn('Ran 1 tasks.', output)
+        self.assertEqual(calls, ['a'])
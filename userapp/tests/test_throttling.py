@@ -0,0 +1,80 @@
+from unittest import mock
+
+from django.conf import settings
+from django.test import override_settings
+from django.urls import reverse
+
+from userapp.tests.base import UserAPITestCase, reset_process_state
+from userapp.throttling import LocalBucketStore, parse_rate, take_tokens
+
+
+RATES = {
+    'default': {'user': '3/m'},
+    'password_reset': {'ip': '2/h', 'global': '100/m'},
+    'login': {'ip': '100/m', 'global': '3/m'},
+}
+
+
+class TokenBucketTests(UserAPITestCase):
+    def test_parse_rate(self):
+        self.assertEqual(parse_rate('5/m'), (5, 5 / 60))
+        self.assertEqual(parse_rate('100/hour'), (100, 100 / 3600))
+
+    def test_buckets_refill_at_the_rate(self):
+        buckets = [('key',) + parse_rate('2/s')]
+        states = {}
+        for now in (0, 0):
+            wait, updated = take_tokens(states, buckets, now)
+            states.update(updated)
+        self.assertEqual(take_tokens(states, buckets, 0)[0], 0.5)
+        self.assertEqual(take_tokens(states, buckets, 0.5)[0], 0)
+
+    def test_rejected_requests_take_no_token(self):
+        buckets = [('open',) + parse_rate('10/s'), ('empty',) + parse_rate('1/s')]
+        states = {'empty': (0, 0, 1)}
+        wait, updated = take_tokens(states, buckets, 0)
+        self.assertEqual((wait, updated), (1, None))
+
+    def test_local_store_drops_full_buckets_when_too_big(self):
+        store = LocalBucketStore()
+        with override_settings(THROTTLE_LOCAL_MAX_ENTRIES=2), mock.patch('time.monotonic', return_value=0):
+            store.consume([('old',) + parse_rate('1/s')])
+            store.consume([('busy',) + parse_rate('1/h')])
+        with override_settings(THROTTLE_LOCAL_MAX_ENTRIES=2), mock.patch('time.monotonic', return_value=10):
+            store.consume([('new',) + parse_rate('1/h')])
+        self.assertEqual(set(store._states), {'busy', 'new'})
+
+
+@override_settings(THROTTLE_RATES=RATES)
+class ThrottledViewTests(UserAPITestCase):
+    def request_otp(self, **headers):
+        return self.client.post(reverse('forgot_password_request'), {'email': 'nobody@example.com'},
+                                format='json', **headers)
+
+    def test_per_ip_limit_with_retry_after(self):
+        for backend in ('local', 'cache'):
+            reset_process_state()
+            with self.subTest(backend=backend), override_settings(THROTTLE_BACKEND=backend):
+                self.assertEqual([self.request_otp().status_code for _ in range(3)], [400, 400, 429])
+                self.assertEqual(self.request_otp()['Retry-After'], '1800')
+                self.assertEqual(self.request_otp(REMOTE_ADDR='10.0.0.2').status_code, 400)
+
+    def test_spoofed_forwarded_for_does_not_get_a_new_bucket(self):
+        statuses = [self.request_otp(HTTP_X_FORWARDED_FOR=f'203.0.113.{index}').status_code for index in range(5)]
+        self.assertEqual(statuses, [400, 400, 429, 429, 429])
+
+    @override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'NUM_PROXIES': 1})
+    def test_forwarded_for_is_used_behind_a_trusted_proxy(self):
+        statuses = [self.request_otp(HTTP_X_FORWARDED_FOR=f'203.0.113.{index}').status_code for index in range(5)]
+        self.assertEqual(statuses, [400] * 5)
+
+    def test_global_limit_of_a_route(self):
+        statuses = [self.client.post(reverse('user_login'), {'email': 'nobody@example.com', 'password': 'x'},
+                                     format='json', REMOTE_ADDR=f'10.0.1.{index}').status_code for index in range(4)]
+        self.assertEqual(statuses, [401, 401, 401, 429])
+
+    def test_per_user_limit(self):
+        other_client = self.client_for(self.create_user('other@example.com'))
+        statuses = [self.client.get(reverse('user_profile_details')).status_code for _ in range(4)]
+        self.assertEqual(statuses, [200, 200, 200, 429])
+        self.assertEqual(other_client.get(reverse('user_profile_details')).status_code, 200)
@@ -0,0 +1,187 @@
+"""
+Request rate limiting with token buckets.
+
+Every view has a throttle scope, its `throttle_scope` attribute or 'default'. THROTTLE_RATES
+maps each scope to its limits, per dimension:
+
+- 'ip': one bucket per client IP (see BaseThrottle.get_ident): REMOTE_ADDR, or the address
+  X-Forwarded-For got from the outermost of REST_FRAMEWORK['NUM_PROXIES'] trusted proxies,
+- 'user': one bucket per authenticated user id, anonymous requests are not counted,
+- 'global': one bucket for the whole scope, whoever makes the request.
+
+A rate of 'N/period' (period: s, m, h or d) is a bucket of N tokens refilled at N per period:
+bursts of up to N requests go through, then requests are let through at the refill rate.
+A request takes a token from each of its buckets, only if every one of them has a token left;
+otherwise it is rejected with 429 Too Many Requests and a Retry-After header with the time
+until the buckets that are empty have a token again.
+
+The buckets live in one of two stores, chosen by THROTTLE_BACKEND:
+
+- 'local': a dict in the process, updated without locks. Every bucket is read, then replaced
+  as a whole tuple, so concurrent threads never see a half-updated bucket; two threads taking
+  a token from the same bucket at the same instant may both get it, the limits can be exceeded
+  by at most the number of threads. The limits hold per process: with N workers a client gets
+  up to N times the rate.
+- 'cache': the THROTTLE_CACHE_ALIAS cache, one get_many and one set_many per request. With a
+  cache shared by the workers (Redis, Memcached...) the limits hold for the whole deployment,
+  within the same read-then-write race between concurrent requests.
+"""
+import math
+import time
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework.throttling import BaseThrottle
+
+
+DEFAULT_RATES = {
+    'default': {'user': '600/m', 'ip': '3000/m'},
+}
+
+PERIODS = {'s': 1, 'm': 60, 'h': 60 * 60, 'd': 24 * 60 * 60}
+
+DIMENSIONS = ('ip', 'user', 'global')
+
+
+@lru_cache(maxsize=None)
+def parse_rate(rate):
+    """Returns the (capacity, tokens refilled per second) of a rate such as '5/m' or '100/hour'."""
+    try:
+        count, period = rate.split('/')
+        capacity = int(count)
+        duration = PERIODS[period.strip()[0]]
+    except (ValueError, KeyError, IndexError):
+        raise ImproperlyConfigured(f'Invalid throttle rate {rate!r}, expected "N/s", "N/m", "N/h" or "N/d".')
+    if capacity < 1:
+        raise ImproperlyConfigured(f'Invalid throttle rate {rate!r}, at least one request must be allowed.')
+    return capacity, capacity / duration
+
+
+def take_tokens(states, buckets, now):
+    """
+    Takes a token from each of `buckets`, (key, capacity, refill rate) tuples, whose current
+    (tokens, updated at, full at) states are in `states` (missing buckets are full).
+    Returns (0, new states) if every bucket had a token, (seconds to wait, None) otherwise.
+    """
+    wait = 0.0
+    updated = {}
+    for key, capacity, rate in buckets:
+        state = states.get(key)
+        tokens = capacity if state is None else min(capacity, state[0] + (now - state[1]) * rate)
+        if tokens < 1:
+            wait = max(wait, (1 - tokens) / rate)
+        elif not wait:
+            tokens -= 1
+            updated[key] = (tokens, now, now + (capacity - tokens) / rate)
+    if wait:
+        return wait, None
+    return 0, updated
+
+
+class LocalBucketStore:
+    """
+    The buckets of this process, in a dict. Full buckets are dropped once the dict holds more
+    than THROTTLE_LOCAL_MAX_ENTRIES buckets; if they all are in use, the dict is emptied.
+    """
+
+    def __init__(self):
+        self._states = {}
+
+    @property
+    def max_entries(self):
+        return getattr(settings, 'THROTTLE_LOCAL_MAX_ENTRIES', 100_000)
+
+    def consume(self, buckets):
+        now = time.monotonic()
+        wait, updated = take_tokens(self._states, buckets, now)
+        if updated:
+            self._states.update(updated)
+            if len(self._states) > self.max_entries:
+                self._prune(now)
+        return wait
+
+    def _prune(self, now):
+        # list() copies the items without running Python code, no other thread changes the dict meanwhile
+        for key, state in list(self._states.items()):
+            if state[2] <= now:
+                self._states.pop(key, None)
+        if len(self._states) > self.max_entries:
+            self._states.clear()
+
+    def clear(self):
+        self._states.clear()
+
+
+class CacheBucketStore:
+    """The buckets in a Django cache, shared by every process using the same cache."""
+
+    key_prefix = 'userapp:throttle:'
+
+    @property
+    def cache(self):
+        return caches[getattr(settings, 'THROTTLE_CACHE_ALIAS', 'default')]
+
+    def consume(self, buckets):
+        # Wall clock time: the buckets are shared with other processes and machines
+        now = time.time()
+        cache = self.cache
+        prefix = self.key_prefix
+        buckets = [(prefix + key, capacity, rate) for key, capacity, rate in buckets]
+        wait, updated = take_tokens(cache.get_many([key for key, _, _ in buckets]), buckets, now)
+        if updated:
+            # A bucket left alone until it is full again is the same as no bucket
+            cache.set_many(updated, timeout=math.ceil(max(state[2] for state in updated.values()) - now) + 1)
+        return wait
+
+
+_stores = {'local': LocalBucketStore(), 'cache': CacheBucketStore()}
+
+
+def get_store():
+    backend = getattr(settings, 'THROTTLE_BACKEND', 'local')
+    try:
+        return _stores[backend]
+    except KeyError:
+        raise ImproperlyConfigured(f'Unknown THROTTLE_BACKEND {backend!r}, expected one of {sorted(_stores)}.')
+
+
+def get_rates(scope):
+    return getattr(settings, 'THROTTLE_RATES', DEFAULT_RATES).get(scope)
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    Throttles a view with the THROTTLE_RATES of its `throttle_scope` ('default' if it has none).
+    Scopes with no rates are not throttled.
+    """
+
+    def __init__(self):
+        self._wait = 0
+
+    def allow_request(self, request, view):
+        scope = getattr(view, 'throttle_scope', 'default')
+        limits = get_rates(scope)
+        if not limits:
+            return True
+        buckets = []
+        for dimension, rate in limits.items():
+            if dimension == 'ip':
+                ident = self.get_ident(request)
+            elif dimension == 'user':
+                ident = request.user.id if request.user.is_authenticated else None
+            elif dimension == 'global':
+                ident = ''
+            else:
+                raise ImproperlyConfigured(f'Unknown throttle dimension {dimension!r} in scope {scope!r}, '
+                                           f'expected one of {DIMENSIONS}.')
+            if ident is None:
+                continue
+            capacity, refill = parse_rate(rate)
+            buckets.append((f'{scope}:{dimension}:{ident}', capacity, refill))
+        self._wait = get_store().consume(buckets)
+        return not self._wait
+
+    def wait(self):
+        return self._wait
@@ -1,8 +1,19 @@
+from django.conf import settings
 from django.urls import path
-from rest_framework_simplejwt.views import (TokenObtainPairView, TokenRefreshView)
 
-from .views import (UserRegistrationView, UserProfileView, UserOnBoardingView, DeleteUserTopicsView, GetUserSpecificTopics,
-                    UpdateUserProfileView, UserAddYourOwnLessonView, GetAllUserSpecificCustomLesson)
+from .views import (UserRegistrationView, CustomTokenObtainPairView, CustomTokenRefreshView, LogoutView, LogoutAllView,
+                    ForgotPasswordEmailRequestView, ForgotPasswordEmailConfirmationView, UserProfileView, UserOnBoardingView, DeleteUserTopicsView, GetUserSpecificTopics,
+                    GetTopicLearnersView, TopTopicsView, TopLessonNamesView, DeleteAccountView, UserDataExportView, AllUsersDataExportView, UpdateUserProfileView, UserAddYourOwnLessonView, GetAllUserSpecificCustomLesson,
+                    UserCustomLessonBatchView, GetUserContentChangesView)
+from .async_views import (AsyncCustomTokenObtainPairView, AsyncUserProfileView, AsyncGetUserSpecificTopics, AsyncDeleteUserTopicsView,
+                          AsyncUserAddYourOwnLessonView, AsyncGetAllUserSpecificCustomLesson)
+
+
+def view_for(name, sync_view, async_view):
+    """Serves the route `name` with the async view if it is listed in settings.USERAPP_ASYNC_ROUTES."""
+    if name in getattr(settings, 'USERAPP_ASYNC_ROUTES', ()):
+        return async_view.as_view()
+    return sync_view.as_view()
 
 
 urlpatterns = [
@@ -13,43 +24,63 @@ urlpatterns = [
 
     # LOGIN
     # API to refresh the JWT token
-    path('login/refresh-token', TokenRefreshView.as_view(), name='token_refresh'),
+    path('login/refresh-token', CustomTokenRefreshView.as_view(), name='token_refresh'),
     # API to log in the user using simple-JWT
-    path('login', TokenObtainPairView.as_view(), name='user_login'),
+    path('login', view_for('user_login', CustomTokenObtainPairView, AsyncCustomTokenObtainPairView), name='user_login'),
+    # API to revoke the tokens of the current session
+    path('logout', LogoutView.as_view(), name='user_logout'),
+    # API to revoke every token of the user
+    path('logout-all', LogoutAllView.as_view(), name='user_logout_all'),
+
+    # FORGOT PASSWORD
+    # API to email a one-time code to the user
+    path('forgot-password/request-otp', ForgotPasswordEmailRequestView.as_view(), name='forgot_password_request'),
+    # API to set a new password with the emailed code
+    path('forgot-password/confirm', ForgotPasswordEmailConfirmationView.as_view(), name='forgot_password_confirm'),
 
 
     # TOPICS
     # API to retrieve all the learning topics selected by the user 
-    path('retrieve/specific-user-all-learning-topics', GetUserSpecificTopics.as_view(), name='user_specific_topic'),
+    path('retrieve/specific-user-all-learning-topics', view_for('user_specific_topic', GetUserSpecificTopics, AsyncGetUserSpecificTopics), name='user_specific_topic'),
     # API to delete a specific learning topic selected by the user
-    path('delete/user-learning-topic/<topic_id>', DeleteUserTopicsView.as_view(), name='delete_user_topic'),
+    path('delete/user-learning-topic/<topic_id>', view_for('delete_user_topic', DeleteUserTopicsView, AsyncDeleteUserTopicsView), name='delete_user_topic'),
     # To update user details during onboarding, including profile image and gender
     path('user/onboarding-details', UserOnBoardingView.as_view(), name='user_onboarding'),
+    # API for admins to list the users learning a topic of the catalog
+    path('retrieve/topic-learners/<slug>', GetTopicLearnersView.as_view(), name='topic_learners'),
+    # APIs for admins to list the topics with the most learners and the most common custom lesson names
+    path('analytics/top-topics', TopTopicsView.as_view(), name='top_topics'),
+    path('analytics/top-lesson-names', TopLessonNamesView.as_view(), name='top_lesson_names'),
 
     #PROFILE
     # API to allow authenticated users to update their profile information
     path('update/user-profile', UpdateUserProfileView.as_view(), name='user_profile_updation'),
+    # API to delete the user's account
+    path('user/delete-account', DeleteAccountView.as_view(), name='user_delete_account'),
+    # API to download the user's profile, topics and lessons
+    path('user/export', UserDataExportView.as_view(), name='user_data_export'),
+    # API for admins to download the data of every user
+    path('export/all-users', AllUsersDataExportView.as_view(), name='all_users_data_export'),
     # API to get the user's profile details
-    path('user/profile/details', UserProfileView.as_view(), name='user_profile_details'),
+    path('user/profile/details', view_for('user_profile_details', UserProfileView, AsyncUserProfileView), name='user_profile_details'),
 
 
     
 
     #CUSTOM USER LESSON
     # To create a custom lesson for the user
-    path('user/add-custom-lesson', UserAddYourOwnLessonView.as_view(), name='user_add_custom_lesson'),
+    path('user/add-custom-lesson', view_for('user_add_custom_lesson', UserAddYourOwnLessonView, AsyncUserAddYourOwnLessonView), name='user_add_custom_lesson'),
     # To delete a specific custom lesson created by the user
-    path('user/delete-custom-lesson/<user_lesson_id>', UserAddYourOwnLessonView.as_view(), name='user_delete_custom_lesson'),
+    path('user/delete-custom-lesson/<user_lesson_id>', view_for('user_delete_custom_lesson', UserAddYourOwnLessonView, AsyncUserAddYourOwnLessonView), name='user_delete_custom_lesson'),
+    # To create, rename and delete several custom lessons of the user in one request
+    path('user/custom-lessons/batch', UserCustomLessonBatchView.as_view(), name='user_custom_lessons_batch'),
     # To get all custom lessons created by a specific user
-    path('user/get-custom-lessons', GetAllUserSpecificCustomLesson.as_view(), name='get_custom_lessons_of_user'),
+    path('user/get-custom-lessons', view_for('get_custom_lessons_of_user', GetAllUserSpecificCustomLesson, AsyncGetAllUserSpecificCustomLesson), name='get_custom_lessons_of_user'),
  
 
     #Above api checked and written in the Doc
 
-
-
+    # SYNC
+    # To get the changes to the user's topics and custom lessons since a sync token
+    path('user/sync/changes', GetUserContentChangesView.as_view(), name='user_content_changes'),
 ]
-
-
-
-
@@ -1,14 +1,39 @@
 from rest_framework.permissions import IsAuthenticated, IsAdminUser, AllowAny
-from rest_framework_simplejwt.views import TokenObtainPairView
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
+from django.conf import settings
 from django.contrib.auth.hashers import check_password
+from django.db import IntegrityError, transaction
+from django.db import router
+from django.http import HttpResponse, StreamingHttpResponse
 from rest_framework.response import Response
 from rest_framework import status, generics
 from rest_framework.views import APIView
-import random
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.throttling import BaseThrottle
+import logging
 
-from .serializers import (UserDetailsSerializer, CustomTokenObtainPairSerializer, UserLearningTopicSerializer,
-                           UserCreatedLessonsSerializer)
-from userapp.models import (UserDetails, UserLearningTopic, UserCreatedLessons)
+from .serializers import (UserProfileUpdateSerializer, CustomTokenObtainPairSerializer, RevocationCheckingTokenRefreshSerializer, UserLearningTopicSerializer,
+                           UserCreatedLessonsSerializer, UserRegistrationSerializer, registration_conflict_message)
+from userapp.models import (UserDetails, Topic, UserLearningTopic, UserCreatedLessons)
+from userapp.onboarding import ONBOARDING_MODES, clean_topics, save_onboarding
+from userapp.lesson_batch import apply_lesson_batch, clean_lesson_name
+from userapp.sync import get_changes
+from userapp.analytics import top_lesson_names, top_topics
+from userapp.pagination import KeysetPagination
+from userapp.etags import content_etag, etag_matches
+from userapp.profile_cache import get_profile_json
+from userapp.images import store_profile_image, schedule_profile_image_processing
+from userapp import login_guard, otp
+from userapp.revocation import revoke_token, revoke_user_tokens
+from userapp.purge import purge_account, request_purge
+from userapp.export import CONTENT_TYPES, EXPORT_FORMATS, stream_export
+from userapp.outbox import send_email
+from iveye_backend.metrics import serializer_timer
+
+
+logger = logging.getLogger(__name__)
 
 
 
@@ -25,39 +50,42 @@ class UserRegistrationView(APIView):
 
     Functionality:
     - Validates that the required fields are provided and not left blank.
-    - Checks if an account already exists with the provided email or phone number.
-    - If validation passes, creates a new user account and returns a success message.
+    - Creates the account without looking for duplicates first: an existing account with the same
+      email or phone number is detected from the database's unique constraints, not with extra queries.
+      The same transaction also inserts the search terms of the user (see userapp.signals) and the
+      queued welcome email.
     - Returns appropriate error messages if validation fails or if an account already exists.
+    - Queues a welcome email, sent by the background task worker.
+    - Rate limited per IP and overall (throttle scope 'register', see userapp.throttling).
     """
 
     permission_classes = [AllowAny]
+    throttle_scope = 'register'
 
     def post(self, request):
         # The required fields should not be blank and should be validated on the frontend as well.
-        print('In the registration View ')
-        data = request.data
-        email = request.data.get('email')
-        phone_number = request.data.get('phone_number')
-
-        # Check if a user with the same email already exists
-        if UserDetails.objects.filter(email=email).exists():
-            return Response({'message': "An account already exists with this email id"},
-                            status=status.HTTP_400_BAD_REQUEST)
-        
-        # Check if a user with the same phone number already exists
-        if UserDetails.objects.filter(phone_number=phone_number).exists():
-            return Response({'message': "An account already exists with this phone number"},
-                            status=status.HTTP_400_BAD_REQUEST)
-        
         # Serialize and validate the provided data
-        serialized_data = UserDetailsSerializer(data=data)
-        if serialized_data.is_valid():
-            serialized_data.save()
-            return Response({'message': "Account created successfully"},
-                            status=status.HTTP_201_CREATED)
-        else:
+        serialized_data = UserRegistrationSerializer(data=request.data)
+        with serializer_timer():
+            is_valid = serialized_data.is_valid()
+        if not is_valid:
             return Response({'message': "Please check the entered details", "errors": serialized_data.errors},
                             status=status.HTTP_400_BAD_REQUEST)
+        try:
+            with transaction.atomic():
+                user = serialized_data.save()
+                send_email('Welcome to Iveye', f'Hi {user.first_name or user.email}, your Iveye account is ready.',
+                           [user.email])
+        except IntegrityError as e:
+            message = registration_conflict_message(e)
+            if message is None:
+                raise
+            logger.info('Registration rejected', extra={'reason': 'duplicate_account'})
+            return Response({'message': message},
+                            status=status.HTTP_400_BAD_REQUEST)
+        logger.info('User registered', extra={'user_id': user.id})
+        return Response({'message': "Account created successfully"},
+                        status=status.HTTP_201_CREATED)
 
 
 class CustomTokenObtainPairView(TokenObtainPairView):
@@ -68,65 +96,162 @@ class CustomTokenObtainPairView(TokenObtainPairView):
 
     Methods:
     - POST: Authenticates the user with provided credentials and returns a pair of JWT tokens (access and refresh) if successful.
+            Returns 429 Too Many Requests, before checking the password, if the client IP had too many
+            failed logins recently, for the account or overall (see userapp.login_guard).
+            Rate limited per IP and overall (throttle scope 'login', see userapp.throttling).
     """
 
     serializer_class = CustomTokenObtainPairSerializer
+    throttle_scope = 'login'
+
+    def post(self, request, *args, **kwargs):
+        email = request.data.get('email')
+        # REMOTE_ADDR, X-Forwarded-For is only trusted behind REST_FRAMEWORK['NUM_PROXIES'] proxies
+        ip = BaseThrottle().get_ident(request)
+        retry_after = login_guard.blocked_for(email, ip)
+        if retry_after:
+            return Response({'message': 'Too many failed login attempts, please try again later.'}
+                            , status=status.HTTP_429_TOO_MANY_REQUESTS, headers={'Retry-After': str(retry_after)})
+        try:
+            response = super().post(request, *args, **kwargs)
+        except AuthenticationFailed:
+            login_guard.record_failure(email, ip)
+            raise
+        login_guard.record_success(email, ip)
+        return response
+
+
+class CustomTokenRefreshView(TokenRefreshView):
+    """
+    This view returns a new access token for a refresh token, unless the refresh token was revoked
+    by a logout (see userapp.revocation).
+    """
+
+    serializer_class = RevocationCheckingTokenRefreshSerializer
+
+
+class LogoutView(APIView):
+    """
+    This view logs the user out of the current session.
+
+    Authentication:
+    - Requires the user to be authenticated (IsAuthenticated).
+
+    Methods:
+    - POST: Revokes the access token of the request and, when given, the `refresh` token of the session.
+            Returns 400 Bad Request if the refresh token is invalid or belongs to another user.
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        refresh = request.data.get('refresh')
+        if refresh:
+            try:
+                refresh = RefreshToken(refresh)
+            except TokenError:
+                return Response({'message': 'Invalid refresh token'}
+                                , status=status.HTTP_400_BAD_REQUEST)
+            if refresh.get('user_id') != request.user.id:
+                return Response({'message': 'Invalid refresh token'}
+                                , status=status.HTTP_400_BAD_REQUEST)
+            revoke_token(refresh)
+        revoke_token(request.auth)
+        return Response({'message': 'Logged out successfully'}
+                        , status=status.HTTP_200_OK)
+
+
+class LogoutAllView(APIView):
+    """
+    This view logs the user out everywhere.
+
+    Authentication:
+    - Requires the user to be authenticated (IsAuthenticated).
+
+    Methods:
+    - POST: Revokes every access and refresh token issued to the user so far, including the one of the request.
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        revoke_user_tokens(request.user.id)
+        return Response({'message': 'Logged out from all devices successfully'}
+                        , status=status.HTTP_200_OK)
 
 
 #Incomplete : email
 class ForgotPasswordEmailRequestView(APIView):
     """
     This is used to check whether the user entered email exists
-    and also  generate an OTP to the email.
+    and also generate an OTP to the email.
+
+    Methods:
+    - POST: Takes the `email` of the account.
+            Emails a one-time code (see userapp.otp) and returns as soon as the email is queued.
+            Returns 400 Bad Request if no account has the email.
+            Returns 429 Too Many Requests, with Retry-After, if codes were requested too often for the email.
+            Rate limited per IP and overall (throttle scope 'password_reset', see userapp.throttling).
     """
-    
+
+    permission_classes = [AllowAny]
+    throttle_scope = 'password_reset'
+
     def post(self, request):
         email = request.data.get('email')
 
         #Confirming that there is an account registred with entred email
-        if UserDetails.objects.filter(email = email). exists():
-            
-            #activating the email smtp to generate the OTP
-            #1.Storing the OTP as a Data in DB
-            #2.UsingFirebase to generate OTP
-
-            #1. Manual
-            otp = random.randint(10001, 9999)
-            UserDetails.objects.filter(email=email).update(otp=otp)
-            #activating the SMTP by sending the OTP saved in the DB
-
-            return Response({'message': 'OTP sent successfully to your email'}
-                            , status=status.HTTP_200_OK)
-        else :
+        if not email or not UserDetails.objects.filter(email=email).exists():
             return Response({'message': 'Email does not exists. Enter a vaild email id.'}
                             , status=status.HTTP_400_BAD_REQUEST)
+        try:
+            entry = otp.issue_code(email)
+        except otp.OTPRateLimited as e:
+            return Response({'message': 'Too many OTP requests. Please try again later.'}
+                            , status=status.HTTP_429_TOO_MANY_REQUESTS, headers={'Retry-After': str(e.retry_after)})
+
+        otp.send_code(entry)
+        return Response({'message': 'OTP sent successfully to your email'}
+                        , status=status.HTTP_200_OK)
 
 
-class ForgotPasswordEmailConfirmationView(APIView):  
+class ForgotPasswordEmailConfirmationView(APIView):
     """
     This view is used to change the password if the OTP entered by the user is correct.
+
     Methods:
-    - Post
+    - POST: Takes the `email`, the `otp` that was emailed and the `new_password`.
+            Returns 200 OK once the password is changed and every token issued to the user so far is revoked;
+            the code can not be used again.
+            Returns 400 Bad Request if a field is missing or the code is wrong, expired or used up.
+            Shares the 'password_reset' rate limits with the code requests.
     """
 
+    permission_classes = [AllowAny]
+    throttle_scope = 'password_reset'
+
     def post(self, request):
-        email = request.user.email
+        email = request.data.get('email')
+        code = request.data.get('otp')
         new_password = request.data.get('new_password')
-        try :
-            user = UserDetails.objects.get(email=email,otp=otp)
-            user.set_password(new_password)
-            user.save()
-            otp = random.randint(1001,9999)
-            UserDetails.objects.filter(email=email).update(otp=otp)
-            return Response({'message' : 'Password changed successfully'
-                            },
-                            status=status.HTTP_200_OK)
-        except UserDetails.DoesNotExist:
+        if not email or not code or not new_password:
+            return Response({'message': 'Email, OTP and new password are required'}
+                            , status=status.HTTP_400_BAD_REQUEST)
+        if not otp.verify_code(email, code):
             return Response({'message': 'In valid OTP'}
                             , status=status.HTTP_400_BAD_REQUEST)
-        except Exception as e:
-            return Response({'message': 'Something when wrong'}
+        try:
+            user = UserDetails.objects.get(email=email)
+        except UserDetails.DoesNotExist:
+            return Response({'message': 'In valid OTP'}
                             , status=status.HTTP_400_BAD_REQUEST)
+        user.set_password(new_password)
+        user.save(update_fields=['password'])
+        # Whoever knew the old password may hold tokens, log every device out
+        revoke_user_tokens(user.id)
+        return Response({'message' : 'Password changed successfully'
+                        },
+                        status=status.HTTP_200_OK)
 
 
 class UserProfileView(APIView):
@@ -138,6 +263,7 @@ class UserProfileView(APIView):
 
     Methods:
     - GET: Fetches the profile details of the authenticated user. Returns a 200 OK status with the user's data if found.
+      The rendered profile is cached (see userapp.profile_cache), so a cache hit skips the database and the serializer.
     - If the user does not exist, returns a 404 Not Found status with an error message.
     """
 
@@ -145,9 +271,7 @@ class UserProfileView(APIView):
 
     def get(self, request):
         try:
-            user_data = UserDetails.objects.get(id=request.user.id)
-            serialized_data = UserDetailsSerializer(user_data)
-            return Response(serialized_data.data, status=status.HTTP_200_OK)
+            return HttpResponse(get_profile_json(request.user.id), content_type='application/json')
         except UserDetails.DoesNotExist:
             return Response({'message': 'User does not exist', 'error': 'User data not found'}
                             , status=status.HTTP_404_NOT_FOUND)
@@ -158,60 +282,105 @@ class UserOnBoardingView(APIView):
     This view handles user onboarding by updating user details, including
     their profile image and gender, and saving selected learning topics.
 
+    Request Data:
+    - `topics` (list): The topics selected by the user. Duplicates and topics the user already has are ignored.
+    - `profile_image` (file, optional), `gender` (str, optional)
+    - `mode` (str, optional): 'append' (default) adds the topics to the existing ones,
+      'replace' makes the given list the user's complete topic set.
+
     Methods:
-    - POST: Updates user details and saves the selected topics.
+    - POST: Updates user details and saves the selected topics in a single transaction.
     """
 
     def post(self, request):
-        email = request.user.email
         topics = request.data.get('topics')
+        if hasattr(request.data, 'getlist'):
+            # Multipart requests, needed to upload the image, send the topics as repeated fields
+            topics = request.data.getlist('topics')
         image = request.FILES.get('profile_image')
         gender = request.data.get('gender')
+        mode = request.data.get('mode', 'append')
         
         # Validate 'topics' to be a list
         if not isinstance(topics, list):
             return Response({'message': 'Invalid topics format, expected a list.'}
                             , status=status.HTTP_400_BAD_REQUEST)
+        if mode not in ONBOARDING_MODES:
+            return Response({'message': "Invalid mode, expected 'append' or 'replace'."}
+                            , status=status.HTTP_400_BAD_REQUEST)
+        try:
+            topics = clean_topics(topics)
+            # Staged outside the transaction, the image is processed after it commits
+            image = store_profile_image(image) if image else None
+        except ValueError as e:
+            return Response({'message': str(e)}
+                            , status=status.HTTP_400_BAD_REQUEST)
         try:
-            user = UserDetails.objects.get(email= email)
+            user = UserDetails.objects.get(id=request.user.id)
+            added, removed = save_onboarding(user, topics, image=image, gender=gender, mode=mode)
             if image:
-                user.profile_image = image
-            if gender:
-                user.gender = gender
-            user.save()
-            for topic in topics:
-                UserLearningTopic.objects.create(user = user, topic = topic)
-            return Response({'message' : 'Your onboarding has been completed successfully.'}
+                schedule_profile_image_processing(image)
+            return Response({'message' : 'Your onboarding has been completed successfully.',
+                             'topics_added': added, 'topics_removed': removed}
                         , status=status.HTTP_200_OK)
         except UserDetails.DoesNotExist:
             return Response({'message': 'User data not found',}
                         , status=status.HTTP_404_NOT_FOUND)
 
 
-class GetUserSpecificTopics(APIView):
+class UserContentListView(APIView):
+    """
+    Base view of the per-user listings (topics and custom lessons).
+
+    - Responses are cursor paginated on the primary key (see KeysetPagination).
+    - Every response carries a weak ETag derived from the user's `content_version`.
+      A request whose If-None-Match matches it gets a 304 Not Modified without
+      reading the listed rows.
+
+    Subclasses set `listing` and `serializer_class` and implement `get_queryset`.
+    """
+
+    permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
+    listing = None
+    serializer_class = None
+
+    def get_queryset(self):
+        raise NotImplementedError
+
+    def get(self, request):
+        version = UserDetails.objects.get_content_version(request.user.id)
+        etag = content_etag(request, self.listing, version)
+        if etag_matches(request, etag):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+
+        paginator = self.pagination_class()
+        page = paginator.paginate_queryset(self.get_queryset(), request, view=self)
+        with serializer_timer():
+            data = self.serializer_class(page, many=True).data
+        response = paginator.get_paginated_response(data)
+        response['ETag'] = etag
+        return response
+
+
+class GetUserSpecificTopics(UserContentListView):
     """
-    This view retrieves the all the topics selected by the authenticated user.
+    This view retrieves the topics selected by the authenticated user, one page at a time.
 
     Authentication:
     - Requires the user to be authenticated (IsAuthenticated).
 
     Method:
-    - GET: Fetches the topics selected by the user based on their email.
-           Returns a success response with the serialized data if found.
-           Returns an error response if no topics are found for the user.
+    - GET: Fetches a page of the topics selected by the user.
+           Returns `results` with the serialized topics and the `next_cursor` of the following page.
+           Returns 304 Not Modified if If-None-Match matches the current ETag.
     """
 
-    permission_classes = [IsAuthenticated]
+    listing = 'topics'
+    serializer_class = UserLearningTopicSerializer
 
-    def get(self, request):
-        email = request.user.email
-        try:
-            data =UserLearningTopic.objects.filter(user__email = email)
-            serialized_data = UserLearningTopicSerializer(data, many = True)
-            return Response(serialized_data.data, status=status.HTTP_200_OK)
-        except UserLearningTopic.DoesNotExist:
-            return Response({"message": "No topics found for the user"}
-                            , status=status.HTTP_404_NOT_FOUND)
+    def get_queryset(self):
+        return UserLearningTopic.objects.filter(user_id=self.request.user.id).select_related('topic')
 
 
 class DeleteUserTopicsView(APIView):
@@ -222,22 +391,186 @@ class DeleteUserTopicsView(APIView):
     - Requires the user to be authenticated (IsAuthenticated).
     
     Method:
-    - PATCH: Deletes the topic with the given `topic_id` if it exists.
+    - DELETE: Deletes the user's topic with the given `topic_id` (the `id` returned by
+              GetUserSpecificTopics) if it exists.
              Returns a success message if the topic is deleted.
-             Returns an error message if the topic does not exist.
+             Returns an error message if the topic does not exist or belongs to another user.
     """
 
     permission_classes = [IsAuthenticated]
 
     def delete(self, request, topic_id):
-        try:
-            topic = UserLearningTopic.objects.get(id=topic_id)
-            topic.delete()
+        if UserLearningTopic.objects.filter(id=topic_id, user_id=request.user.id).tombstone(request.user.id):
             return Response({'message': 'Topic deleted successfully'}
                             , status=status.HTTP_200_OK)
-        except UserLearningTopic.DoesNotExist:
-            return Response({"message": "Action can't be completed"}
+        return Response({"message": "Action can't be completed"}
+                        , status=status.HTTP_400_BAD_REQUEST)
+
+
+class GetTopicLearnersView(APIView):
+    """
+    This view lists the users who selected a given topic.
+
+    Authentication:
+    - Requires an admin user (IsAdminUser).
+
+    Method:
+    - GET: Returns the topic and the ids of the users learning it, looked up by the topic `slug`.
+           The user ids are read from the (topic, user) index alone, without touching the table.
+           Returns a 404 error if the topic is not in the catalog.
+    """
+
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, slug):
+        try:
+            topic = Topic.objects.get(slug=slug)
+        except Topic.DoesNotExist:
+            return Response({"message": "Topic not found"}
+                            , status=status.HTTP_404_NOT_FOUND)
+        user_ids = (UserLearningTopic.objects.filter(topic_id=topic.id)
+                    .order_by('user_id').values_list('user_id', flat=True))
+        return Response({'topic': topic.name, 'slug': topic.slug, 'user_ids': list(user_ids)}
+                        , status=status.HTTP_200_OK)
+
+
+class PopularityView(APIView):
+    """
+    Base class of the admin views listing the most popular topics or lesson names.
+
+    Authentication:
+    - Requires an admin user (IsAdminUser).
+
+    Methods:
+    - GET: Returns the `limit` (default 10, at most ANALYTICS_TOP_MAX) most popular items, read from
+           the counters of userapp/analytics.py: a scan of the top of an index, not an aggregate.
+           Returns a 400 error if `limit` is not a positive integer.
+    """
+
+    permission_classes = [IsAdminUser]
+    items_key = None
+
+    def get_items(self, limit):
+        raise NotImplementedError
+
+    def get(self, request):
+        limit = request.GET.get('limit', '10')
+        if not limit.isdigit() or int(limit) < 1:
+            return Response({"message": "'limit' must be a positive integer"}
+                            , status=status.HTTP_400_BAD_REQUEST)
+        limit = min(int(limit), getattr(settings, 'ANALYTICS_TOP_MAX', 100))
+        return Response({self.items_key: self.get_items(limit)}
+                        , status=status.HTTP_200_OK)
+
+
+class TopTopicsView(PopularityView):
+    """Lists the topics with the most learners, with their `name`, `slug` and `learner_count`."""
+
+    items_key = 'topics'
+
+    def get_items(self, limit):
+        return top_topics(limit)
+
+
+class TopLessonNamesView(PopularityView):
+    """Lists the most common custom lesson names (normalized), with their `name` and `lesson_count`."""
+
+    items_key = 'lesson_names'
+
+    def get_items(self, limit):
+        return top_lesson_names(limit)
+
+
+class DeleteAccountView(APIView):
+    """
+    This view deletes the account of the authenticated user.
+
+    Authentication:
+    - Requires the user to be authenticated (IsAuthenticated).
+
+    Methods:
+    - DELETE: Takes the user's `password` to confirm the deletion.
+              The account is deactivated and all its tokens are revoked right away; the account and
+              its topics and lessons are deleted in the background (see userapp/purge.py).
+              Returns 202 Accepted, or a 400 error if the password is wrong.
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def delete(self, request):
+        try:
+            user = UserDetails.objects.get(id=request.user.id)
+        except UserDetails.DoesNotExist:
+            return Response({"message": "User not found"}
+                            , status=status.HTTP_404_NOT_FOUND)
+        if not user.check_password(request.data.get('password') or ''):
+            return Response({"message": "Invalid password"}
+                            , status=status.HTTP_400_BAD_REQUEST)
+        with transaction.atomic():
+            request_purge([user.id])
+            purge_account.delay(user.id)
+        logger.info('Account deletion requested', extra={'user_id': user.id})
+        return Response({'message': 'Your account will be deleted shortly'}
+                        , status=status.HTTP_202_ACCEPTED)
+
+
+class DataExportView(APIView):
+    """
+    Base class of the data export views.
+
+    Methods:
+    - GET: Streams the export as NDJSON (`file_format=ndjson`, default) or as a zip of NDJSON files
+           (`file_format=zip`), see userapp/export.py. The rows are read and sent in chunks, so the
+           export never has to fit in memory. Returns a 400 error for any other format.
+           (`format` is taken by DRF's content negotiation.)
+    """
+
+    filename = 'export'
+
+    def get_user_id(self, request):
+        raise NotImplementedError
+
+    def get(self, request):
+        export_format = request.GET.get('file_format', 'ndjson')
+        if export_format not in EXPORT_FORMATS:
+            return Response({"message": "Invalid format, expected 'ndjson' or 'zip'."}
                             , status=status.HTTP_400_BAD_REQUEST)
+        # Picked now: the rows are read after the view returned, outside of the replica routing
+        using = router.db_for_read(UserDetails)
+        response = StreamingHttpResponse(stream_export(export_format, self.get_user_id(request), using=using)
+                                         , content_type=CONTENT_TYPES[export_format])
+        response['Content-Disposition'] = f'attachment; filename="{self.filename}.{export_format}"'
+        return response
+
+
+class UserDataExportView(DataExportView):
+    """
+    This view exports the profile, topics and custom lessons of the authenticated user.
+
+    Authentication:
+    - Requires the user to be authenticated (IsAuthenticated).
+    """
+
+    permission_classes = [IsAuthenticated]
+    filename = 'my-data'
+
+    def get_user_id(self, request):
+        return request.user.id
+
+
+class AllUsersDataExportView(DataExportView):
+    """
+    This view exports the profiles, topics and custom lessons of every user.
+
+    Authentication:
+    - Requires an admin user (IsAdminUser).
+    """
+
+    permission_classes = [IsAdminUser]
+    filename = 'all-users'
+
+    def get_user_id(self, request):
+        return None
 
 
 class UpdateUserProfileView(APIView):
@@ -248,7 +581,8 @@ class UpdateUserProfileView(APIView):
     - Requires the user to be authenticated (IsAuthenticated).
 
     Method:
-    - PATCH: Updates the user's profile with the provided data.
+    - PATCH: Updates the user's `first_name`, `last_name`, `phone_number`, `gender` and
+             `profile_image`; any other field, such as the password or is_staff, is ignored.
              Returns a success message if the profile is updated.
              Returns an error message if the update fails due to invalid data.
     """
@@ -256,12 +590,23 @@ class UpdateUserProfileView(APIView):
     permission_classes = [IsAuthenticated]
 
     def patch(self, request):
-        email = request.user.email
+        # The image goes through the image pipeline instead of the serializer
+        image = request.FILES.get('profile_image')
+        data = {key: value for key, value in request.data.items() if key != 'profile_image'}
         try:
-            user = UserDetails.objects.get(email=email)
-            serializer = UserDetailsSerializer(user, data=request.data, partial=True)
+            user = UserDetails.objects.get(id=request.user.id)
+            serializer = UserProfileUpdateSerializer(user, data=data, partial=True)
             if serializer.is_valid():
-                serializer.save()  
+                if image:
+                    try:
+                        image = store_profile_image(image)
+                    except ValueError as e:
+                        return Response({"message": "Profile update failed", 'errors': {'profile_image': [str(e)]}}
+                                        , status=status.HTTP_400_BAD_REQUEST)
+                    serializer.save(profile_image=image)
+                    schedule_profile_image_processing(image)
+                else:
+                    serializer.save()
                 return Response({'message': 'Your profile was updated successfully'}
                                 , status=status.HTTP_200_OK)
             return Response({"message": "Profile update failed", 'errors': serializer.errors}
@@ -285,6 +630,7 @@ class UserAddYourOwnLessonView(APIView):
             - `lesson_name` (str): The name of the lesson the user wants to create.
         - Responses:
             - 201 Created: Returns a success message if the lesson is successfully created.
+            - 400 Bad Request: Returns an error message if `lesson_name` is missing, blank or too long.
             - 404 Not Found: Returns an error message if the user is not found.
 
     - DELETE: 
@@ -299,55 +645,120 @@ class UserAddYourOwnLessonView(APIView):
     permission_classes = [IsAuthenticated]
 
     def post(self, request):
-        email = request.user.email
-        lesson = request.data.get('lesson_name')
         try:
-            user = UserDetails.objects.get(email=email)
-            UserCreatedLessons.objects.create(user= user, lesson_name=lesson)
+            lesson = clean_lesson_name(request.data.get('lesson_name'))
+        except ValueError as e:
+            return Response({'message': str(e)}
+                            , status=status.HTTP_400_BAD_REQUEST)
+        try:
+            # The FK constraint tells us if the user is gone, no need to load the row first
+            UserCreatedLessons.objects.create(user_id=request.user.id, lesson_name=lesson)
             return Response({'message': 'Your custom lesson added successfully'}
                                 , status=status.HTTP_201_CREATED)
         except UserDetails.DoesNotExist:
             return Response({"message": "User not found"}
                             , status=status.HTTP_404_NOT_FOUND)
+        except IntegrityError:
+            # Deleted between the version bump and the INSERT; any other constraint is a bug
+            if UserDetails.objects.filter(id=request.user.id).exists():
+                raise
+            return Response({"message": "User not found"}
+                            , status=status.HTTP_404_NOT_FOUND)
         
     def delete(self, request, user_lesson_id):
         try:
-            UserCreatedLessons.objects.get(id = user_lesson_id).delete()
+            UserCreatedLessons.objects.get(id=user_lesson_id, user_id=request.user.id).delete()
             return Response({'message': 'Your custom lesson deleted successfully'}
                                 , status=status.HTTP_200_OK)
         except UserCreatedLessons.DoesNotExist: 
             return Response({"message": "Action can't be completed"}
                             , status=status.HTTP_400_BAD_REQUEST)
 
-        
-class GetAllUserSpecificCustomLesson(APIView):
+
+class UserCustomLessonBatchView(APIView):
     """
-    This view retrieves all custom lessons created by the authenticated user.
+    This view applies a batch of changes to the custom lessons of the user in one request,
+    e.g. the edits an offline client made since its last sync.
 
     Authentication:
     - Requires the user to be authenticated (IsAuthenticated).
 
     Methods:
-    - GET: Fetches and returns a list of all custom lessons created by the user.
-           Returns a 404 error if the user is not found.
+    - POST:
+        - Description: Creates, renames and deletes custom lessons in one transaction.
+        - Request Data:
+            - `operations` (list): Up to LESSON_BATCH_MAX_OPERATIONS objects, each one of
+                - {"op": "create", "lesson_name": str}
+                - {"op": "update", "id": int, "lesson_name": str}
+                - {"op": "delete", "id": int}
+        - Responses:
+            - 200 OK: Returns `results`, one per operation in the same order, with its `status`
+              ('created', 'updated', 'deleted', 'not_found' or 'invalid'), the lesson `id` and an `error` message for failures.
+            - 400 Bad Request: Returns an error message if `operations` is missing, not a list or too long.
+            - 404 Not Found: Returns an error message if the user was deleted.
     """
 
     permission_classes = [IsAuthenticated]
 
-    def get(self, request):
-        email = request.user.email
+    def post(self, request):
         try:
-            data =UserCreatedLessons.objects.filter(user__email = email)
-            serializer = UserCreatedLessonsSerializer(data, many = True)
-            return Response(serializer.data, status=status.HTTP_200_OK)
-        except UserCreatedLessons.DoesNotExist:
+            results = apply_lesson_batch(request.user.id, request.data.get('operations'))
+        except ValueError as e:
+            return Response({'message': str(e)}
+                            , status=status.HTTP_400_BAD_REQUEST)
+        except UserDetails.DoesNotExist:
             return Response({"message": "User not found"}
                             , status=status.HTTP_404_NOT_FOUND)
-        
+        return Response({'message': 'Your custom lessons were updated', 'results': results}
+                        , status=status.HTTP_200_OK)
+
+
+class GetAllUserSpecificCustomLesson(UserContentListView):
+    """
+    This view retrieves the custom lessons created by the authenticated user, one page at a time.
+
+    Authentication:
+    - Requires the user to be authenticated (IsAuthenticated).
+
+    Methods:
+    - GET: Fetches a page of the custom lessons created by the user.
+           Returns `results` with the serialized lessons and the `next_cursor` of the following page.
+           Returns 304 Not Modified if If-None-Match matches the current ETag.
+    """
+
+    listing = 'lessons'
+    serializer_class = UserCreatedLessonsSerializer
+
+    def get_queryset(self):
+        return UserCreatedLessons.objects.filter(user_id=self.request.user.id)
 
-         
-        
 
+class GetUserContentChangesView(APIView):
+    """
+    This view returns what changed in the user's topics and custom lessons since a sync token,
+    so clients do not have to refetch the full listings to stay up to date.
 
+    Authentication:
+    - Requires the user to be authenticated (IsAuthenticated).
 
+    Methods:
+    - GET: Takes the `since` token returned by the previous call (0 for the first one).
+           Returns the new `token` and, for `topics` and `lessons`, the created or updated rows in `upserts`
+           and the ids of the deleted rows in `deleted`.
+           Returns `reset: true` with a new `token` when the client must refetch the full listings instead.
+           Returns a 400 error if `since` is not a non-negative integer.
+    """
+
+    permission_classes = [IsAuthenticated]
 
+    def get(self, request):
+        since = request.GET.get('since', '0')
+        if not since.isdigit():
+            return Response({"message": "'since' must be a non-negative integer"}
+                            , status=status.HTTP_400_BAD_REQUEST)
+        try:
+            changes = get_changes(request.user.id, int(since))
+        except UserDetails.DoesNotExist:
+            return Response({"message": "User not found"}
+                            , status=status.HTTP_404_NOT_FOUND)
+        return Response(changes, status=status.HTTP_200_OK)